@@ -0,0 +1,351 @@
+"""
+Service de facturation en continu (alternative au cron quotidien)
+Webhooks Airtable / Sellsy et facturation de chaque abonnement à sa date anniversaire
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from src.airtable_mirror import AirtableMirror
+from src.factory import load_env
+from src.scheduler import DueQueue, is_eligible
+from src.subscription import decode_subscription, decode_subscriptions
+from sync_subscription_invoices import SubscriptionInvoiceSync
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(asctime)s] %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Taille maximale acceptée pour le corps d'un webhook
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class BillingService:
+    """
+    Facture les abonnements au fil de l'eau
+
+    Les webhooks ne font qu'empiler des événements : un unique thread de
+    travail les applique (relecture des seuls services modifiés, mise à jour
+    de la file d'échéances) puis facture les abonnements arrivés à échéance.
+    Toutes les lectures et écritures Airtable / Sellsy passent donc par ce
+    thread, comme dans une exécution du script de synchronisation.
+    """
+
+    def __init__(self, sync: SubscriptionInvoiceSync, poll_seconds: float = 60):
+        """
+        Initialise le service
+
+        Args:
+            sync: Synchroniseur (clients Airtable / Sellsy, planification, exécution)
+            poll_seconds: Délai maximal entre deux contrôles des échéances
+        """
+        self.sync = sync
+        self.poll_seconds = poll_seconds
+        self.due = DueQueue()
+        self.events: "queue.Queue[Dict]" = queue.Queue()
+        self._stop_event = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self.stats = {'events': 0, 'billed_runs': 0, 'created': 0, 'errors': 0}
+
+    # ---------------------------------------------------------------------
+    # FILE D'ÉCHÉANCES
+    # ---------------------------------------------------------------------
+
+    def load_all(self):
+        """Chargement initial : tous les abonnements éligibles (une lecture complète au démarrage)"""
+        if isinstance(self.sync.airtable, AirtableMirror):
+            self.sync.airtable.refresh()
+        for subscription in decode_subscriptions(self.sync.airtable.get_eligible_subscriptions()):
+            self.due.push(subscription)
+        logger.info(f"📅 {len(self.due)} abonnement(s) planifié(s), prochaine échéance: {self.due.next_due()}")
+
+    def fetch_service(self, record_id: str) -> Dict:
+        """
+        Service tel qu'il est dans Airtable
+
+        Le miroir n'est pas relu : il peut dater d'avant le changement signalé
+        par le webhook. La ligne du miroir est mise à jour au passage.
+        """
+        if isinstance(self.sync.airtable, AirtableMirror):
+            return self.sync.airtable.fetch_service(record_id)
+        return self.sync.airtable.get_service(record_id)
+
+    def reload_records(self, record_ids: Iterable[str], not_before: Optional[date] = None,
+                       refetch: bool = True):
+        """
+        Relit des services et met à jour leur échéance (O(services modifiés))
+
+        Args:
+            record_ids: Services à relire
+            not_before: Échéance minimale (report d'un service non facturé)
+            refetch: Relire Airtable (False : miroir tout juste rafraîchi)
+        """
+        date_cache: Dict = {}
+        read = self.fetch_service if refetch else self.sync.airtable.get_service
+        for record_id in record_ids:
+            try:
+                record = read(record_id)
+            except Exception as e:
+                logger.warning(f"⚠️  Service {record_id} illisible, retiré de la file: {str(e)}")
+                self.due.remove(record_id)
+                continue
+            if is_eligible(record):
+                self.due.push(decode_subscription(record, date_cache), not_before)
+            else:
+                self.due.remove(record_id)
+
+    # ---------------------------------------------------------------------
+    # ÉVÉNEMENTS
+    # ---------------------------------------------------------------------
+
+    def submit(self, event: Dict):
+        """Empile un événement reçu par webhook (appelé par les threads HTTP)"""
+        self.events.put(event)
+
+    def handle_event(self, event: Dict):
+        self.stats['events'] += 1
+        if event['source'] == 'airtable':
+            record_ids = event.get('record_ids') or []
+            refetch = True
+            if not record_ids and isinstance(self.sync.airtable, AirtableMirror):
+                # Notification Airtable sans détail : rafraîchissement incrémental du miroir
+                record_ids = self.sync.airtable.refresh()
+                refetch = False
+            self.reload_records(record_ids, refetch=refetch)
+            logger.info(f"🔔 Airtable: {len(record_ids)} service(s) relu(s)")
+        elif event['source'] == 'sellsy':
+            # La facturation ne dépend que des compteurs Airtable : l'événement est tracé
+            self.sync.journal.write('sellsy_event', **event.get('payload', {}))
+            logger.info(f"🔔 Sellsy: {event.get('payload', {}).get('event', 'événement')} "
+                        f"{event.get('payload', {}).get('relatedid', '')}")
+
+    # ---------------------------------------------------------------------
+    # FACTURATION
+    # ---------------------------------------------------------------------
+
+    def bill_due(self, today: Optional[date] = None) -> Optional[Dict]:
+        """Facture les abonnements arrivés à échéance (relus juste avant facturation)"""
+        today = today or date.today()
+        due = self.due.pop_due(today)
+        if not due:
+            return None
+
+        record_ids = [subscription.record_id for subscription in due]
+        logger.info(f"⏰ {len(record_ids)} abonnement(s) à échéance")
+
+        # Relecture : les compteurs ont pu changer depuis la mise en file
+        fresh = []
+        date_cache: Dict = {}
+        for record_id in record_ids:
+            try:
+                record = self.fetch_service(record_id)
+            except Exception as e:
+                logger.warning(f"⚠️  Service {record_id} illisible: {str(e)}")
+                continue
+            if is_eligible(record):
+                fresh.append(decode_subscription(record, date_cache))
+
+        try:
+            summary = self.sync.bill(fresh) if fresh else None
+        finally:
+            # Compteurs incrémentés : prochaine échéance le mois suivant. Un service
+            # non facturé (échec, dry-run) est reporté au lendemain, pas au prochain tour.
+            self.reload_records(record_ids, not_before=today + timedelta(days=1))
+
+        if summary:
+            self.stats['billed_runs'] += 1
+            self.stats['created'] += summary['created']
+            self.stats['errors'] += summary['errors']
+            self.sync.journal.write('summary', **summary)
+        return summary
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                event = self.events.get(timeout=self.poll_seconds)
+            except queue.Empty:
+                event = None
+
+            try:
+                if event is not None:
+                    self.handle_event(event)
+                self.bill_due()
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"❌ Erreur du service de facturation: {str(e)}")
+
+    def start(self):
+        """Charge la file, démarre le renouvellement du token et le thread de travail"""
+        self.load_all()
+        self.sync.sellsy.token_manager.start_background_refresh()
+        self._worker = threading.Thread(target=self._run, name="billing-worker", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.sync.sellsy.token_manager.stop_background_refresh()
+        if self._worker:
+            self._worker.join(timeout=self.poll_seconds + 5)
+
+    def health(self) -> Dict:
+        next_due = self.due.next_due()
+        return {
+            'scheduled': len(self.due),
+            'next_due': next_due.isoformat() if next_due else None,
+            'pending_events': self.events.qsize(),
+            'open_circuits': self.sync.sellsy.breakers.open_circuits(),
+            **self.stats,
+        }
+
+
+# ---------------------------------------------------------------------
+# SERVEUR HTTP
+# ---------------------------------------------------------------------
+
+def verify_airtable_mac(body: bytes, header: Optional[str], secret_b64: str) -> bool:
+    """Vérifie l'en-tête X-Airtable-Content-MAC (HMAC-SHA256 du corps)"""
+    if not header:
+        return False
+    expected = hmac.new(base64.b64decode(secret_b64), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(header, f"hmac-sha256={expected}")
+
+
+def parse_airtable_event(body: bytes) -> Dict:
+    """
+    Événement Airtable
+
+    Accepte les notifications de webhook Airtable (sans détail des records)
+    et les appels d'automatisation Airtable avec les IDs modifiés
+    ({"record_ids": [...]} ou {"recordId": "..."}).
+    """
+    payload = json.loads(body or b'{}')
+    record_ids: List[str] = list(payload.get('record_ids') or [])
+    if payload.get('recordId'):
+        record_ids.append(payload['recordId'])
+    return {'source': 'airtable', 'record_ids': record_ids}
+
+
+def parse_sellsy_event(body: bytes, content_type: str) -> Dict:
+    """Événement Sellsy (JSON, ou formulaire avec un champ 'notif' JSON)"""
+    if 'application/x-www-form-urlencoded' in content_type:
+        form = parse_qs(body.decode('utf-8'))
+        payload = json.loads(form.get('notif', ['{}'])[0])
+    else:
+        payload = json.loads(body or b'{}')
+    keep = ('event', 'relatedtype', 'relatedid', 'ownerid', 'timestamp')
+    return {'source': 'sellsy', 'payload': {key: payload[key] for key in keep if key in payload}}
+
+
+def make_handler(service: BillingService, token: Optional[str], airtable_mac_secret: Optional[str]):
+    """Classe de handler HTTP liée au service"""
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, data: Dict):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self, url, body: bytes) -> bool:
+            if url.path == '/webhooks/airtable' and airtable_mac_secret:
+                return verify_airtable_mac(body, self.headers.get('X-Airtable-Content-MAC'), airtable_mac_secret)
+            if not token:
+                # Aucun secret pour cette route : un webhook peut créer des factures
+                return False
+            supplied = self.headers.get('X-Webhook-Token') or parse_qs(url.query).get('token', [''])[0]
+            return hmac.compare_digest(supplied, token)
+
+        def do_GET(self):
+            if urlparse(self.path).path == '/health':
+                self._reply(200, service.health())
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_BODY_BYTES:
+                self._reply(413, {'error': 'payload too large'})
+                return
+            body = self.rfile.read(length)
+
+            if url.path not in ('/webhooks/airtable', '/webhooks/sellsy'):
+                self._reply(404, {'error': 'not found'})
+                return
+            if not self._authorized(url, body):
+                self._reply(401, {'error': 'unauthorized'})
+                return
+
+            try:
+                if url.path == '/webhooks/airtable':
+                    event = parse_airtable_event(body)
+                else:
+                    event = parse_sellsy_event(body, self.headers.get('Content-Type', ''))
+            except (ValueError, AttributeError) as e:
+                self._reply(400, {'error': f'invalid payload: {e}'})
+                return
+
+            service.submit(event)
+            self._reply(202, {'queued': True})
+
+        def log_message(self, format, *args):
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+    return WebhookHandler
+
+
+def main(argv=None):
+    """Point d'entrée du service"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Service de facturation en continu (webhooks)")
+    parser.add_argument('--host', default=os.getenv('BILLING_SERVICE_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('BILLING_SERVICE_PORT', '8080')))
+    parser.add_argument('--poll', type=float, default=float(os.getenv('BILLING_SERVICE_POLL_SECONDS', '60')),
+                        help="Délai maximal entre deux contrôles des échéances (secondes)")
+    parser.add_argument('--journal-dir', default=os.getenv('SYNC_JOURNAL_DIR', 'sync_journals'))
+    args = parser.parse_args(argv)
+
+    load_env()
+    token, airtable_mac_secret = os.getenv('WEBHOOK_TOKEN'), os.getenv('AIRTABLE_WEBHOOK_MAC_SECRET')
+    if not token and not airtable_mac_secret:
+        raise ValueError("WEBHOOK_TOKEN ou AIRTABLE_WEBHOOK_MAC_SECRET requis : "
+                         "les webhooks déclenchent la création de factures")
+
+    dry_run = os.getenv('DRY_RUN', 'false').lower() in ['true', '1', 'yes']
+    sync = SubscriptionInvoiceSync(dry_run=dry_run, journal_dir=args.journal_dir)
+    service = BillingService(sync, poll_seconds=args.poll)
+    service.start()
+
+    handler = make_handler(service, token, airtable_mac_secret)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    logger.info(f"🌐 Service de facturation à l'écoute sur {args.host}:{args.port}")
+    logger.info(f"🔧 Mode: {'PRODUCTION' if not dry_run else 'TEST (DRY-RUN)'}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("🛑 Arrêt du service")
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
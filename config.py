@@ -29,6 +29,9 @@ AIRTABLE_BASE_ID = os.getenv('AIRTABLE_BASE_ID')
 AIRTABLE_TABLE_NAME = os.getenv('AIRTABLE_TABLE_NAME', 'service_sellsy')
 AIRTABLE_GRILLES_TABLE_NAME = os.getenv('AIRTABLE_GRILLES_TABLE_NAME', 'grilles_remise')
 
+# Miroir SQLite local des tables (optionnel, lectures sans appel réseau)
+AIRTABLE_MIRROR_PATH = os.getenv('AIRTABLE_MIRROR_PATH')
+
 # =============================================================================
 # CONFIGURATION SELLSY (API v2 OAuth2)
 # =============================================================================
@@ -37,6 +40,28 @@ SELLSY_V2_CLIENT_ID = os.getenv('SELLSY_V2_CLIENT_ID')
 SELLSY_V2_CLIENT_SECRET = os.getenv('SELLSY_V2_CLIENT_SECRET')
 SELLSY_GOCARDLESS_PAYMENT_ID = os.getenv('SELLSY_GOCARDLESS_PAYMENT_ID')
 
+# Cache disque du token OAuth2 partagé entre scripts/processus (optionnel)
+SELLSY_TOKEN_CACHE = os.getenv('SELLSY_TOKEN_CACHE')
+
+# Cache des réponses GET Sellsy : base SQLite (optionnel) et taille de la LRU mémoire
+SELLSY_HTTP_CACHE = os.getenv('SELLSY_HTTP_CACHE')
+SELLSY_HTTP_CACHE_SIZE = int(os.getenv('SELLSY_HTTP_CACHE_SIZE', '512'))
+
+# Connexions HTTP keep-alive simultanées vers Sellsy (envois de factures en parallèle)
+SELLSY_POOL_SIZE = int(os.getenv('SELLSY_POOL_SIZE', '16'))
+
+# Disjoncteurs Sellsy : échecs consécutifs avant ouverture, délai avant l'appel d'essai
+SELLSY_BREAKER_THRESHOLD = int(os.getenv('SELLSY_BREAKER_THRESHOLD', '5'))
+SELLSY_BREAKER_RESET_SECONDS = float(os.getenv('SELLSY_BREAKER_RESET_SECONDS', '30'))
+
+# Timeouts HTTP maximaux (réduits d'après les latences observées et l'échéance du run)
+SELLSY_TIMEOUT_SECONDS = float(os.getenv('SELLSY_TIMEOUT_SECONDS', '30'))
+AIRTABLE_TIMEOUT_SECONDS = float(os.getenv('AIRTABLE_TIMEOUT_SECONDS', '30'))
+
+# Cache disque des taxes / moyens de paiement / devises (optionnel, TTL en heures)
+SELLSY_METADATA_CACHE = os.getenv('SELLSY_METADATA_CACHE')
+SELLSY_METADATA_TTL_HOURS = float(os.getenv('SELLSY_METADATA_TTL_HOURS', '24'))
+
 # =============================================================================
 # OPTIONS
 # =============================================================================
@@ -44,6 +69,12 @@ SELLSY_GOCARDLESS_PAYMENT_ID = os.getenv('SELLSY_GOCARDLESS_PAYMENT_ID')
 # Mode dry-run : affiche ce qui serait fait sans rien créer
 DRY_RUN = os.getenv('DRY_RUN', 'false').lower() == 'true'
 
+# Service de facturation en continu (billing_service.py)
+BILLING_SERVICE_HOST = os.getenv('BILLING_SERVICE_HOST', '127.0.0.1')
+BILLING_SERVICE_PORT = int(os.getenv('BILLING_SERVICE_PORT', '8080'))
+WEBHOOK_TOKEN = os.getenv('WEBHOOK_TOKEN')
+AIRTABLE_WEBHOOK_MAC_SECRET = os.getenv('AIRTABLE_WEBHOOK_MAC_SECRET')
+
 # =============================================================================
 # VALIDATION
 # =============================================================================
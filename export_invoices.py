@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Script pour exporter toutes les factures Sellsy d'une période (NDJSON gzip)
+
+Usage: python export_invoices.py <date_debut> <date_fin> [fichier_sortie]
+Exemple: python export_invoices.py 2025-01-01 2025-12-31
+
+Une exécution interrompue peut être relancée avec les mêmes arguments :
+l'export reprend à la dernière page écrite.
+"""
+
+import sys
+import os
+from src.factory import get_sellsy_client
+from src.invoice_export import InvoiceExporter
+
+
+def export_invoices(start_date, end_date, output_path=None):
+    output_path = output_path or f"invoices_{start_date}_{end_date}.ndjson.gz"
+
+    exporter = InvoiceExporter(
+        get_sellsy_client(),
+        output_path,
+        max_workers=int(os.getenv('EXPORT_MAX_WORKERS', '8'))
+    )
+
+    print(f"📦 Export des factures du {start_date} au {end_date} → {output_path}\n")
+
+    try:
+        state = exporter.export(
+            start_date,
+            end_date,
+            progress=lambda s: print(f"  ✅ {s['exported']} facture(s) exportée(s)")
+        )
+        print(f"\n🎉 Export terminé: {state['exported']} facture(s) dans {output_path}")
+
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        print("💡 Relancez la même commande pour reprendre l'export")
+        sys.exit(1)
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python export_invoices.py <date_debut> <date_fin> [fichier_sortie]")
+        print("\nExemple: python export_invoices.py 2025-01-01 2025-12-31")
+        sys.exit(1)
+
+    export_invoices(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Script de prévision des revenus d'abonnement sur toute la durée des contrats
+
+Usage: python forecast_revenue.py [horizon_mois]
+"""
+
+import sys
+import json
+from src.factory import get_airtable_client
+from src.forecast import RevenueForecast
+
+
+def forecast_revenue(horizon=None):
+    airtable = get_airtable_client(use_mirror=False)
+
+    print("🔍 Récupération des abonnements et des grilles...\n")
+
+    services = airtable.get_eligible_subscriptions()
+    grids_by_id = airtable.get_discount_grids_by_id()
+    default_grid = next(
+        (grid for grid in grids_by_id.values() if grid.get('Grille par défaut', False)),
+        None
+    )
+
+    forecast = RevenueForecast(grids_by_id, default_grid).project(services, horizon=horizon)
+
+    # Résumé par année civile
+    yearly = {}
+    for month, ht, ttc in zip(forecast['months'], forecast['total']['ht'], forecast['total']['ttc']):
+        year_ht, year_ttc = yearly.get(month[:4], (0, 0))
+        yearly[month[:4]] = (year_ht + ht, year_ttc + ttc)
+
+    print(f"{'Année':<8} {'Total HT':>15} {'Total TTC':>15}")
+    print("=" * 40)
+    for year, (ht, ttc) in yearly.items():
+        print(f"{year:<8} {ht:>15.2f} {ttc:>15.2f}")
+
+    print(f"\n📊 {len(services)} abonnement(s), {len(forecast['clients'])} client(s), "
+          f"{len(forecast['months'])} mois projetés")
+    if forecast['skipped']:
+        print(f"⚠️  {len(forecast['skipped'])} service(s) non projeté(s):")
+        for skip in forecast['skipped']:
+            print(f"   - {skip['service_name']} ({skip['record_id']}): {skip['reason']}")
+    print(f"💰 Total HT: {forecast['total']['total_ht']:.2f}€ | "
+          f"Total TTC: {forecast['total']['total_ttc']:.2f}€")
+
+    output_file = "revenue_forecast.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(forecast, f, indent=2, ensure_ascii=False)
+
+    print(f"\n✅ Prévision complète sauvegardée dans: {output_file}")
+
+
+def main():
+    forecast_revenue(int(sys.argv[1]) if len(sys.argv) > 1 else None)
+
+
+if __name__ == "__main__":
+    main()
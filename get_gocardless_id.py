@@ -1,12 +1,35 @@
-import os
-from src.sellsy_client_v2 import SellsyClientV2
-
-client = SellsyClientV2(
-    client_id=os.getenv('SELLSY_V2_CLIENT_ID'),
-    client_secret=os.getenv('SELLSY_V2_CLIENT_SECRET')
-)
-
-# Cherche dans les moyens de paiement (à adapter selon l'API v2)
-# Pour l'instant, récupère-le manuellement dans Sellsy :
-# Menu > Réglages > Comptabilité > Journaux > Note l'ID du journal GoCardless
-print("⚠️ Récupère l'ID GoCardless manuellement dans Sellsy pour l'instant")
+#!/usr/bin/env python3
+"""
+Script pour retrouver l'ID du moyen de paiement GoCardless dans Sellsy
+"""
+
+import sys
+from src.factory import get_sellsy_client
+
+
+def main():
+    client = get_sellsy_client()
+
+    try:
+        methods = client.metadata.load()["payment_methods"]
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        sys.exit(1)
+
+    print(f"{'ID':<10} {'Libellé'}")
+    print("=" * 50)
+    for method in methods:
+        print(f"{method.get('id', ''):<10} {method.get('label') or method.get('name') or ''}")
+
+    payment_id = client.metadata.find_payment_method_id("gocardless")
+    if payment_id:
+        print(f"\n✅ ID GoCardless: {payment_id}")
+        print(f"   SELLSY_GOCARDLESS_PAYMENT_ID={payment_id}")
+    else:
+        # Récupère-le manuellement dans Sellsy :
+        # Menu > Réglages > Comptabilité > Journaux > Note l'ID du journal GoCardless
+        print("\n⚠️ Aucun moyen de paiement GoCardless trouvé, récupère l'ID manuellement dans Sellsy")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,24 +4,33 @@ Script pour inspecter un client Sellsy et trouver où se trouve le mandate_id Go
 """
 
 import os
+import sys
 import json
-from dotenv import load_dotenv
-from src.sellsy_client_v2 import SellsyClientV2
-
-load_dotenv()
+from src.factory import get_airtable_client, get_sellsy_client
+from src.airtable_mirror import AirtableMirror
 
 def inspect_client(client_id: int):
     """Inspecte toutes les informations d'un client pour trouver le mandate_id"""
 
-    client = SellsyClientV2(
-        client_id=os.getenv('SELLSY_V2_CLIENT_ID'),
-        client_secret=os.getenv('SELLSY_V2_CLIENT_SECRET')
-    )
+    client = get_sellsy_client()
 
     print(f"\n{'='*80}")
     print(f"🔍 INSPECTION CLIENT SELLSY ID: {client_id}")
     print(f"{'='*80}\n")
 
+    # 0. Services Airtable du client (lecture locale si le miroir est configuré)
+    mirror_path = os.getenv('AIRTABLE_MIRROR_PATH')
+    if mirror_path and os.path.exists(mirror_path):
+        print("📋 0. SERVICES AIRTABLE (miroir local)")
+        print("-" * 80)
+        mirror = AirtableMirror(get_airtable_client(use_mirror=False), mirror_path)
+        for service in mirror.get_services_by_client(client_id):
+            fields = service['fields']
+            print(f"  • {fields.get('Nom du service', 'Service')} ({service['id']})")
+            print(f"    ID_Moyen_Paiement_GoCardless: {fields.get('ID_Moyen_Paiement_GoCardless') or 'Non renseigné'}")
+        mirror.close()
+        print()
+
     # 1. Informations client de base
     print("📋 1. INFORMATIONS CLIENT DE BASE")
     print("-" * 80)
@@ -131,8 +140,34 @@ def inspect_client(client_id: int):
     print(f"{'='*80}\n")
 
 
-if __name__ == "__main__":
-    # ID client à inspecter (fourni par l'utilisateur)
-    CLIENT_ID = 722
+def resolve_clients(client_ids):
+    """Affiche le moyen de paiement résolu pour chaque client (recherches en parallèle)"""
+
+    client = get_sellsy_client()
+    resolved = client.payment_methods.resolve_many(client_ids)
+
+    print(f"\n{'='*80}")
+    print(f"💳 MOYENS DE PAIEMENT ({len(resolved)} client(s))")
+    print(f"{'='*80}\n")
+    for client_id in sorted(resolved):
+        payment_id = resolved[client_id]
+        print(f"  • Client {client_id}: {f'GoCardless (ID {payment_id})' if payment_id else 'Aucun mandat trouvé'}")
+    print()
+    return resolved
 
-    inspect_client(CLIENT_ID)
+
+def main():
+    # IDs clients (arguments ou variable CLIENT_IDS, 722 par défaut), --details pour l'inspection complète
+    args = [arg for arg in sys.argv[1:] if arg != '--details']
+    raw_ids = args or os.getenv('CLIENT_IDS', '722').replace(',', ' ').split()
+    client_ids = [int(client_id) for client_id in raw_ids]
+
+    resolve_clients(client_ids)
+
+    if '--details' in sys.argv[1:]:
+        for client_id in client_ids:
+            inspect_client(client_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,23 +5,18 @@ et comprendre le format exact des lignes (rows)
 """
 
 import sys
-from src.sellsy_client_v2 import SellsyClientV2
+from src.factory import get_sellsy_client
 import json
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python inspect_invoice.py <invoice_id>")
-        print("\nExemple: python inspect_invoice.py 12345")
-        sys.exit(1)
-
-    invoice_id = sys.argv[1]
-    client = SellsyClientV2()
-
+def inspect_invoice(invoice_id):
     print(f"🔍 Récupération de la facture #{invoice_id}...\n")
 
     try:
+        client = get_sellsy_client()
+
         # Récupérer la facture avec tous les détails
-        invoice = client.get(f"/invoices/{invoice_id}")
+        result = client._make_request("GET", f"/invoices/{invoice_id}")
+        invoice = result.get("data") or result
 
         print("=" * 80)
         print("INFORMATIONS GÉNÉRALES")
@@ -63,5 +58,13 @@ def main():
         print(f"❌ Erreur lors de la récupération: {e}")
         sys.exit(1)
 
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python inspect_invoice.py <invoice_id>")
+        print("\nExemple: python inspect_invoice.py 12345")
+        sys.exit(1)
+
+    inspect_invoice(sys.argv[1])
+
 if __name__ == "__main__":
     main()
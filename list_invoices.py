@@ -3,21 +3,21 @@
 Script pour lister les factures Sellsy existantes
 """
 
-from src.sellsy_client_v2 import SellsyClientV2
-from datetime import datetime, timedelta
-
-def main():
-    client = SellsyClientV2()
+import sys
+from src.factory import get_sellsy_client
 
+def list_invoices(limit=20):
     print("🔍 Récupération des dernières factures...\n")
 
     try:
-        # Récupérer les 20 dernières factures
-        response = client.get("/invoices", params={
-            "limit": 20,
+        client = get_sellsy_client()
+
+        # Récupérer les dernières factures
+        response = client._make_request("GET", "/invoices", params={
+            "limit": limit,
             "offset": 0,
-            "order": "desc",
-            "direction": "created"
+            "order": "created",
+            "direction": "desc"
         })
 
         invoices = response.get('data', [])
@@ -47,6 +47,11 @@ def main():
 
     except Exception as e:
         print(f"❌ Erreur: {e}")
+        sys.exit(1)
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    list_invoices(limit)
 
 if __name__ == "__main__":
     main()
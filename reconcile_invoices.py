@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Script de rapprochement entre les compteurs Airtable et les factures Sellsy
+
+Signale les mois facturés dans Airtable sans facture Sellsy, les doublons,
+les écarts de montant et les factures d'abonnement inattendues.
+Code de sortie 1 si des anomalies sont détectées.
+"""
+
+import sys
+import json
+from src.factory import get_airtable_client, get_sellsy_client
+from src.airtable_mirror import AirtableMirror
+from src.forecast import RevenueForecast
+from src.reconciliation import InvoiceReconciler
+from src.subscription import decode_subscriptions
+
+
+def main():
+    airtable = get_airtable_client()
+    if isinstance(airtable, AirtableMirror):
+        airtable.refresh()
+
+    sellsy = get_sellsy_client()
+
+    print("🔍 Chargement des abonnements facturés (Airtable)...")
+    services = airtable.get_billed_subscriptions()
+    grids_by_id = airtable.get_discount_grids_by_id()
+    default_grid = next(
+        (grid for grid in grids_by_id.values() if grid.get('Grille par défaut', False)),
+        None
+    )
+    print(f"  ✅ {len(services)} abonnement(s)")
+
+    if not services:
+        print("ℹ️  Aucun abonnement facturé à rapprocher")
+        return
+
+    dates = [subscription.date_debut for subscription in decode_subscriptions(services)
+             if subscription.date_debut]
+    filters = {"date": {"start": min(dates).isoformat()}} if dates else {}
+    print(f"🔍 Chargement des factures Sellsy depuis le {min(dates) if dates else 'début'}...")
+    invoices = list(sellsy.search_invoices(filters))
+    print(f"  ✅ {len(invoices)} facture(s)\n")
+
+    reconciler = InvoiceReconciler(RevenueForecast(grids_by_id, default_grid))
+    report = reconciler.reconcile(services, invoices)
+    summary = report['summary']
+
+    print("=" * 70)
+    print("RAPPROCHEMENT AIRTABLE / SELLSY")
+    print("=" * 70)
+    print(f"📊 Facturations attendues: {summary['expected']} | Rapprochées: {summary['matched']}")
+    print(f"❌ Factures manquantes: {summary['missing']}")
+    print(f"⚠️  Doublons: {summary['duplicates']}")
+    print(f"⚠️  Écarts de montant: {summary['amount_mismatches']}")
+    print(f"⏱️  Facturées en retard: {summary['late']}")
+    print(f"❓ Factures inattendues: {summary['unexpected']}")
+    print(f"🚫 Services invalides (non rapprochés): {summary['invalid']}")
+    for skip in report['invalid']:
+        print(f"   - {skip['service_name']} ({skip['record_id']}): {skip['reason']}")
+
+    output_file = "reconciliation_report.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"\n✅ Rapport complet sauvegardé dans: {output_file}")
+
+    if summary['missing'] or summary['duplicates'] or summary['amount_mismatches'] or summary['invalid']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
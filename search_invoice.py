@@ -1,53 +1,49 @@
 #!/usr/bin/env python3
 """
 Script pour chercher des factures Sellsy avec différents critères
+
+Les recherches portent sur un index local de toutes les factures (numéro,
+sujet, client), mis à jour de façon incrémentale à chaque lancement.
 """
 
 import sys
 import os
-from dotenv import load_dotenv
-from src.sellsy_client_v2 import SellsyClientV2
-
-# Charger les variables d'environnement
-load_dotenv()
+from src.factory import get_sellsy_client
+from src.invoice_index import InvoiceIndex
 
 def search_invoices(client, search_term=None, limit=50):
-    """Cherche des factures selon un terme de recherche"""
+    """Cherche des factures dans l'index local (rafraîchi depuis Sellsy)"""
 
-    print(f"🔍 Recherche de factures (limite: {limit})...\n")
+    index = InvoiceIndex(os.getenv('SELLSY_INVOICE_INDEX_PATH', 'invoice_index.json'))
 
+    # Rafraîchir l'index : historique complet au premier lancement, puis incrémental
+    if index.last_refresh:
+        print("🔄 Mise à jour incrémentale de l'index des factures...")
+    else:
+        print("🔄 Construction de l'index des factures (toutes les pages)...")
     try:
-        # Récupérer les factures
-        response = client._make_request("GET", "/invoices", params={
-            "limit": limit,
-            "offset": 0,
-            "order": "desc",
-            "direction": "created"
-        })
+        updated = index.refresh(client)
+        print(f"📚 {updated} facture(s) (ré)indexée(s), {len(index.documents)} au total\n")
+    except Exception as e:
+        # Sellsy injoignable : la recherche porte sur l'index tel quel
+        print(f"⚠️  Mise à jour de l'index impossible ({e})")
+        print(f"📚 Recherche dans l'index local ({len(index.documents)} facture(s), "
+              f"mis à jour le {index.last_refresh or 'jamais'})\n")
 
-        invoices = response.get('data', [])
+    try:
+        print(f"🔍 Recherche de factures (limite: {limit})...\n")
+        invoices = index.search(search_term, limit)
 
         if not invoices:
-            print("❌ Aucune facture trouvée")
+            if search_term:
+                print(f"❌ Aucune facture ne correspond à '{search_term}'")
+            else:
+                print("❌ Aucune facture trouvée")
             return []
 
-        # Filtrer si un terme de recherche est fourni
         if search_term:
-            search_term = search_term.lower()
-            filtered = []
-            for inv in invoices:
-                # Chercher dans numéro, sujet, ID
-                if (search_term in str(inv.get('id', '')).lower() or
-                    search_term in str(inv.get('number', '')).lower() or
-                    search_term in str(inv.get('subject', '')).lower()):
-                    filtered.append(inv)
-            invoices = filtered
             print(f"📌 Filtré sur '{search_term}': {len(invoices)} résultat(s)\n")
 
-        if not invoices:
-            print(f"❌ Aucune facture ne correspond à '{search_term}'")
-            return []
-
         # Afficher les résultats
         print(f"{'ID':<10} {'Numéro':<20} {'Date':<12} {'Statut':<15} {'Montant TTC':<15} {'Sujet'}")
         print("=" * 120)
@@ -57,7 +53,7 @@ def search_invoices(client, search_term=None, limit=50):
             number = inv.get('number', 'N/A')
             date = inv.get('date', 'N/A')
             status = inv.get('status', 'N/A')
-            amount = inv.get('amounts', {}).get('total_incl_tax', '0')
+            amount = inv.get('amount', '0')
             currency = inv.get('currency', 'EUR')
             subject = inv.get('subject', '')[:60]
 
@@ -76,19 +72,15 @@ def search_invoices(client, search_term=None, limit=50):
         return []
 
 def main():
-    # Récupérer les credentials
-    client_id = os.getenv('SELLSY_V2_CLIENT_ID')
-    client_secret = os.getenv('SELLSY_V2_CLIENT_SECRET')
-
-    if not client_id or not client_secret:
-        print("❌ Variables SELLSY_V2_CLIENT_ID et SELLSY_V2_CLIENT_SECRET manquantes")
+    try:
+        client = get_sellsy_client()
+    except Exception as e:
+        print(f"❌ {e}")
         print("\nAjoutez-les dans votre fichier .env:")
         print("SELLSY_V2_CLIENT_ID=votre_client_id")
         print("SELLSY_V2_CLIENT_SECRET=votre_client_secret")
         sys.exit(1)
 
-    client = SellsyClientV2(client_id, client_secret)
-
     # Récupérer le terme de recherche depuis les arguments
     search_term = sys.argv[1] if len(sys.argv) > 1 else None
     limit = int(sys.argv[2]) if len(sys.argv) > 2 else 50
@@ -3,9 +3,16 @@ Client Airtable pour la gestion des abonnements et grilles de remise
 """
 
 import os
-from typing import Dict, List, Optional
+import re
+import time
+from typing import Dict, Iterator, List, Optional
 import requests
-from datetime import datetime
+from datetime import date, datetime
+
+from src.deadline import AdaptiveTimeouts
+from src.json_stream import JsonListStream
+from src.perf_report import record_api_call
+from src.scheduler import due_cutoff, next_due_from_fields
 
 
 class AirtableClient:
@@ -32,18 +39,78 @@ class AirtableClient:
             'Authorization': f'Bearer {api_key}',
             'Content-Type': 'application/json'
         }
+        # Aucun appel sans timeout : une socket bloquée ne doit pas figer le job
+        self.timeouts = AdaptiveTimeouts(default=float(os.getenv('AIRTABLE_TIMEOUT_SECONDS', '30')))
     
-    def get_eligible_subscriptions(self) -> List[Dict]:
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Requête sur la base (path relatif, ex: /service_sellsy/recXXX), chronométrée"""
+        family = re.sub(r'/rec\w+', '/{id}', path)
+        started = time.perf_counter()
+        status = None
+        try:
+            response = requests.request(method, f'{self.base_url}{path}', headers=self.headers,
+                                        timeout=self.timeouts.timeout_for(f'{method} {family}'), **kwargs)
+            status = response.status_code
+            self.timeouts.observe(f'{method} {family}', time.perf_counter() - started)
+            return response
+        finally:
+            record_api_call('airtable', method, family, time.perf_counter() - started, status)
+    
+    def iter_records(self, table: str, params: Optional[Dict] = None) -> Iterator[Dict]:
         """
-        Récupère tous les abonnements éligibles à la facturation
+        Parcourt les records d'une table en suivant la pagination Airtable
+
+        Chaque page est décodée au fil de la réception : un record est rendu
+        dès que ses octets sont arrivés, sans attendre la fin de la page.
+
+        Args:
+            table: Nom de la table
+            params: Paramètres de requête (filterByFormula, view, fields...)
+
+        Yields:
+            Chaque record (id, fields, createdTime)
+        """
+        params = dict(params or {})
+
+        while True:
+            response = self._request('GET', f'/{table}', params=params, stream=True)
+
+            if response.status_code != 200:
+                raise Exception(f"Erreur Airtable: {response.status_code} - {response.text}")
+
+            page = JsonListStream.from_response(response, 'records')
+            yield from page
+
+            # Airtable renvoie un offset tant qu'il reste des pages (100 records max)
+            offset = page.extra.get('offset')
+            if not offset:
+                return
+            params['offset'] = offset
+
+    def list_records(self, table: str, params: Optional[Dict] = None) -> List[Dict]:
+        """
+        Récupère tous les records d'une table en suivant la pagination Airtable
+        
+        Args:
+            table: Nom de la table
+            params: Paramètres de requête (filterByFormula, view, fields...)
+            
+        Returns:
+            Liste complète des records (id, fields, createdTime)
+        """
+        return list(self.iter_records(table, params))
+    
+    def iter_eligible_subscriptions(self) -> Iterator[Dict]:
+        """
+        Parcourt les abonnements éligibles à la facturation au fil de la réception
         
         Critères d'éligibilité :
         - Catégorie = "Abonnement"
         - Occurrences restantes > 0
         - Date de début renseignée
         
-        Returns:
-            Liste des abonnements éligibles
+        Yields:
+            Chaque abonnement éligible
         """
         # Construction de la formule Airtable
         formula = "AND({Catégorie} = 'Abonnement', {Occurrences restantes} > 0, {Date de début} != '')"
@@ -53,17 +120,42 @@ class AirtableClient:
             'view': 'Grid view'  # Vue par défaut
         }
         
-        response = requests.get(
-            f'{self.base_url}/{self.table_services}',
-            headers=self.headers,
-            params=params
-        )
+        return self.iter_records(self.table_services, params)
+
+    def get_eligible_subscriptions(self) -> List[Dict]:
+        """
+        Récupère tous les abonnements éligibles à la facturation
         
-        if response.status_code != 200:
-            raise Exception(f"Erreur Airtable: {response.status_code} - {response.text}")
+        Returns:
+            Liste des abonnements éligibles
+        """
+        return list(self.iter_eligible_subscriptions())
+    
+    def get_due_subscriptions(self, today: Optional[date] = None) -> List[Dict]:
+        """
+        Abonnements éligibles arrivés à échéance
+
+        Sans miroir local, la table est lue en entier et filtrée sur
+        l'échéance au fil de la réception : seuls les abonnements dus sont
+        conservés (même interface qu'AirtableMirror.get_due_subscriptions).
+        """
+        cutoff = due_cutoff(today or date.today()).isoformat()
+        return [
+            record for record in self.iter_eligible_subscriptions()
+            if (next_due_from_fields(record['fields']) or '') < cutoff
+        ]
+    
+    def get_billed_subscriptions(self) -> List[Dict]:
+        """
+        Récupère tous les abonnements ayant déjà été facturés au moins une fois
+        (y compris les abonnements terminés)
         
-        data = response.json()
-        return data.get('records', [])
+        Returns:
+            Liste des abonnements avec Mois facturés > 0
+        """
+        formula = "AND({Catégorie} = 'Abonnement', {Mois facturés} > 0, {Date de début} != '')"
+        
+        return self.list_records(self.table_services, {'filterByFormula': formula})
     
     def get_discount_grids(self) -> List[Dict]:
         """
@@ -72,19 +164,17 @@ class AirtableClient:
         Returns:
             Liste des grilles de remise
         """
-        response = requests.get(
-            f'{self.base_url}/{self.table_grilles}',
-            headers=self.headers
-        )
-        
-        if response.status_code != 200:
-            raise Exception(f"Erreur Airtable: {response.status_code} - {response.text}")
-        
-        data = response.json()
-        records = data.get('records', [])
-        
-        # Retourne uniquement les champs
-        return [record['fields'] for record in records]
+        # Retourne uniquement les champs, record par record
+        return [record['fields'] for record in self.iter_records(self.table_grilles)]
+
+    def get_discount_grids_by_id(self) -> Dict[str, Dict]:
+        """
+        Récupère toutes les grilles de remise indexées par ID de record
+
+        Returns:
+            Dictionnaire {record_id: champs de la grille}
+        """
+        return {record['id']: record['fields'] for record in self.iter_records(self.table_grilles)}
     
     def get_discount_grid(self, grid_id: str) -> Dict:
         """
@@ -96,10 +186,7 @@ class AirtableClient:
         Returns:
             Données de la grille de remise
         """
-        response = requests.get(
-            f'{self.base_url}/{self.table_grilles}/{grid_id}',
-            headers=self.headers
-        )
+        response = self._request('GET', f'/{self.table_grilles}/{grid_id}')
         
         if response.status_code != 200:
             raise Exception(f"Erreur Airtable: {response.status_code} - {response.text}")
@@ -128,17 +215,44 @@ class AirtableClient:
             }
         }
         
-        response = requests.patch(
-            f'{self.base_url}/{self.table_services}/{record_id}',
-            headers=self.headers,
-            json=payload
-        )
+        response = self._request('PATCH', f'/{self.table_services}/{record_id}', json=payload)
         
         if response.status_code != 200:
             raise Exception(f"Erreur Airtable: {response.status_code} - {response.text}")
         
         return True
     
+    def update_counters_batch(self, updates: List[Dict]) -> bool:
+        """
+        Met à jour les compteurs de plusieurs services (10 records par requête)
+        
+        Args:
+            updates: Liste de {'record_id', 'mois_factures', 'occurrences_restantes'}
+            
+        Returns:
+            True si toutes les mises à jour ont réussi
+        """
+        for start in range(0, len(updates), 10):
+            payload = {
+                'records': [
+                    {
+                        'id': update['record_id'],
+                        'fields': {
+                            'Mois facturés': update['mois_factures'],
+                            'Occurrences restantes': update['occurrences_restantes']
+                        }
+                    }
+                    for update in updates[start:start + 10]
+                ]
+            }
+            
+            response = self._request('PATCH', f'/{self.table_services}', json=payload)
+            
+            if response.status_code != 200:
+                raise Exception(f"Erreur Airtable: {response.status_code} - {response.text}")
+        
+        return True
+    
     def get_service(self, record_id: str) -> Dict:
         """
         Récupère un service spécifique par son ID
@@ -149,10 +263,7 @@ class AirtableClient:
         Returns:
             Données du service
         """
-        response = requests.get(
-            f'{self.base_url}/{self.table_services}/{record_id}',
-            headers=self.headers
-        )
+        response = self._request('GET', f'/{self.table_services}/{record_id}')
         
         if response.status_code != 200:
             raise Exception(f"Erreur Airtable: {response.status_code} - {response.text}")
@@ -0,0 +1,366 @@
+"""
+Miroir local SQLite des tables Airtable service_sellsy et grilles_remise
+Les lectures sont servies localement, seules les modifications repartent vers Airtable
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+from src.airtable_client import AirtableClient
+from src.scheduler import due_cutoff, next_due_from_fields
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS services (
+    record_id TEXT PRIMARY KEY,
+    client_id TEXT,
+    grid_id TEXT,
+    categorie TEXT,
+    occurrences_restantes INTEGER,
+    date_debut TEXT,
+    fields TEXT NOT NULL,
+    created_time TEXT,
+    next_due TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_services_client ON services (client_id);
+CREATE INDEX IF NOT EXISTS idx_services_grid ON services (grid_id);
+CREATE INDEX IF NOT EXISTS idx_services_eligible
+    ON services (categorie, occurrences_restantes);
+
+CREATE TABLE IF NOT EXISTS grids (
+    record_id TEXT PRIMARY KEY,
+    is_default INTEGER NOT NULL DEFAULT 0,
+    fields TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_grids_default ON grids (is_default);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    table_name TEXT PRIMARY KEY,
+    last_refresh TEXT,
+    last_full_refresh TEXT
+);
+"""
+
+# Marge appliquée au filtre incrémental (décalage d'horloge Airtable / local)
+REFRESH_MARGIN = timedelta(minutes=5)
+
+
+class AirtableMirror:
+    """
+    Miroir local des tables Airtable, compatible avec les lectures d'AirtableClient
+
+    Le rafraîchissement est incrémental (records modifiés depuis le dernier
+    passage, via LAST_MODIFIED_TIME()). Une resynchronisation complète est
+    faite périodiquement pour prendre en compte les suppressions.
+    """
+
+    def __init__(self, airtable: AirtableClient,
+                 db_path: str = 'airtable_mirror.db',
+                 full_refresh_hours: int = 24):
+        """
+        Initialise le miroir
+
+        Args:
+            airtable: Client Airtable utilisé pour les rafraîchissements et écritures
+            db_path: Chemin de la base SQLite locale
+            full_refresh_hours: Intervalle entre deux resynchronisations complètes
+        """
+        self.airtable = airtable
+        self.db_path = db_path
+        self.full_refresh_interval = timedelta(hours=full_refresh_hours)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Ajoute l'échéance (next_due) aux miroirs créés avant son introduction"""
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(services)")}
+        with self._lock, self._conn:
+            if 'next_due' not in columns:
+                self._conn.execute("ALTER TABLE services ADD COLUMN next_due TEXT")
+                rows = self._conn.execute("SELECT record_id, fields FROM services").fetchall()
+                self._conn.executemany(
+                    "UPDATE services SET next_due = ? WHERE record_id = ?",
+                    [(next_due_from_fields(json.loads(row['fields'])), row['record_id']) for row in rows]
+                )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_services_due ON services (next_due)")
+
+    def close(self):
+        """Ferme la connexion SQLite"""
+        self._conn.close()
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _query_one(self, sql: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+        rows = self._query(sql, params)
+        return rows[0] if rows else None
+
+    # ---------------------------------------------------------------------
+    # RAFRAÎCHISSEMENT
+    # ---------------------------------------------------------------------
+
+    def _get_state(self, table_name: str) -> Dict[str, Optional[datetime]]:
+        row = self._query_one(
+            "SELECT last_refresh, last_full_refresh FROM sync_state WHERE table_name = ?",
+            (table_name,)
+        )
+
+        def parse(value):
+            return datetime.fromisoformat(value) if value else None
+
+        if not row:
+            return {'last_refresh': None, 'last_full_refresh': None}
+        return {
+            'last_refresh': parse(row['last_refresh']),
+            'last_full_refresh': parse(row['last_full_refresh']),
+        }
+
+    def _set_state(self, table_name: str, refreshed_at: datetime, full: bool):
+        if full:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                (table_name, refreshed_at.isoformat(), refreshed_at.isoformat())
+            )
+        else:
+            self._conn.execute(
+                "UPDATE sync_state SET last_refresh = ? WHERE table_name = ?",
+                (refreshed_at.isoformat(), table_name)
+            )
+
+    def _fetch(self, table: str, since: Optional[datetime]) -> Iterator[Dict]:
+        params = {}
+        if since:
+            since_str = (since - REFRESH_MARGIN).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+            params['filterByFormula'] = f"IS_AFTER(LAST_MODIFIED_TIME(), '{since_str}')"
+        return self.airtable.iter_records(table, params)
+
+    @staticmethod
+    def _service_row(record: Dict) -> tuple:
+        fields = record.get('fields', {})
+        client_id = fields.get('ID_Sellsy_abonné')
+        grille = fields.get('Grille de remise')
+        return (
+            record['id'],
+            str(client_id) if client_id else None,
+            grille[0] if grille else None,
+            fields.get('Catégorie'),
+            fields.get('Occurrences restantes', 0) or 0,
+            fields.get('Date de début'),
+            json.dumps(fields, ensure_ascii=False),
+            record.get('createdTime'),
+            next_due_from_fields(fields),
+        )
+
+    @staticmethod
+    def _grid_row(record: Dict) -> tuple:
+        fields = record.get('fields', {})
+        return (
+            record['id'],
+            1 if fields.get('Grille par défaut', False) else 0,
+            json.dumps(fields, ensure_ascii=False),
+        )
+
+    def refresh(self, full: bool = False) -> List[str]:
+        """
+        Met à jour le miroir depuis Airtable
+
+        Args:
+            full: Force une resynchronisation complète (suppressions incluses)
+
+        Returns:
+            Liste des IDs de services ajoutés ou modifiés
+        """
+        changed = []
+
+        for table_name, airtable_table, row_builder in (
+            ('grids', self.airtable.table_grilles, self._grid_row),
+            ('services', self.airtable.table_services, self._service_row),
+        ):
+            state = self._get_state(table_name)
+            now = datetime.now(timezone.utc)
+            table_full = (
+                full
+                or state['last_full_refresh'] is None
+                or now - state['last_full_refresh'] > self.full_refresh_interval
+            )
+
+            records = self._fetch(airtable_table, None if table_full else state['last_refresh'])
+            rows = [row_builder(record) for record in records]
+            placeholders = ', '.join('?' * (len(rows[0]) if rows else 1))
+
+            with self._lock, self._conn:
+                if table_full:
+                    self._conn.execute(f"DELETE FROM {table_name}")
+                if rows:
+                    self._conn.executemany(
+                        f"INSERT OR REPLACE INTO {table_name} VALUES ({placeholders})",
+                        rows
+                    )
+                self._set_state(table_name, now, table_full)
+
+            if table_name == 'services':
+                changed = [row[0] for row in rows]
+
+        return changed
+
+    # ---------------------------------------------------------------------
+    # LECTURES (même interface qu'AirtableClient)
+    # ---------------------------------------------------------------------
+
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> Dict:
+        record = {'id': row['record_id'], 'fields': json.loads(row['fields'])}
+        if 'created_time' in row.keys() and row['created_time']:
+            record['createdTime'] = row['created_time']
+        return record
+
+    def get_eligible_subscriptions(self) -> List[Dict]:
+        """Abonnements éligibles (mêmes critères que la formule Airtable)"""
+        rows = self._query(
+            "SELECT * FROM services WHERE categorie = 'Abonnement' "
+            "AND occurrences_restantes > 0 AND date_debut IS NOT NULL AND date_debut != ''"
+        )
+        return [self._to_record(row) for row in rows]
+
+    def get_due_subscriptions(self, today: Optional[date] = None) -> List[Dict]:
+        """
+        Abonnements éligibles arrivés à échéance (lecture par l'index next_due)
+
+        L'échéance est recalculée à chaque écriture d'un service (rafraîchissement
+        incrémental, mise à jour des compteurs) : seuls les k services dus sont
+        lus, sans parcourir toute la table. Les services sans échéance calculable
+        (date de début invalide) sont inclus pour être signalés par le plan.
+        """
+        cutoff = due_cutoff(today or date.today()).isoformat()
+        rows = self._query(
+            "SELECT * FROM services WHERE (next_due < ? OR next_due IS NULL) "
+            "AND categorie = 'Abonnement' AND occurrences_restantes > 0 "
+            "AND date_debut IS NOT NULL AND date_debut != ''",
+            (cutoff,)
+        )
+        return [self._to_record(row) for row in rows]
+
+    def get_billed_subscriptions(self) -> List[Dict]:
+        """Abonnements déjà facturés au moins une fois (terminés inclus)"""
+        rows = self._query(
+            "SELECT * FROM services WHERE categorie = 'Abonnement' "
+            "AND date_debut IS NOT NULL AND date_debut != ''"
+        )
+        records = [self._to_record(row) for row in rows]
+        return [record for record in records if (record['fields'].get('Mois facturés') or 0) > 0]
+
+    def get_discount_grids(self) -> List[Dict]:
+        """Champs de toutes les grilles de remise"""
+        rows = self._query("SELECT fields FROM grids")
+        return [json.loads(row['fields']) for row in rows]
+
+    def get_discount_grids_by_id(self) -> Dict[str, Dict]:
+        """Grilles de remise indexées par ID de record"""
+        rows = self._query("SELECT record_id, fields FROM grids")
+        return {row['record_id']: json.loads(row['fields']) for row in rows}
+
+    def get_default_grid(self) -> Optional[Dict]:
+        """Grille marquée 'Grille par défaut', None si aucune"""
+        row = self._query_one(
+            "SELECT fields FROM grids WHERE is_default = 1 LIMIT 1"
+        )
+        return json.loads(row['fields']) if row else None
+
+    def get_discount_grid(self, grid_id: str) -> Dict:
+        """Grille de remise par ID (repli sur Airtable si absente du miroir)"""
+        row = self._query_one(
+            "SELECT fields FROM grids WHERE record_id = ?", (grid_id,)
+        )
+        if row:
+            return json.loads(row['fields'])
+        return self.airtable.get_discount_grid(grid_id)
+
+    def get_service(self, record_id: str) -> Dict:
+        """Service par ID (repli sur Airtable si absent du miroir)"""
+        row = self._query_one(
+            "SELECT * FROM services WHERE record_id = ?", (record_id,)
+        )
+        if row:
+            return self._to_record(row)
+        return self.airtable.get_service(record_id)
+
+    def fetch_service(self, record_id: str) -> Dict:
+        """Relit un service dans Airtable et met à jour sa ligne du miroir"""
+        record = self.airtable.get_service(record_id)
+        row = self._service_row(record)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO services VALUES ({', '.join('?' * len(row))})",
+                row
+            )
+        return record
+
+    def get_services_by_client(self, client_id) -> List[Dict]:
+        """Tous les services d'un client Sellsy"""
+        rows = self._query(
+            "SELECT * FROM services WHERE client_id = ?", (str(client_id),)
+        )
+        return [self._to_record(row) for row in rows]
+
+    def get_services_by_grid(self, grid_id: str) -> List[Dict]:
+        """Tous les services liés à une grille de remise"""
+        rows = self._query(
+            "SELECT * FROM services WHERE grid_id = ?", (grid_id,)
+        )
+        return [self._to_record(row) for row in rows]
+
+    # ---------------------------------------------------------------------
+    # ÉCRITURES (Airtable puis miroir)
+    # ---------------------------------------------------------------------
+
+    def update_service_counters(self, record_id: str,
+                                mois_factures: int,
+                                occurrences_restantes: int) -> bool:
+        """
+        Met à jour les compteurs dans Airtable puis dans le miroir local
+
+        Returns:
+            True si la mise à jour a réussi
+        """
+        self.airtable.update_service_counters(record_id, mois_factures, occurrences_restantes)
+        self._apply_counters([{
+            'record_id': record_id,
+            'mois_factures': mois_factures,
+            'occurrences_restantes': occurrences_restantes,
+        }])
+        return True
+
+    def update_counters_batch(self, updates: List[Dict]) -> bool:
+        """
+        Met à jour les compteurs de plusieurs services (Airtable par lots, puis miroir)
+
+        Returns:
+            True si toutes les mises à jour ont réussi
+        """
+        self.airtable.update_counters_batch(updates)
+        self._apply_counters(updates)
+        return True
+
+    def _apply_counters(self, updates: List[Dict]):
+        with self._lock, self._conn:
+            for update in updates:
+                row = self._conn.execute(
+                    "SELECT * FROM services WHERE record_id = ?", (update['record_id'],)
+                ).fetchone()
+                if row:
+                    record = self._to_record(row)
+                    record['fields']['Mois facturés'] = update['mois_factures']
+                    record['fields']['Occurrences restantes'] = update['occurrences_restantes']
+                    row = self._service_row(record)
+                    self._conn.execute(
+                        f"INSERT OR REPLACE INTO services VALUES ({', '.join('?' * len(row))})",
+                        row
+                    )
@@ -0,0 +1,135 @@
+"""
+Disjoncteurs par famille d'endpoints (ex: "POST /invoices/{id}/validate")
+Échec immédiat quand une API est dégradée, au lieu d'attendre chaque timeout
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Appel refusé sans contacter l'API : le disjoncteur de l'endpoint est ouvert"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit ouvert pour {name} (nouvel essai dans {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+def is_failure_status(status: int) -> bool:
+    """Statuts signalant une API dégradée (les autres 4xx sont des erreurs de requête)"""
+    return status >= 500 or status == 429
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'une famille d'endpoints
+
+    - fermé : les appels passent ; `failure_threshold` échecs consécutifs
+      (erreur réseau, timeout, 5xx, 429) l'ouvrent ;
+    - ouvert : les appels échouent immédiatement (CircuitOpenError)
+      pendant `reset_timeout` secondes ;
+    - semi-ouvert : un seul appel d'essai passe, les autres échouent
+      toujours. Succès → fermé ; échec → ouvert pour un nouveau délai.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        # Appelé avec self._lock détenu
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+    def before_call(self):
+        """
+        Autorise ou refuse un appel
+
+        Raises:
+            CircuitOpenError: Circuit ouvert, ou essai semi-ouvert déjà en cours
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._state = HALF_OPEN
+                self._probing = True
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._probing = False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {'state': self._current_state(), 'failures': self._failures, 'rejected': self.rejected}
+
+
+class CircuitBreakerRegistry:
+    """Disjoncteurs créés à la demande, un par famille d'endpoints"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, self.failure_threshold, self.reset_timeout)
+                self._breakers[name] = breaker
+            return breaker
+
+    def find(self, name: str) -> Optional[CircuitBreaker]:
+        with self._lock:
+            return self._breakers.get(name)
+
+    def open_circuits(self) -> List[str]:
+        """Familles dont le circuit n'est pas fermé (ouvert ou en attente d'essai)"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return sorted(breaker.name for breaker in breakers if breaker.state != CLOSED)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.snapshot() for breaker in breakers}
@@ -0,0 +1,120 @@
+"""
+Budget de temps d'une exécution et timeouts HTTP adaptatifs
+L'échéance suit l'exécution jusque dans les threads de travail (contextvars)
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, Optional, TypeVar
+
+
+# Timeout minimal d'un appel, même à l'approche de l'échéance : un appel
+# commencé (ex: compteurs Airtable après création d'une facture) doit aboutir
+MIN_TIMEOUT = 5.0
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """
+    Échéance absolue d'une exécution
+
+    Horloge murale (time.time) : l'échéance calculée par le processus
+    parent reste valable dans les processus de shard.
+    """
+
+    def __init__(self, at: float):
+        self.at = at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.time() + seconds)
+
+    def remaining(self) -> float:
+        return self.at - time.time()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    @contextmanager
+    def activate(self) -> Iterator["Deadline"]:
+        """Échéance courante du contexte (et des tâches lancées via propagate())"""
+        token = current_deadline.set(self)
+        try:
+            yield self
+        finally:
+            current_deadline.reset(token)
+
+
+current_deadline: "contextvars.ContextVar[Optional[Deadline]]" = contextvars.ContextVar(
+    "current_deadline", default=None
+)
+
+
+def deadline_expired() -> bool:
+    """L'échéance courante est-elle dépassée ? (False sans échéance)"""
+    deadline = current_deadline.get()
+    return deadline is not None and deadline.expired()
+
+
+def cap_timeout(timeout: float) -> float:
+    """Timeout plafonné par le temps restant, sans descendre sous MIN_TIMEOUT"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return timeout
+    return max(MIN_TIMEOUT, min(timeout, deadline.remaining()))
+
+
+def propagate(fn: Callable[..., T]) -> Callable[..., T]:
+    """
+    Enveloppe fn pour l'exécuter dans un thread de pool avec le contexte
+    courant (échéance comprise) : ThreadPoolExecutor ne le transmet pas
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # Une copie par appel : un même contexte ne peut être actif dans deux threads
+        return context.copy().run(fn, *args, **kwargs)
+
+    return wrapper
+
+
+class AdaptiveTimeouts:
+    """
+    Timeouts par famille d'endpoints, dérivés des latences observées
+
+    Tant qu'une famille a moins de `min_samples` mesures, le timeout est
+    `default`. Ensuite : p99 des `window` dernières latences × `factor`,
+    borné entre MIN_TIMEOUT et `default`. Le résultat est enfin plafonné
+    par le temps restant avant l'échéance courante (cap_timeout).
+    """
+
+    def __init__(self, default: float = 30.0, factor: float = 4.0,
+                 window: int = 200, min_samples: int = 20):
+        self.default = default
+        self.factor = factor
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    def observe(self, key: str, seconds: float):
+        with self._lock:
+            latencies = self._latencies.get(key)
+            if latencies is None:
+                latencies = self._latencies[key] = deque(maxlen=self.window)
+            latencies.append(seconds)
+
+    def timeout_for(self, key: str) -> float:
+        with self._lock:
+            latencies = sorted(self._latencies.get(key, ()))
+        timeout = self.default
+        if len(latencies) >= self.min_samples:
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            timeout = max(MIN_TIMEOUT, min(self.default, p99 * self.factor))
+        return cap_timeout(timeout)
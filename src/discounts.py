@@ -0,0 +1,58 @@
+"""
+Logique des remises dégressives (grilles Airtable)
+Partagée par la synchronisation des factures et les prévisions de revenus
+"""
+
+from typing import Dict, Tuple
+
+
+def get_year_bucket(mois: int) -> int:
+    """
+    Retourne la tranche d'année d'un mois d'abonnement
+
+    Args:
+        mois: Numéro du mois facturé (1 = premier mois)
+
+    Returns:
+        1 (mois 1 à 12), 2 (mois 13 à 24) ou 3 (mois 25 et plus)
+    """
+    if mois <= 12:
+        return 1
+    if mois <= 24:
+        return 2
+    return 3
+
+
+_BUCKET_FIELDS = {
+    1: ('Année 1 (%)', 'Label Année 1'),
+    2: ('Année 2 (%)', 'Label Année 2'),
+    3: ('Année 3+ (%)', 'Label Année 3+'),
+}
+
+
+def get_discount_info(mois_ecoules: int, grid: Dict) -> Tuple[float, str]:
+    """
+    Récupère le pourcentage de remise et le label selon l'année en cours
+
+    Args:
+        mois_ecoules: Nombre de mois écoulés depuis le début
+        grid: Grille de remise (dict avec Année 1 (%), Label Année 1, etc.)
+
+    Returns:
+        Tuple (pourcentage de remise, label) ou (0, "") si pas de remise
+    """
+    pct_field, label_field = _BUCKET_FIELDS[get_year_bucket(mois_ecoules)]
+    pct = grid.get(pct_field, 0)
+    label = grid.get(label_field, '')
+
+    # Convertir en float et s'assurer que c'est un nombre valide
+    try:
+        pct = float(pct) if pct else 0
+    except (ValueError, TypeError):
+        pct = 0
+
+    # Ne retourner que si le pourcentage est > 0
+    if pct > 0 and label:
+        return (pct, label)
+    else:
+        return (0, "")
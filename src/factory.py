@@ -0,0 +1,86 @@
+"""
+Fabrique partagée des clients Sellsy et Airtable
+
+Les scripts et la CLI `sunlib` obtiennent ici une instance unique par
+processus, configurée depuis l'environnement (et le .env en local). Les
+modules lourds (requests, sqlite3...) ne sont importés qu'au premier appel.
+"""
+
+import os
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def load_env():
+    """Charge le fichier .env s'il existe (une seule fois)"""
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        # python-dotenv non installé (pas grave en production)
+        return
+    load_dotenv()
+
+
+@lru_cache(maxsize=None)
+def get_sellsy_client():
+    """
+    Retourne le client Sellsy v2 partagé du processus
+
+    Raises:
+        Exception: Si les identifiants OAuth2 sont absents
+    """
+    load_env()
+
+    client_id = os.getenv('SELLSY_V2_CLIENT_ID')
+    client_secret = os.getenv('SELLSY_V2_CLIENT_SECRET')
+    if not client_id or not client_secret:
+        raise Exception("Variables SELLSY_V2_CLIENT_ID et SELLSY_V2_CLIENT_SECRET manquantes")
+
+    from src.sellsy_client_v2 import SellsyClientV2
+    return SellsyClientV2(client_id=client_id, client_secret=client_secret)
+
+
+@lru_cache(maxsize=None)
+def get_airtable_client(use_mirror: bool = True):
+    """
+    Retourne le client Airtable partagé du processus
+
+    Args:
+        use_mirror: Enveloppe le client dans le miroir SQLite si AIRTABLE_MIRROR_PATH est défini
+    """
+    load_env()
+
+    from src.airtable_client import AirtableClient
+    airtable = AirtableClient(
+        api_key=os.getenv('AIRTABLE_API_KEY'),
+        base_id=os.getenv('AIRTABLE_BASE_ID'),
+        table_services=os.getenv('AIRTABLE_TABLE_NAME', 'service_sellsy'),
+        table_grilles=os.getenv('AIRTABLE_TABLE_GRILLES', 'grilles_remise')
+    )
+
+    mirror_path = os.getenv('AIRTABLE_MIRROR_PATH')
+    if use_mirror and mirror_path:
+        from src.airtable_mirror import AirtableMirror
+        airtable = AirtableMirror(airtable, mirror_path)
+
+    return airtable
+
+
+def open_airtable_mirror():
+    """
+    Ouvre un miroir SQLite dédié, hors du client partagé du processus
+
+    L'appelant le ferme quand il a terminé (close), sans affecter le
+    client retourné par get_airtable_client.
+
+    Returns:
+        AirtableMirror, ou None si AIRTABLE_MIRROR_PATH n'est pas défini
+    """
+    load_env()
+
+    mirror_path = os.getenv('AIRTABLE_MIRROR_PATH')
+    if not mirror_path:
+        return None
+
+    from src.airtable_mirror import AirtableMirror
+    return AirtableMirror(get_airtable_client(use_mirror=False), mirror_path)
@@ -0,0 +1,304 @@
+"""
+Prévision des revenus d'abonnement sur toute la durée des contrats
+Projection mois par mois des montants HT/TTC par client et au total
+"""
+
+from datetime import date
+from decimal import Decimal
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.discounts import get_discount_info
+from src.money import HUNDRED, apply_discount, quantize, to_decimal
+from src.subscription import Subscription, decode_subscriptions
+
+
+DEFAULT_GRID_KEY = '__default__'
+
+
+def _month_ordinal(year: int, month: int) -> int:
+    """Numéro de mois absolu (année * 12 + mois - 1)"""
+    return year * 12 + month - 1
+
+
+def _month_label(ordinal: int) -> str:
+    """Convertit un numéro de mois absolu en clé YYYY-MM"""
+    return f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+
+class RevenueForecast:
+    """
+    Projection des flux de facturation futurs des abonnements
+
+    Les tables de remise (par grille) et de montants (par grille, prix et
+    TVA) sont mémoïsées : des milliers d'abonnements partageant quelques
+    grilles et tarifs ne calculent chaque mois qu'une seule fois. Chaque
+    abonnement n'ajoute ensuite qu'un palier par tranche d'année.
+    """
+
+    def __init__(self, grids_by_id: Dict[str, Dict],
+                 default_grid: Optional[Dict] = None):
+        """
+        Initialise la prévision
+
+        Args:
+            grids_by_id: Grilles de remise indexées par ID de record Airtable
+            default_grid: Grille par défaut (utilisée sans grille spécifique)
+        """
+        self.grids_by_id = grids_by_id
+        self.default_grid = default_grid
+
+        self._discount_tables: Dict[Tuple[Optional[str], int], Tuple[float, ...]] = {}
+        self._amount_tables: Dict[Tuple, Tuple[Tuple[int, ...], Tuple[int, ...]]] = {}
+        self._segments: Dict[Tuple, Tuple[Tuple[int, int, int, int], ...]] = {}
+
+    # ---------------------------------------------------------------------
+    # TABLES MÉMOÏSÉES
+    # ---------------------------------------------------------------------
+
+    def _get_grid(self, grid_key: Optional[str]) -> Optional[Dict]:
+        if grid_key is None:
+            return None
+        if grid_key == DEFAULT_GRID_KEY:
+            return self.default_grid
+        return self.grids_by_id.get(grid_key)
+
+    def discount_table(self, grid_key: Optional[str], length: int) -> Tuple[float, ...]:
+        """
+        Retourne le pourcentage de remise de chaque mois 1..length pour une grille
+
+        Args:
+            grid_key: ID de la grille, DEFAULT_GRID_KEY ou None (pas de remise)
+            length: Nombre de mois de la table
+
+        Returns:
+            Tuple des pourcentages (index 0 = mois 1)
+        """
+        key = (grid_key, length)
+        table = self._discount_tables.get(key)
+        if table is None:
+            grid = self._get_grid(grid_key)
+            if grid is None:
+                table = (0.0,) * length
+            else:
+                table = tuple(
+                    float(get_discount_info(mois, grid)[0])
+                    for mois in range(1, length + 1)
+                )
+            self._discount_tables[key] = table
+        return table
+
+    def amount_table(self, grid_key: Optional[str], prix_ht,
+                     taux_tva, length: int) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        """
+        Retourne les montants HT et TTC facturés chaque mois 1..length
+
+        Les arrondis suivent ceux de la facturation (remise arrondie au centime
+        puis soustraite du prix HT). Les montants sont exprimés en centimes
+        entiers pour que les cumuls restent exacts.
+
+        Returns:
+            Tuple (centimes HT, centimes TTC), index 0 = mois 1
+        """
+        key = (grid_key, prix_ht, taux_tva, length)
+        tables = self._amount_tables.get(key)
+        if tables is None:
+            ht_by_pct: Dict[float, Tuple[int, int]] = {}
+            ht_table = []
+            ttc_table = []
+            for pct in self.discount_table(grid_key, length):
+                amounts = ht_by_pct.get(pct)
+                if amounts is None:
+                    _, prix_final = apply_discount(prix_ht, pct)
+                    prix_ttc = quantize(prix_final * (1 + to_decimal(taux_tva) / HUNDRED))
+                    amounts = (int(prix_final * 100), int(prix_ttc * 100))
+                    ht_by_pct[pct] = amounts
+                ht_table.append(amounts[0])
+                ttc_table.append(amounts[1])
+            tables = (tuple(ht_table), tuple(ttc_table))
+            self._amount_tables[key] = tables
+        return tables
+
+    def amount_segments(self, grid_key: Optional[str], prix_ht,
+                        taux_tva, length: int) -> Tuple[Tuple[int, int, int, int], ...]:
+        """
+        Compresse la table des montants en paliers de montant constant
+
+        Returns:
+            Tuple de (premier mois, dernier mois, centimes HT, centimes TTC)
+        """
+        key = (grid_key, prix_ht, taux_tva, length)
+        segments = self._segments.get(key)
+        if segments is None:
+            ht_table, ttc_table = self.amount_table(grid_key, prix_ht, taux_tva, length)
+            runs = []
+            for mois, (ht, ttc) in enumerate(zip(ht_table, ttc_table), start=1):
+                if runs and runs[-1][2] == ht and runs[-1][3] == ttc:
+                    runs[-1][1] = mois
+                else:
+                    runs.append([mois, mois, ht, ttc])
+            segments = tuple(tuple(run) for run in runs)
+            self._segments[key] = segments
+        return segments
+
+    def grid_key(self, fields: Dict) -> Optional[str]:
+        """Détermine la grille applicable (même priorité que la synchronisation)"""
+        if not fields.get('Appliquer remise dégressive', True):
+            return None
+        grille_id = fields.get('Grille de remise')
+        if grille_id and len(grille_id) > 0:
+            return grille_id[0] if grille_id[0] in self.grids_by_id else None
+        return DEFAULT_GRID_KEY if self.default_grid else None
+
+    @staticmethod
+    def decode(services: Iterable[Dict]) -> Tuple[List[Tuple[Dict, Subscription, Decimal]], List[Dict]]:
+        """
+        Décode les services comme pour la facturation, plus leur taux de TVA
+
+        Returns:
+            Tuple (services valides [(fields, subscription, taux_tva)],
+            services ignorés [{record_id, service_name, client_id, reason}])
+        """
+        services = list(services)
+        valid = []
+        skipped = []
+
+        for service, subscription in zip(services, decode_subscriptions(services)):
+            fields = service['fields']
+            problems = list(subscription.problems)
+            taux_tva = None
+            try:
+                taux_tva = to_decimal(fields.get('Taux TVA', 20) or 0)
+            except ValueError:
+                problems.append(f"Taux TVA invalide: {fields.get('Taux TVA')}")
+
+            if problems:
+                skipped.append({
+                    'record_id': subscription.record_id,
+                    'service_name': subscription.service_name,
+                    'client_id': subscription.client_id,
+                    'reason': f"Données incomplètes: {', '.join(problems)}",
+                })
+            else:
+                valid.append((fields, subscription, taux_tva))
+
+        return valid, skipped
+
+    # ---------------------------------------------------------------------
+    # PROJECTION
+    # ---------------------------------------------------------------------
+
+    def project(self, services: List[Dict], start: Optional[date] = None,
+                horizon: Optional[int] = None) -> Dict:
+        """
+        Projette les facturations restantes de chaque abonnement
+
+        Le mois N d'un abonnement est facturé N - 1 mois après sa date de
+        début ; les mois en retard sont ramenés sur le premier mois projeté.
+        Les services sont décodés comme pour la facturation : un service
+        incomplet ou invalide n'est pas projeté et figure dans skipped.
+
+        Args:
+            services: Records Airtable de la table service_sellsy
+            start: Premier mois de la projection (défaut: mois courant)
+            horizon: Nombre de mois projetés (défaut: jusqu'à la dernière échéance)
+
+        Returns:
+            Dictionnaire avec:
+                - months: Liste des mois (YYYY-MM)
+                - clients: {client_id: {ht, ttc, total_ht, total_ttc}}
+                - total: {ht, ttc, total_ht, total_ttc}
+                - skipped: [{record_id, service_name, client_id, reason}]
+        """
+        start = start or date.today()
+        start_ord = _month_ordinal(start.year, start.month)
+
+        # Décodage des abonnements : (client, grille, prix, tva, premier mois, dernier mois, base)
+        entries = []
+        last_index = 0
+        valid, skipped = self.decode(services)
+
+        for fields, subscription, taux_tva in valid:
+            restantes = subscription.occurrences_restantes
+            if restantes <= 0:
+                continue
+
+            base = _month_ordinal(subscription.date_debut.year, subscription.date_debut.month)
+            first = subscription.mois_factures + 1
+            last = subscription.mois_factures + restantes
+
+            entries.append((
+                subscription.client_id, self.grid_key(fields), subscription.prix_ht,
+                taux_tva, first, last, base,
+            ))
+            last_index = max(last_index, base + last - 1 - start_ord)
+
+        if horizon is None:
+            horizon = max(last_index + 1, 0)
+
+        # Tableaux de différences : chaque palier de la grille coûte 2 écritures
+        diffs: Dict[str, Tuple[List[int], List[int]]] = {}
+        total_ht = [0] * (horizon + 1)
+        total_ttc = [0] * (horizon + 1)
+
+        for client_id, grid_key, prix_ht, taux_tva, first, last, base in entries:
+            key = (grid_key, prix_ht, taux_tva, last)
+            arrays = diffs.get(client_id)
+            if arrays is None:
+                arrays = ([0] * (horizon + 1), [0] * (horizon + 1))
+                diffs[client_id] = arrays
+            ht, ttc = arrays
+
+            # Mois en retard : tous facturés sur le premier mois projeté
+            on_time = max(first, start_ord - base + 1)
+            if on_time > first and horizon > 0:
+                ht_table, ttc_table = self.amount_table(*key)
+                late_end = min(on_time, last + 1) - 1
+                late_ht = sum(ht_table[first - 1:late_end])
+                late_ttc = sum(ttc_table[first - 1:late_end])
+                for array, value in ((ht, late_ht), (total_ht, late_ht),
+                                     (ttc, late_ttc), (total_ttc, late_ttc)):
+                    array[0] += value
+                    array[1] -= value
+
+            # Mois à échéance : index = base + mois - 1 - start_ord
+            offset = base - 1 - start_ord
+            stop = min(last, horizon - offset - 1)
+            if stop < on_time:
+                continue
+
+            for seg_first, seg_last, seg_ht, seg_ttc in self.amount_segments(*key):
+                begin = max(seg_first, on_time)
+                end = min(seg_last, stop)
+                if begin > end:
+                    continue
+                begin += offset
+                end += offset + 1
+                for array, value in ((ht, seg_ht), (total_ht, seg_ht),
+                                     (ttc, seg_ttc), (total_ttc, seg_ttc)):
+                    array[begin] += value
+                    array[end] -= value
+
+        result_clients = {
+            client_id: self._summarize(ht, ttc, horizon)
+            for client_id, (ht, ttc) in diffs.items()
+        }
+
+        return {
+            'months': [_month_label(start_ord + index) for index in range(horizon)],
+            'clients': result_clients,
+            'total': self._summarize(total_ht, total_ttc, horizon),
+            'skipped': skipped,
+        }
+
+    @staticmethod
+    def _summarize(ht_diff: List[int], ttc_diff: List[int], horizon: int) -> Dict:
+        """Reconstruit les cumuls mensuels (centimes) et les convertit en euros"""
+        ht = list(accumulate(ht_diff))[:horizon]
+        ttc = list(accumulate(ttc_diff))[:horizon]
+        return {
+            'ht': [cents / 100 for cents in ht],
+            'ttc': [cents / 100 for cents in ttc],
+            'total_ht': sum(ht) / 100,
+            'total_ttc': sum(ttc) / 100,
+        }
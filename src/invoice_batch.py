@@ -0,0 +1,219 @@
+"""
+Création de factures Sellsy en lot
+Préparation commune (TVA, clients, moyens de paiement, lignes) puis envoi parallèle
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from src.deadline import deadline_expired, propagate
+
+logger = logging.getLogger(__name__)
+
+# Erreur d'une facture non envoyée car l'échéance du run est atteinte
+DEFERRED = "Reportée (échéance du run atteinte)"
+
+
+@dataclass
+class InvoiceJob:
+    """Facture à créer (lignes au format de create_grouped_invoice)"""
+
+    key: Hashable
+    client_id: int
+    lines: List[Dict[str, Any]]
+    payment_method_id: Optional[int] = None
+    payload: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class InvoiceResult:
+    """Résultat de l'envoi d'une facture"""
+
+    key: Hashable
+    client_id: int
+    invoice_id: Optional[int] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def deferred(self) -> bool:
+        return self.error == DEFERRED
+
+
+@dataclass
+class BatchReport:
+    """Rapport d'un envoi groupé, résultats dans l'ordre des factures ajoutées"""
+
+    results: List[InvoiceResult] = field(default_factory=list)
+    prepare_seconds: float = 0.0
+    submit_seconds: float = 0.0
+
+    @property
+    def created(self) -> List[InvoiceResult]:
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self) -> List[InvoiceResult]:
+        return [result for result in self.results if not result.ok and not result.deferred]
+
+    @property
+    def deferred(self) -> List[InvoiceResult]:
+        return [result for result in self.results if result.deferred]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total': len(self.results),
+            'created': len(self.created),
+            'failed': len(self.failed),
+            'deferred': len(self.deferred),
+            'prepare_seconds': round(self.prepare_seconds, 3),
+            'submit_seconds': round(self.submit_seconds, 3),
+            'results': [
+                {
+                    'key': result.key if isinstance(result.key, (str, int)) else list(result.key),
+                    'client_id': result.client_id,
+                    'invoice_id': result.invoice_id,
+                    'error': result.error,
+                    'elapsed': round(result.elapsed, 3),
+                }
+                for result in self.results
+            ],
+        }
+
+
+class InvoiceSubmitQueue:
+    """
+    File d'envoi de factures groupées
+
+    submit() prépare d'abord tout ce qui est commun au lot, une seule fois :
+    ID de TVA, types des clients (recherche groupée), moyens de paiement
+    (recherches parallèles) et corps de chaque facture. Seuls les POST
+    /invoices restent à faire ; ils partent en parallèle sur la session HTTP
+    du client (connexions keep-alive réutilisées), si bien que N factures
+    prennent environ N / max_workers allers-retours.
+    """
+
+    def __init__(self, client, max_workers: int = 4, resolve_clients: bool = True):
+        """
+        Initialise la file
+
+        Args:
+            client: Client Sellsy v2
+            max_workers: Nombre de créations simultanées
+            resolve_clients: False si l'appelant a déjà résolu les clients
+                (prefetch_clients) et leurs moyens de paiement : aucune
+                recherche n'est refaite, les clients introuvables compris
+        """
+        self.client = client
+        self.max_workers = max_workers
+        self.resolve_clients = resolve_clients
+        self._jobs: List[InvoiceJob] = []
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def add(self, client_id: int, lines: List[Dict[str, Any]],
+            payment_method_id: Optional[int] = None, key: Optional[Hashable] = None):
+        """
+        Ajoute une facture à la file
+
+        Args:
+            client_id: ID du client Sellsy
+            lines: Lignes (product_id, service_name, prix_ht, remise_pct, libelle_remise)
+            payment_method_id: Moyen de paiement (défaut: résolu par client.payment_methods)
+            key: Identifiant de la facture dans le rapport (défaut: position dans la file)
+        """
+        self._jobs.append(InvoiceJob(
+            key=len(self._jobs) if key is None else key,
+            client_id=int(client_id),
+            lines=lines,
+            payment_method_id=payment_method_id,
+        ))
+
+    def _prepare(self, results: Dict[Hashable, InvoiceResult]):
+        tva_id = self.client.get_tva_20_id()
+        if self.resolve_clients:
+            client_ids = {job.client_id for job in self._jobs}
+            try:
+                self.client.prefetch_clients(client_ids)
+            except Exception as e:
+                logger.warning(f"⚠️  Préchargement des clients impossible, résolution unitaire: {e}")
+            self.client.payment_methods.resolve_many(
+                job.client_id for job in self._jobs if job.payment_method_id is None
+            )
+
+        for job in self._jobs:
+            try:
+                job.payload, _ = self.client.build_grouped_invoice(
+                    job.client_id, job.lines, job.payment_method_id, tva_id=tva_id
+                )
+            except Exception as e:
+                results[job.key].error = f"Préparation: {e}"
+
+    def _submit_one(self, job: InvoiceJob, result: InvoiceResult,
+                    on_result: Optional[Callable[[InvoiceJob, InvoiceResult], None]]) -> InvoiceResult:
+        # Échéance atteinte : la facture n'est pas envoyée (reprise au prochain run)
+        if deadline_expired():
+            result.error = DEFERRED
+            return result
+
+        started = time.perf_counter()
+        try:
+            result.invoice_id = self.client.submit_invoice(job.payload)
+        except Exception as e:
+            result.error = str(e)
+        result.elapsed = time.perf_counter() - started
+
+        if on_result is not None:
+            try:
+                on_result(job, result)
+            except Exception as e:
+                # La facture existe : l'ID est conservé avec l'erreur
+                result.error = str(e)
+        return result
+
+    def submit(self, on_result: Optional[Callable[[InvoiceJob, InvoiceResult], None]] = None) -> BatchReport:
+        """
+        Prépare puis envoie toutes les factures de la file
+
+        Args:
+            on_result: Appelée dans le thread d'envoi après chaque facture
+                (ex: mise à jour des compteurs Airtable). Une exception levée
+                marque le résultat en erreur. Non appelée pour une facture
+                reportée faute de temps (échéance courante dépassée).
+
+        Returns:
+            Rapport du lot (la file est vidée)
+        """
+        report = BatchReport()
+        results = {job.key: InvoiceResult(key=job.key, client_id=job.client_id) for job in self._jobs}
+        report.results = list(results.values())
+        if not self._jobs:
+            return report
+
+        started = time.perf_counter()
+        try:
+            self._prepare(results)
+        except Exception as e:
+            for result in report.results:
+                result.error = result.error or f"Préparation: {e}"
+        report.prepare_seconds = time.perf_counter() - started
+
+        ready = [job for job in self._jobs if results[job.key].ok]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            submit_one = propagate(self._submit_one)
+            futures = [executor.submit(submit_one, job, results[job.key], on_result) for job in ready]
+            for future in as_completed(futures):
+                future.result()
+        report.submit_seconds = time.perf_counter() - started
+
+        self._jobs = []
+        return report
@@ -0,0 +1,149 @@
+"""
+Export en masse des factures Sellsy vers un fichier NDJSON compressé (gzip)
+Parcours paginé, récupération concurrente des détails et reprise sur incident
+"""
+
+import gzip
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from src.sellsy_client_v2 import SellsyClientV2
+
+
+class InvoiceExporter:
+    """
+    Exporte toutes les factures d'une période, une facture complète par ligne
+
+    Chaque page est écrite dans son propre fichier (<output_path>.parts/),
+    d'abord sous un nom temporaire puis renommé : un fichier de page est
+    complet ou absent. L'offset n'est enregistré dans le fichier d'état
+    qu'une fois la page en place, et une page réécrite après un arrêt
+    remplace la précédente au lieu de s'y ajouter. Une exécution
+    interrompue reprend donc à la page suivante, sans doublon ni gzip
+    tronqué. En fin d'export, les pages sont concaténées (un membre gzip
+    par page, ce que tous les lecteurs gzip savent lire) dans output_path.
+    """
+
+    def __init__(self, client: SellsyClientV2, output_path: str,
+                 state_path: Optional[str] = None,
+                 max_workers: int = 8, page_size: int = 100):
+        """
+        Initialise l'export
+
+        Args:
+            client: Client Sellsy v2
+            output_path: Fichier de sortie (.ndjson.gz)
+            state_path: Fichier d'état de reprise (défaut: <output_path>.state.json)
+            max_workers: Nombre de récupérations de détails en parallèle
+            page_size: Nombre de factures par page de recherche
+        """
+        self.client = client
+        self.output_path = output_path
+        self.state_path = state_path or f"{output_path}.state.json"
+        self.parts_dir = f"{output_path}.parts"
+        self.max_workers = max_workers
+        self.page_size = page_size
+
+    def _load_state(self, filters: Dict) -> Dict:
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("filters") == filters:
+                self._discard_parts(from_offset=state["offset"])
+                return state
+        # Nouvelle période : on repart de zéro
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return {"filters": filters, "offset": 0, "exported": 0, "completed": False}
+
+    def _save_state(self, state: Dict):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _part_files(self) -> List[str]:
+        if not os.path.isdir(self.parts_dir):
+            return []
+        return sorted(name for name in os.listdir(self.parts_dir) if name.endswith(".ndjson.gz"))
+
+    def _discard_parts(self, from_offset: int):
+        # Pages écrites mais non enregistrées dans l'état (arrêt avant _save_state)
+        # et fichiers temporaires d'une écriture interrompue
+        if not os.path.isdir(self.parts_dir):
+            return
+        for name in os.listdir(self.parts_dir):
+            if name.endswith(".tmp") or int(name.split(".", 1)[0]) >= from_offset:
+                os.remove(os.path.join(self.parts_dir, name))
+
+    def _write_part(self, offset: int, details: List[Dict]):
+        os.makedirs(self.parts_dir, exist_ok=True)
+        part_path = os.path.join(self.parts_dir, f"{offset:010d}.ndjson.gz")
+        tmp_path = f"{part_path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for detail in details:
+                f.write(json.dumps(detail, ensure_ascii=False))
+                f.write("\n")
+        os.replace(tmp_path, part_path)
+
+    def _assemble(self):
+        tmp_path = f"{self.output_path}.tmp"
+        with open(tmp_path, "wb") as out:
+            for name in self._part_files():
+                with open(os.path.join(self.parts_dir, name), "rb") as part:
+                    shutil.copyfileobj(part, out)
+        os.replace(tmp_path, self.output_path)
+
+    def _fetch_detail(self, invoice: Dict) -> Dict:
+        return self.client.get_invoice(invoice["id"])
+
+    def export(self, start_date: str, end_date: str,
+               progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Exporte les factures dont la date est comprise dans la période
+
+        Args:
+            start_date: Date de début (YYYY-MM-DD, incluse)
+            end_date: Date de fin (YYYY-MM-DD, incluse)
+            progress: Fonction appelée avec l'état après chaque page
+
+        Returns:
+            État final (offset, nombre de factures exportées, completed)
+        """
+        filters = {"date": {"start": start_date, "end": end_date}}
+        state = self._load_state(filters)
+
+        if state["completed"]:
+            shutil.rmtree(self.parts_dir, ignore_errors=True)
+            return state
+
+        pages = self.client.iter_pages(
+            "POST",
+            "/invoices/search",
+            data={"filters": filters},
+            params={"order": "date", "direction": "asc"},
+            page_size=self.page_size,
+            start_offset=state["offset"],
+        )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for page in pages:
+                details = list(executor.map(self._fetch_detail, page))
+                self._write_part(state["offset"], details)
+
+                state["offset"] += len(page)
+                state["exported"] += len(details)
+                self._save_state(state)
+
+                if progress:
+                    progress(state)
+
+        self._assemble()
+        state["completed"] = True
+        self._save_state(state)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return state
@@ -0,0 +1,232 @@
+"""
+Index inversé local des factures Sellsy (numéro, sujet, client)
+Rafraîchi de façon incrémentale via /invoices/search, persisté sur disque
+"""
+
+import json
+import os
+import re
+import unicodedata
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.sellsy_client_v2 import SellsyClientV2
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Longueur des n-grammes de l'index de sous-chaînes
+GRAM_SIZE = 3
+
+# Marge appliquée au filtre incrémental (décalage d'horloge Sellsy / local)
+REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def tokenize(text: str) -> List[str]:
+    """Découpe un texte en jetons minuscules sans accents"""
+    normalized = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+    return _TOKEN_RE.findall(normalized.lower())
+
+
+def grams(token: str) -> Set[str]:
+    """N-grammes d'un jeton (le jeton entier s'il est plus court)"""
+    if len(token) <= GRAM_SIZE:
+        return {token}
+    return {token[i:i + GRAM_SIZE] for i in range(len(token) - GRAM_SIZE + 1)}
+
+
+class InvoiceIndex:
+    """
+    Index de recherche des factures Sellsy
+
+    Chaque facture est résumée (id, numéro, date, statut, montant, sujet,
+    clients liés) et ses jetons sont indexés. Chaque mot recherché peut
+    apparaître n'importe où dans un jeton ("00123" trouve "FA00123") : un
+    index de trigrammes sur le vocabulaire limite la vérification aux
+    jetons candidats, sans appel réseau.
+    """
+
+    def __init__(self, path: str = "invoice_index.json"):
+        """
+        Initialise l'index (chargé depuis le disque s'il existe)
+
+        Args:
+            path: Fichier JSON de persistance de l'index
+        """
+        self.path = path
+        self.documents: Dict[str, Dict] = {}
+        self.last_refresh: Optional[str] = None
+
+        self._postings: Dict[str, Set[str]] = {}
+        self._doc_tokens: Dict[str, Set[str]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.last_refresh = data.get("last_refresh")
+            for document in data.get("documents", []):
+                self._add(document)
+
+    # ---------------------------------------------------------------------
+    # CONSTRUCTION
+    # ---------------------------------------------------------------------
+
+    @staticmethod
+    def summarize(invoice: Dict) -> Dict:
+        """Extrait les champs utiles d'une facture Sellsy"""
+        related = invoice.get("related", []) or []
+        clients = [
+            {"type": rel.get("type"), "id": rel.get("id"), "name": rel.get("name", "")}
+            for rel in related
+            if rel.get("type") in ("company", "individual")
+        ]
+        return {
+            "id": str(invoice.get("id", "")),
+            "number": invoice.get("number") or "",
+            "date": invoice.get("date") or "",
+            "status": invoice.get("status") or "",
+            "amount": (invoice.get("amounts") or {}).get("total_incl_tax", "0"),
+            "currency": invoice.get("currency", "EUR"),
+            "subject": invoice.get("subject") or "",
+            "clients": clients,
+        }
+
+    def _add(self, document: Dict):
+        doc_id = document["id"]
+        if doc_id in self.documents:
+            self._remove(doc_id)
+
+        tokens = {doc_id}
+        tokens.update(tokenize(document["number"]))
+        tokens.update(tokenize(document["subject"]))
+        for client in document["clients"]:
+            tokens.add(str(client["id"]))
+            tokens.update(tokenize(client.get("name", "")))
+
+        self.documents[doc_id] = document
+        self._doc_tokens[doc_id] = tokens
+        for token in tokens:
+            if token not in self._postings:
+                self._postings[token] = set()
+                for gram in grams(token):
+                    self._grams.setdefault(gram, set()).add(token)
+            self._postings[token].add(doc_id)
+
+    def _remove(self, doc_id: str):
+        for token in self._doc_tokens.pop(doc_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.discard(doc_id)
+                if not postings:
+                    del self._postings[token]
+                    for gram in grams(token):
+                        self._grams[gram].discard(token)
+                        if not self._grams[gram]:
+                            del self._grams[gram]
+        self.documents.pop(doc_id, None)
+
+    def add_invoices(self, invoices: Iterable[Dict]) -> int:
+        """
+        Ajoute ou remplace des factures dans l'index
+
+        Returns:
+            Nombre de factures indexées
+        """
+        count = 0
+        for invoice in invoices:
+            self._add(self.summarize(invoice))
+            count += 1
+        return count
+
+    def refresh(self, client: SellsyClientV2, full: bool = False) -> int:
+        """
+        Met à jour l'index depuis Sellsy (toutes les pages)
+
+        Le premier passage indexe tout l'historique ; les suivants ne
+        récupèrent que les factures modifiées depuis le dernier passage.
+
+        Args:
+            client: Client Sellsy v2
+            full: Force une reconstruction complète
+
+        Returns:
+            Nombre de factures (ré)indexées
+        """
+        started_at = datetime.now(timezone.utc)
+        filters = {}
+
+        if full:
+            self.documents.clear()
+            self._postings.clear()
+            self._doc_tokens.clear()
+            self._grams.clear()
+        elif self.last_refresh:
+            since = datetime.fromisoformat(self.last_refresh) - REFRESH_MARGIN
+            filters["updated"] = {"start": since.isoformat()}
+
+        count = self.add_invoices(client.search_invoices(filters))
+
+        self.last_refresh = started_at.isoformat()
+        self.save()
+        return count
+
+    def save(self):
+        """Persiste l'index sur disque"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"last_refresh": self.last_refresh, "documents": list(self.documents.values())},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, self.path)
+
+    # ---------------------------------------------------------------------
+    # RECHERCHE
+    # ---------------------------------------------------------------------
+
+    def _match_substring(self, term: str) -> Set[str]:
+        if len(term) < GRAM_SIZE:
+            # Terme trop court pour les trigrammes : parcours du vocabulaire
+            candidates: Iterable[str] = self._postings
+        else:
+            candidates = None
+            for gram in grams(term):
+                tokens = self._grams.get(gram, set())
+                candidates = tokens if candidates is None else candidates & tokens
+                if not candidates:
+                    return set()
+
+        matches: Set[str] = set()
+        for token in candidates:
+            if term in token:
+                matches |= self._postings[token]
+        return matches
+
+    def search(self, search_term: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Recherche les factures contenant chaque mot du terme (sous-chaîne d'un jeton)
+
+        Args:
+            search_term: Termes recherchés (numéro, sujet, ID ou nom du client)
+            limit: Nombre maximum de résultats
+
+        Returns:
+            Factures correspondantes, les plus récentes en premier
+        """
+        query_tokens = tokenize(search_term) if search_term else []
+
+        if query_tokens:
+            doc_ids: Optional[Set[str]] = None
+            for token in query_tokens:
+                matches = self._match_substring(token)
+                doc_ids = matches if doc_ids is None else doc_ids & matches
+                if not doc_ids:
+                    return []
+            documents = [self.documents[doc_id] for doc_id in doc_ids]
+        else:
+            documents = list(self.documents.values())
+
+        documents.sort(key=lambda doc: (doc["date"], doc["id"].zfill(12)), reverse=True)
+        return documents[:limit] if limit else documents
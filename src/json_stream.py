@@ -0,0 +1,147 @@
+"""
+Décodage incrémental des réponses JSON de liste (Airtable, Sellsy)
+Les éléments sont rendus au fil de la réception, sans charger le corps entier
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator
+
+
+# Taille des blocs lus sur la connexion HTTP
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class JsonListStream:
+    """
+    Réponse de liste décodée au fil de l'eau
+
+    Le corps attendu est un objet dont une clé contient la liste des
+    éléments ({"records": [...], "offset": ...} chez Airtable,
+    {"data": [...], "pagination": {...}} chez Sellsy). L'itération rend
+    chaque élément dès que ses octets sont arrivés ; seul l'élément en
+    cours de réception est gardé en mémoire, en plus du bloc lu.
+
+    Les autres clés de premier niveau (offset, pagination) sont décodées
+    entièrement et disponibles dans `extra` une fois l'itération terminée.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], array_key: str, response=None):
+        """
+        Initialise le flux
+
+        Args:
+            chunks: Blocs d'octets du corps (ex: response.iter_content())
+            array_key: Clé de premier niveau contenant les éléments
+            response: Réponse HTTP à fermer en fin de lecture (optionnel)
+        """
+        self.array_key = array_key
+        self.extra: Dict[str, Any] = {}
+        self.count = 0
+
+        self._chunks = iter(chunks)
+        self._response = response
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    @classmethod
+    def from_response(cls, response, array_key: str, chunk_size: int = CHUNK_SIZE) -> "JsonListStream":
+        """Flux sur une réponse requests ouverte avec stream=True"""
+        return cls(response.iter_content(chunk_size=chunk_size), array_key, response=response)
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            yield from self._parse()
+        finally:
+            if self._response is not None:
+                self._response.close()
+
+    # ---------------------------------------------------------------------
+    # ANALYSE
+    # ---------------------------------------------------------------------
+
+    def _parse(self) -> Iterator[Any]:
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+
+        while True:
+            key = self._value()
+            self._expect(":")
+
+            if key == self.array_key and self._peek() == "[":
+                self._pos += 1
+                if self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        item = self._value()
+                        self.count += 1
+                        yield item
+                        if self._separator("]"):
+                            break
+            else:
+                self.extra[key] = self._value()
+
+            if self._separator("}"):
+                return
+
+    def _fill(self) -> bool:
+        """Ajoute le bloc suivant au tampon ; False en fin de flux"""
+        if self._eof:
+            return False
+        for chunk in self._chunks:
+            text = self._text.decode(chunk)
+            if text:
+                self._buf = self._buf[self._pos:] + text
+                self._pos = 0
+                return True
+        self._buf = self._buf[self._pos:] + self._text.decode(b"", final=True)
+        self._pos = 0
+        self._eof = True
+        return False
+
+    def _peek(self) -> str:
+        """Prochain caractère significatif (espaces sautés), '' en fin de flux"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise json.JSONDecodeError(f"'{char}' attendu", self._buf, self._pos)
+        self._pos += 1
+
+    def _separator(self, closing: str) -> bool:
+        """Consomme ',' (False) ou le caractère fermant (True)"""
+        char = self._peek()
+        if char not in (",", closing):
+            raise json.JSONDecodeError(f"',' ou '{closing}' attendu", self._buf, self._pos)
+        self._pos += 1
+        return char == closing
+
+    def _value(self) -> Any:
+        """Décode la valeur suivante, en lisant autant de blocs que nécessaire"""
+        self._peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buf, self._pos)
+                # Une valeur qui touche la fin du tampon peut être tronquée (nombre)
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
@@ -0,0 +1,141 @@
+"""
+Registre des métadonnées Sellsy (taxes, moyens de paiement, devises)
+Chargées une fois puis conservées sur disque avec une durée de validité
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+# Endpoints chargés par le registre : section → endpoint de liste Sellsy
+SECTIONS = {
+    "taxes": "/taxes",
+    "payment_methods": "/payments/methods",
+    "currencies": "/currencies",
+}
+
+
+class MetadataRegistry:
+    """
+    Métadonnées de référence Sellsy partagées par tous les scripts
+
+    Les scripts de courte durée relisent le cache disque au lieu de
+    rappeler /taxes, /payments/methods et /currencies à chaque démarrage.
+    """
+
+    def __init__(self, client, cache_path: Optional[str] = None, ttl_hours: float = 24):
+        """
+        Initialise le registre
+
+        Args:
+            client: Client Sellsy v2 (utilisé uniquement si le cache est absent ou périmé)
+            cache_path: Fichier JSON de cache (optionnel, sinon mémoire seulement)
+            ttl_hours: Durée de validité du cache disque
+        """
+        self.client = client
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_hours * 3600
+
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, List[Dict[str, Any]]]] = None
+
+    # ---------------------------------------------------------------------
+    # CHARGEMENT
+    # ---------------------------------------------------------------------
+
+    def _read_cache(self) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - cached.get("loaded_at", 0) > self.ttl_seconds:
+            return None
+        return cached.get("sections")
+
+    def _write_cache(self, sections: Dict[str, List[Dict[str, Any]]]):
+        if not self.cache_path:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"loaded_at": time.time(), "sections": sections}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def load(self, force: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Charge les métadonnées (cache mémoire, puis disque, puis API)
+
+        Args:
+            force: Ignore les caches et recharge depuis l'API
+
+        Returns:
+            Dictionnaire {section: liste d'éléments}
+
+        Raises:
+            Exception: Si les taxes ne peuvent pas être chargées
+        """
+        with self._lock:
+            if self._data is not None and not force:
+                return self._data
+
+            sections = None if force else self._read_cache()
+
+            if sections is None:
+                sections = {}
+                for section, endpoint in SECTIONS.items():
+                    try:
+                        sections[section] = [
+                            item
+                            for page in self.client.iter_pages("GET", endpoint)
+                            for item in page
+                        ]
+                    except Exception:
+                        # Les taxes sont indispensables, le reste est facultatif
+                        if section == "taxes":
+                            raise
+                        sections[section] = []
+                self._write_cache(sections)
+
+            self._data = sections
+            return sections
+
+    # ---------------------------------------------------------------------
+    # ACCÈS
+    # ---------------------------------------------------------------------
+
+    def get_tax_id(self, rate: float) -> int:
+        """
+        Retourne l'ID de la taxe active pour un taux donné
+
+        Args:
+            rate: Taux en pourcentage (ex: 20, 10, 5.5)
+
+        Raises:
+            Exception: Si aucune taxe active ne correspond
+        """
+        for tax in self.load()["taxes"]:
+            if tax.get("is_active") and float(tax.get("rate", 0)) == float(rate):
+                return int(tax["id"])
+
+        raise Exception(f"TVA {rate:g}% non trouvée dans Sellsy")
+
+    def find_payment_method_id(self, name_contains: str) -> Optional[int]:
+        """ID du premier moyen de paiement dont le libellé contient le texte donné"""
+        needle = name_contains.lower()
+        for method in self.load()["payment_methods"]:
+            label = str(method.get("label") or method.get("name") or "").lower()
+            if needle in label:
+                return int(method["id"])
+        return None
+
+    def get_currency(self, code: str) -> Optional[Dict[str, Any]]:
+        """Devise Sellsy par code ISO (ex: EUR)"""
+        for currency in self.load()["currencies"]:
+            if str(currency.get("code") or currency.get("id", "")).upper() == code.upper():
+                return currency
+        return None
@@ -0,0 +1,129 @@
+"""
+Calculs monétaires en Decimal arrondis au centime (arrondi commercial)
+Mêmes montants que Sellsy : chaque ligne est arrondie, les totaux sont des sommes de lignes
+"""
+
+from decimal import Decimal, DecimalTuple, InvalidOperation, ROUND_HALF_UP
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Tuple
+
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+HUNDRED = Decimal('100')
+
+
+def to_decimal(value) -> Decimal:
+    """
+    Convertit un montant Airtable / CSV / Sellsy en Decimal exact
+
+    Accepte les nombres, les Decimal et les chaînes avec virgule décimale,
+    espaces (y compris insécables) et symbole € ("57,92", "1 234,50 €").
+
+    Raises:
+        ValueError: Si la valeur n'est pas un montant
+    """
+    if value is None or value == '':
+        return Decimal('0')
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, bool):
+        raise ValueError(f"Montant invalide: {value!r}")
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        # repr() donne le plus court décimal équivalent (57.92 et non 57.9200000000000017)
+        return Decimal(repr(value))
+
+    text = str(value).strip().replace('€', '')
+    for space in (' ', '\u00a0', '\u202f'):
+        text = text.replace(space, '')
+    text = text.replace(',', '.')
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"Montant invalide: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Montant invalide: {value!r}")
+    return amount
+
+
+def quantize(value: Decimal) -> Decimal:
+    """Arrondit au centime (demi-centime arrondi au-dessus, comme Sellsy)"""
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def format_amount(value) -> str:
+    """Montant au format attendu par l'API Sellsy ("57.92")"""
+    return str(quantize(to_decimal(value)))
+
+
+def to_cents(value) -> int:
+    """Montant arrondi en centimes entiers"""
+    return int(quantize(to_decimal(value)) * 100)
+
+
+@lru_cache(maxsize=4096)
+def _discount_exact(prix_ht: DecimalTuple, remise_pct: DecimalTuple) -> Tuple[Decimal, Decimal]:
+    prix = Decimal(prix_ht)
+    montant_remise = quantize(prix * Decimal(remise_pct) / HUNDRED)
+    return montant_remise, quantize(prix) - montant_remise
+
+
+def _discount(prix_ht: Decimal, remise_pct: Decimal) -> Tuple[Decimal, Decimal]:
+    # Cache indexé sur as_tuple() : Decimal('0') et Decimal('-0.00') sont égaux
+    # mais n'ont ni le même signe ni le même exposant
+    return _discount_exact(prix_ht.as_tuple(), remise_pct.as_tuple())
+
+
+def apply_discount(prix_ht, remise_pct) -> Tuple[Decimal, Decimal]:
+    """
+    Calcule la remise d'une ligne
+
+    Args:
+        prix_ht: Prix HT avant remise
+        remise_pct: Pourcentage de remise
+
+    Returns:
+        Tuple (montant de la remise, prix HT final), arrondis au centime
+    """
+    return _discount(to_decimal(prix_ht), to_decimal(remise_pct))
+
+
+class PricedLine(NamedTuple):
+    prix_ht: Decimal
+    remise_pct: Decimal
+    montant_remise: Decimal
+    prix_final: Decimal
+
+
+class PricedLines(NamedTuple):
+    lines: List[PricedLine]
+    total_ht: Decimal
+    total_remise: Decimal
+
+
+def price_lines(lines: Iterable[Tuple]) -> PricedLines:
+    """
+    Arrondit en lot des lignes (prix HT, % de remise)
+
+    Les lignes au même tarif et à la même remise partagent le même calcul
+    (cache) ; les totaux sont la somme exacte des lignes arrondies, comme
+    sur la facture Sellsy.
+
+    Returns:
+        PricedLines (lignes arrondies, total HT final, total des remises)
+    """
+    priced = []
+    total_ht = ZERO
+    total_remise = ZERO
+
+    for prix_ht, remise_pct in lines:
+        prix = to_decimal(prix_ht)
+        pct = to_decimal(remise_pct)
+        montant_remise, prix_final = _discount(prix, pct)
+        priced.append(PricedLine(quantize(prix), pct, montant_remise, prix_final))
+        total_ht += prix_final
+        total_remise += montant_remise
+
+    return PricedLines(priced, total_ht, total_remise)
@@ -0,0 +1,157 @@
+"""
+Résolution du moyen de paiement (mandat GoCardless) de chaque client Sellsy
+Recherches concurrentes, résultat mis en cache par client
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from src.deadline import propagate
+
+
+# Statuts GoCardless d'un mandat permettant de prélever
+ACTIVE_MANDATE_STATUSES = frozenset({"pending_submission", "submitted", "active"})
+
+# Statuts GoCardless d'un mandat inutilisable
+INACTIVE_MANDATE_STATUSES = frozenset({
+    "pending_customer_approval", "failed", "cancelled", "expired",
+    "consumed", "blocked", "suspended_by_payer",
+})
+
+# Champs portant le statut du mandat (moyen de paiement ou fiche client),
+# en plus d'un objet {"mandate": {"status": ...}}
+MANDATE_STATUS_FIELDS = ("mandate_status", "gocardless_mandate_status")
+
+
+class PaymentMethodResolver:
+    """
+    Moyen de paiement à rattacher aux factures d'un client
+
+    Ordre de résolution pour un client :
+    1. ID_Moyen_Paiement_GoCardless renseigné sur ses services Airtable
+       (fourni via prime(), aucun appel réseau) ;
+    2. mandat actif dans Sellsy (statut lu sur les moyens de paiement du
+       client, sinon sur la fiche client) → moyen de paiement GoCardless
+       du compte ;
+    3. aucun : la facture est créée sans moyen de paiement, comme avant.
+       C'est aussi le cas quand le statut du mandat est absent ou inconnu :
+       le mandat n'est jamais deviné.
+
+    Les clients inconnus sont recherchés en parallèle ; chaque client n'est
+    résolu qu'une fois par processus.
+    """
+
+    def __init__(self, client, max_workers: int = 8):
+        """
+        Initialise le résolveur
+
+        Args:
+            client: Client Sellsy v2
+            max_workers: Nombre de recherches en parallèle
+        """
+        self.client = client
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self._cache: Dict[int, Optional[int]] = {}
+        # Endpoint des moyens de paiement par client : désactivé au premier 404
+        self._client_endpoint_available = True
+
+    def prime(self, payment_ids: Dict) -> None:
+        """
+        Enregistre les moyens de paiement déjà connus (champ Airtable)
+
+        Args:
+            payment_ids: ID client Sellsy → ID du moyen de paiement
+        """
+        with self._lock:
+            for client_id, payment_id in payment_ids.items():
+                if payment_id:
+                    self._cache[int(client_id)] = int(payment_id)
+
+    def get(self, client_id) -> Optional[int]:
+        """Moyen de paiement d'un client (recherché si absent du cache)"""
+        client_id = int(client_id)
+        if client_id not in self._cache:
+            payment_id = self._lookup(client_id)
+            with self._lock:
+                self._cache.setdefault(client_id, payment_id)
+        return self._cache[client_id]
+
+    def resolve_many(self, client_ids: Iterable) -> Dict[int, Optional[int]]:
+        """
+        Résout un lot de clients, les recherches manquantes en parallèle
+
+        Returns:
+            ID client → ID du moyen de paiement (None si aucun mandat)
+        """
+        wanted = {int(client_id) for client_id in client_ids}
+        pending = sorted(wanted - set(self._cache))
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                found = dict(zip(pending, executor.map(propagate(self._lookup), pending)))
+            with self._lock:
+                for client_id, payment_id in found.items():
+                    self._cache.setdefault(client_id, payment_id)
+        return {client_id: self._cache[client_id] for client_id in wanted}
+
+    # ---------------------------------------------------------------------
+    # RECHERCHE SELLSY
+    # ---------------------------------------------------------------------
+
+    def _lookup(self, client_id: int) -> Optional[int]:
+        try:
+            info = self.client.get_client_info(client_id)
+        except Exception:
+            return None
+
+        if self._has_mandate(client_id, info):
+            try:
+                return self.client.get_gocardless_payment_id()
+            except Exception:
+                return None
+        return None
+
+    def _has_mandate(self, client_id: int, info: Dict) -> Optional[bool]:
+        if self._client_endpoint_available:
+            try:
+                methods = self.client.get_client_payment_methods(client_id, info.get("_entity_type"))
+            except Exception:
+                methods = []
+            if methods is None:
+                self._client_endpoint_available = False
+            else:
+                active = has_active_mandate(methods)
+                if active is not None:
+                    return active
+
+        # Repli : statut du mandat sur la fiche client
+        return has_active_mandate([info])
+
+
+def mandate_status(data: Dict) -> Optional[str]:
+    """Statut du mandat porté par un moyen de paiement ou une fiche client"""
+    mandate = data.get("mandate")
+    if isinstance(mandate, dict) and mandate.get("status"):
+        return str(mandate["status"]).strip().lower()
+    for field in MANDATE_STATUS_FIELDS:
+        if data.get(field):
+            return str(data[field]).strip().lower()
+    return None
+
+
+def has_active_mandate(items: List[Dict]) -> Optional[bool]:
+    """
+    Un des éléments porte-t-il un mandat actif ?
+
+    Returns:
+        True si un statut est actif, False si tous les statuts trouvés sont
+        inactifs, None si aucun statut connu (cas ambigu : pas de mandat)
+    """
+    statuses = [mandate_status(item) for item in items if isinstance(item, dict)]
+    if any(status in ACTIVE_MANDATE_STATUSES for status in statuses):
+        return True
+    if any(status in INACTIVE_MANDATE_STATUSES for status in statuses):
+        return False
+    return None
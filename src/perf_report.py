@@ -0,0 +1,229 @@
+"""
+Rapport de performance d'une exécution de la synchronisation
+Durée par phase, appels API (nombre, latences p50/p95) et budgets de régression
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+
+# Phases de la synchronisation, dans l'ordre du rapport. create et validate
+# sont des durées murales ; counters et email cumulent les appels faits en
+# parallèle dans les threads d'envoi et de validation.
+PHASES = ("fetch", "group", "create", "counters", "validate", "email")
+
+# Métriques pouvant recevoir un budget (PERF_BUDGETS / --perf-budgets)
+BUDGET_METRICS = (
+    "total_seconds",
+    "api_calls_per_invoice",
+    "sellsy_calls_per_invoice",
+    "airtable_calls_per_invoice",
+    "p50_ms",
+    "p95_ms",
+) + tuple(f"{phase}_seconds" for phase in PHASES)
+
+# En dessous de ce nombre de factures créées, les budgets "par facture" ne
+# sont pas vérifiés : les appels fixes d'un run (token OAuth, TVA, miroir,
+# grilles, moyens de paiement) dominent le ratio les jours creux
+MIN_INVOICES_FOR_RATIOS = 20
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class ApiCall(NamedTuple):
+    service: str
+    method: str
+    endpoint: str
+    seconds: float
+    status: Optional[int]
+
+
+def endpoint_family(endpoint: str) -> str:
+    """/invoices/123/validate → /invoices/{id}/validate"""
+    return _ID_SEGMENT.sub("/{id}", endpoint.split("?", 1)[0])
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentile au rang le plus proche (None si aucune valeur)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def parse_budgets(spec: Optional[str]) -> Dict[str, float]:
+    """
+    Lit des budgets au format "métrique=max,métrique=max"
+
+    Raises:
+        ValueError: Métrique inconnue ou valeur invalide
+    """
+    budgets = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if name not in BUDGET_METRICS:
+            raise ValueError(f"Budget inconnu '{name}' (attendu: {', '.join(BUDGET_METRICS)})")
+        budgets[name] = float(value)
+    return budgets
+
+
+def report_path(report_dir: str, shard_index: int = 0, shard_count: int = 1) -> str:
+    return os.path.join(report_dir, f"perf-{shard_index}-of-{shard_count}.json")
+
+
+class PerfRecorder:
+    """
+    Mesures d'une exécution (thread-safe)
+
+    Les phases sont chronométrées par le synchroniseur (phase()), les appels
+    API par les clients Airtable et Sellsy via record_api_call(), tant que
+    l'enregistreur est actif (activate()). Les réponses servies par un
+    cache local ne sont pas des appels API.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}
+        self.calls: List[ApiCall] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Chronomètre un bloc et l'ajoute à la phase"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.phases.setdefault(name, []).append(elapsed)
+
+    def record_call(self, service: str, method: str, endpoint: str,
+                    seconds: float, status: Optional[int] = None):
+        with self._lock:
+            self.calls.append(ApiCall(service, method, endpoint_family(endpoint), seconds, status))
+
+    @contextmanager
+    def activate(self) -> Iterator["PerfRecorder"]:
+        """Rend l'enregistreur actif pour le processus (tous les threads)"""
+        global _active
+        previous, _active = _active, self
+        try:
+            yield self
+        finally:
+            _active = previous
+
+    # ---------------------------------------------------------------------
+    # RAPPORT
+    # ---------------------------------------------------------------------
+
+    @staticmethod
+    def _latency(calls: List[ApiCall]) -> Dict:
+        latencies = [call.seconds * 1000 for call in calls]
+        p50, p95 = percentile(latencies, 50), percentile(latencies, 95)
+        return {
+            "calls": len(calls),
+            "errors": sum(1 for call in calls if call.status is None or call.status >= 400),
+            "p50_ms": round(p50, 1) if p50 is not None else None,
+            "p95_ms": round(p95, 1) if p95 is not None else None,
+        }
+
+    def report(self, summary: Dict, budgets: Optional[Dict[str, float]] = None,
+               min_invoices: int = MIN_INVOICES_FOR_RATIOS, **context) -> Dict:
+        """
+        Construit le rapport de l'exécution
+
+        Args:
+            summary: Résumé de run() (services, groups, created, validated, errors)
+            budgets: Maximum autorisé par métrique (voir BUDGET_METRICS)
+            min_invoices: Factures créées requises pour vérifier les budgets *_per_invoice
+            **context: Informations ajoutées telles quelles (shard, dry_run...)
+
+        Returns:
+            Rapport JSON-sérialisable, dépassements dans budget_failures,
+            budgets non vérifiés dans budgets_skipped
+        """
+        with self._lock:
+            calls = list(self.calls)
+            phases = {name: list(spans) for name, spans in self.phases.items()}
+
+        created = summary.get("created", 0)
+        by_service: Dict[str, List[ApiCall]] = {}
+        by_endpoint: Dict[str, List[ApiCall]] = {}
+        for call in calls:
+            by_service.setdefault(call.service, []).append(call)
+            by_endpoint.setdefault(f"{call.service} {call.method} {call.endpoint}", []).append(call)
+
+        def per_invoice(count: int) -> Optional[float]:
+            return round(count / created, 2) if created else None
+
+        api = self._latency(calls)
+        metrics = {
+            "total_seconds": round(time.perf_counter() - self._started, 3),
+            "api_calls_per_invoice": per_invoice(len(calls)),
+            "sellsy_calls_per_invoice": per_invoice(len(by_service.get("sellsy", []))),
+            "airtable_calls_per_invoice": per_invoice(len(by_service.get("airtable", []))),
+            "p50_ms": api["p50_ms"],
+            "p95_ms": api["p95_ms"],
+        }
+        for name in PHASES:
+            metrics[f"{name}_seconds"] = round(sum(phases.get(name, [])), 3)
+
+        budgets = budgets or {}
+        skipped = [] if created >= min_invoices else [
+            name for name in budgets if name.endswith("_per_invoice")
+        ]
+        failures = [
+            f"{name} = {metrics[name]} > {limit}"
+            for name, limit in budgets.items()
+            if name not in skipped and metrics.get(name) is not None and metrics[name] > limit
+        ]
+
+        return {
+            **context,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "summary": summary,
+            "metrics": metrics,
+            "phases": {
+                name: {"seconds": round(sum(phases[name]), 3), "count": len(phases[name])}
+                for name in PHASES if name in phases
+            },
+            "api": {
+                **api,
+                "by_service": {name: self._latency(items) for name, items in sorted(by_service.items())},
+                "by_endpoint": {name: self._latency(items) for name, items in sorted(by_endpoint.items())},
+            },
+            "budgets": budgets,
+            "budget_failures": failures,
+            "budgets_skipped": skipped,
+        }
+
+
+_active: Optional[PerfRecorder] = None
+
+
+def record_api_call(service: str, method: str, endpoint: str,
+                    seconds: float, status: Optional[int] = None):
+    """Enregistre un appel API sur l'enregistreur actif (sans effet sinon)"""
+    recorder = _active
+    if recorder is not None:
+        recorder.record_call(service, method, endpoint, seconds, status)
+
+
+def write_report(report: Dict, path: str):
+    """Écrit le rapport JSON (dossier créé si besoin)"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,165 @@
+"""
+Artefacts du plan de facturation : JSON complet, CSV des lignes et diff avec le plan précédent
+Relus par --from-plan pour exécuter un plan validé sans le recalculer
+"""
+
+import csv
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from src.planner import InvoicePlan
+
+
+CSV_COLUMNS = [
+    'client_id', 'billing_month', 'record_id', 'service_name', 'product_id', 'mois',
+    'prix_ht', 'remise_pct', 'libelle_remise', 'montant_remise', 'prix_final', 'grid_name',
+    'mois_factures_avant', 'mois_factures', 'occurrences_avant', 'occurrences_restantes',
+    'late_months', 'warning',
+]
+
+
+def plan_paths(plan_dir: str, index: int = 0, count: int = 1) -> Dict[str, str]:
+    """Chemins des artefacts d'un shard (même nommage que les journaux)"""
+    base = os.path.join(plan_dir, f"plan-{index}-of-{count}")
+    return {'json': f"{base}.json", 'csv': f"{base}.csv", 'diff': f"{base}.diff.json"}
+
+
+def load_plan(path: str) -> InvoicePlan:
+    """
+    Charge un plan écrit par write_plan_artifacts
+
+    Raises:
+        FileNotFoundError: Si le fichier n'existe pas
+        KeyError, ValueError: Si le fichier n'est pas un plan valide
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return InvoicePlan.from_dict(json.load(f))
+
+
+def _write_json(path: str, data: Dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _write_csv(path: str, plan: InvoicePlan):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for invoice in plan.invoices:
+            for line, update in zip(invoice.lines, invoice.updates):
+                writer.writerow({
+                    'client_id': invoice.client_id,
+                    'billing_month': invoice.billing_month,
+                    'record_id': line.record_id,
+                    'service_name': line.service_name,
+                    'product_id': line.product_id,
+                    'mois': line.mois,
+                    'prix_ht': line.prix_ht,
+                    'remise_pct': line.remise_pct,
+                    'libelle_remise': line.libelle_remise,
+                    'montant_remise': line.montant_remise,
+                    'prix_final': line.prix_final,
+                    'grid_name': line.grid_name or '',
+                    'mois_factures_avant': update.mois_factures_avant,
+                    'mois_factures': update.mois_factures,
+                    'occurrences_avant': update.occurrences_avant,
+                    'occurrences_restantes': update.occurrences_restantes,
+                    'late_months': line.late_months,
+                    'warning': line.warning or '',
+                })
+    os.replace(tmp_path, path)
+
+
+def _line_signature(line: Dict) -> Tuple:
+    return (line['mois'], line['prix_ht'], line['remise_pct'], line['libelle_remise'], line['prix_final'])
+
+
+def diff_plans(previous: Optional[Dict], current: Dict) -> Dict:
+    """
+    Compare deux plans sérialisés (InvoicePlan.to_dict)
+
+    Les factures sont appariées par (client, mois de facturation), les
+    lignes par ID de record Airtable.
+
+    Returns:
+        Factures ajoutées, retirées, modifiées (détail par ligne) et nombre d'inchangées
+    """
+    diff = {
+        'previous_today': previous['today'] if previous else None,
+        'today': current['today'],
+        'added': [],
+        'removed': [],
+        'changed': [],
+        'unchanged': 0,
+    }
+    before = {(inv['client_id'], inv['billing_month']): inv for inv in (previous or {}).get('invoices', [])}
+    after = {(inv['client_id'], inv['billing_month']): inv for inv in current['invoices']}
+
+    for key in sorted(after.keys() - before.keys()):
+        diff['added'].append({'client_id': key[0], 'billing_month': key[1], 'total_ht': after[key]['total_ht']})
+    for key in sorted(before.keys() - after.keys()):
+        diff['removed'].append({'client_id': key[0], 'billing_month': key[1], 'total_ht': before[key]['total_ht']})
+
+    for key in sorted(after.keys() & before.keys()):
+        old_lines = {line['record_id']: line for line in before[key]['lines']}
+        new_lines = {line['record_id']: line for line in after[key]['lines']}
+        lines: List[Dict] = []
+        for record_id in sorted(old_lines.keys() | new_lines.keys()):
+            old, new = old_lines.get(record_id), new_lines.get(record_id)
+            if old and new and _line_signature(old) == _line_signature(new):
+                continue
+            lines.append({
+                'record_id': record_id,
+                'avant': {k: old[k] for k in ('mois', 'prix_final', 'libelle_remise')} if old else None,
+                'apres': {k: new[k] for k in ('mois', 'prix_final', 'libelle_remise')} if new else None,
+            })
+
+        if lines or before[key]['total_ht'] != after[key]['total_ht']:
+            diff['changed'].append({
+                'client_id': key[0],
+                'billing_month': key[1],
+                'total_ht_avant': before[key]['total_ht'],
+                'total_ht': after[key]['total_ht'],
+                'lines': lines,
+            })
+        else:
+            diff['unchanged'] += 1
+
+    return diff
+
+
+def write_plan_artifacts(plan: InvoicePlan, plan_dir: str, index: int = 0, count: int = 1) -> Dict:
+    """
+    Écrit le plan (JSON + CSV) et son diff avec le plan précédent du même shard
+
+    Args:
+        plan: Plan calculé
+        plan_dir: Dossier des artefacts
+        index: Numéro du shard
+        count: Nombre total de shards
+
+    Returns:
+        Diff avec le plan précédent (previous_today = None au premier plan)
+    """
+    os.makedirs(plan_dir, exist_ok=True)
+    paths = plan_paths(plan_dir, index, count)
+
+    previous = None
+    if os.path.exists(paths['json']):
+        try:
+            with open(paths['json'], 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        except ValueError:
+            previous = None
+
+    current = plan.to_dict()
+    diff = diff_plans(previous, current)
+
+    _write_json(paths['json'], current)
+    _write_csv(paths['csv'], plan)
+    _write_json(paths['diff'], diff)
+    return diff
@@ -0,0 +1,305 @@
+"""
+Planification des factures d'abonnement (phase pure, sans appel réseau)
+Transforme les abonnements éligibles en un plan immuable : factures, lignes, remises, compteurs
+"""
+
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.discounts import get_discount_info
+from src.money import ZERO, price_lines, to_decimal
+from src.subscription import Subscription
+
+
+@dataclass(frozen=True, slots=True)
+class PlannedLine:
+    """Ligne produit d'une facture, avec sa remise éventuelle"""
+
+    record_id: str
+    service_name: str
+    product_id: int
+    mois: int
+    prix_ht: Decimal
+    remise_pct: Decimal
+    libelle_remise: str
+    montant_remise: Decimal
+    prix_final: Decimal
+    grid_name: Optional[str]
+    late_months: int
+    warning: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class CounterUpdate:
+    """Compteurs Airtable d'un service après facturation"""
+
+    record_id: str
+    mois_factures_avant: int
+    mois_factures: int
+    occurrences_avant: int
+    occurrences_restantes: int
+
+
+@dataclass(frozen=True, slots=True)
+class PlannedInvoice:
+    """Facture groupée d'un client pour un mois de facturation"""
+
+    client_id: str
+    billing_month: str
+    lines: Tuple[PlannedLine, ...]
+    updates: Tuple[CounterUpdate, ...]
+    total_ht: Decimal
+    total_remise: Decimal
+    payment_method_id: Optional[int] = None
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.client_id, self.billing_month
+
+    def sellsy_lines(self) -> List[Dict]:
+        """Lignes au format attendu par SellsyClientV2.create_grouped_invoice"""
+        return [
+            {
+                'product_id': line.product_id,
+                'service_name': line.service_name,
+                'prix_ht': line.prix_ht,
+                'remise_pct': line.remise_pct,
+                'libelle_remise': line.libelle_remise,
+            }
+            for line in self.lines
+        ]
+
+
+@dataclass(frozen=True, slots=True)
+class SkippedService:
+    """Service éligible non facturé, avec la raison"""
+
+    record_id: str
+    service_name: str
+    client_id: Optional[str]
+    billing_month: Optional[str]
+    reason: str
+
+
+@dataclass(frozen=True, slots=True)
+class InvoicePlan:
+    """Plan complet d'une exécution"""
+
+    today: date
+    invoices: Tuple[PlannedInvoice, ...]
+    skipped: Tuple[SkippedService, ...]
+
+    @property
+    def service_count(self) -> int:
+        return sum(len(invoice.lines) for invoice in self.invoices) + len(self.skipped)
+
+    def select(self, client_filter: Callable[[Optional[str]], bool]) -> 'InvoicePlan':
+        """Sous-plan limité aux clients acceptés par le filtre (ex: un shard)"""
+        return InvoicePlan(
+            today=self.today,
+            invoices=tuple(invoice for invoice in self.invoices if client_filter(invoice.client_id)),
+            skipped=tuple(skip for skip in self.skipped if client_filter(skip.client_id)),
+        )
+
+    def without(self, keys: Iterable[Tuple[str, str]]) -> 'InvoicePlan':
+        """Plan sans les factures (client_id, mois) données"""
+        excluded = set(keys)
+        return InvoicePlan(
+            today=self.today,
+            invoices=tuple(invoice for invoice in self.invoices if invoice.key not in excluded),
+            skipped=self.skipped,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plan sérialisable en JSON (montants en chaînes, sans perte de précision)"""
+        return {
+            'today': self.today.isoformat(),
+            'invoices': [
+                {
+                    'client_id': invoice.client_id,
+                    'billing_month': invoice.billing_month,
+                    'total_ht': str(invoice.total_ht),
+                    'total_remise': str(invoice.total_remise),
+                    'payment_method_id': invoice.payment_method_id,
+                    'lines': [_amounts_to_str(asdict(line)) for line in invoice.lines],
+                    'updates': [asdict(update) for update in invoice.updates],
+                }
+                for invoice in self.invoices
+            ],
+            'skipped': [asdict(skip) for skip in self.skipped],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'InvoicePlan':
+        """Reconstruit un plan écrit par to_dict()"""
+        return cls(
+            today=date.fromisoformat(data['today']),
+            invoices=tuple(
+                PlannedInvoice(
+                    client_id=invoice['client_id'],
+                    billing_month=invoice['billing_month'],
+                    lines=tuple(PlannedLine(**_amounts_to_decimal(line)) for line in invoice['lines']),
+                    updates=tuple(CounterUpdate(**update) for update in invoice['updates']),
+                    total_ht=Decimal(invoice['total_ht']),
+                    total_remise=Decimal(invoice['total_remise']),
+                    payment_method_id=invoice.get('payment_method_id'),
+                )
+                for invoice in data['invoices']
+            ),
+            skipped=tuple(SkippedService(**skip) for skip in data.get('skipped', [])),
+        )
+
+
+# Champs monétaires de PlannedLine (chaînes dans le JSON)
+_AMOUNT_FIELDS = ('prix_ht', 'remise_pct', 'montant_remise', 'prix_final')
+
+
+def _amounts_to_str(line: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: str(value) if key in _AMOUNT_FIELDS else value for key, value in line.items()}
+
+
+def _amounts_to_decimal(line: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: Decimal(value) if key in _AMOUNT_FIELDS else value for key, value in line.items()}
+
+
+class InvoicePlanner:
+    """
+    Calcule le plan de facturation à partir des abonnements décodés
+
+    Aucune lecture ni écriture externe : les grilles sont fournies au
+    constructeur. Le même jeu d'abonnements et la même date donnent
+    toujours le même plan.
+    """
+
+    def __init__(self, grids_by_id: Dict[str, Dict], default_grid: Optional[Dict] = None):
+        """
+        Initialise le planificateur
+
+        Args:
+            grids_by_id: Grilles de remise indexées par ID de record Airtable
+            default_grid: Grille par défaut (abonnements sans grille liée)
+        """
+        self.grids_by_id = grids_by_id
+        self.default_grid = default_grid
+        self._discounts: Dict[Tuple[Optional[str], int], Tuple[Decimal, str]] = {}
+
+    def _discount(self, subscription: Subscription, mois: int) -> Tuple[Decimal, str, Optional[str], Optional[str]]:
+        """(pourcentage, libellé, nom de la grille, avertissement) pour le mois facturé"""
+        if not subscription.appliquer_remise:
+            return ZERO, "", None, None
+
+        if subscription.grid_id:
+            grid = self.grids_by_id.get(subscription.grid_id)
+            if grid is None:
+                return ZERO, "", None, f"Grille {subscription.grid_id} introuvable, facturé sans remise"
+            grid_key = subscription.grid_id
+        else:
+            grid = self.default_grid
+            if grid is None:
+                return ZERO, "", None, "Aucune grille par défaut, facturé sans remise"
+            grid_key = None
+
+        cached = self._discounts.get((grid_key, mois))
+        if cached is None:
+            pct, label = get_discount_info(mois, grid)
+            cached = (to_decimal(pct), label)
+            self._discounts[(grid_key, mois)] = cached
+
+        return cached[0], cached[1], grid.get('Nom de la grille'), None
+
+    def plan(self, subscriptions: Iterable[Subscription], today: Optional[date] = None) -> InvoicePlan:
+        """
+        Construit le plan en une passe
+
+        Args:
+            subscriptions: Abonnements éligibles décodés
+            today: Date de référence (défaut: aujourd'hui)
+
+        Returns:
+            Plan immuable (factures triées par client puis mois)
+        """
+        today = today or date.today()
+        groups: Dict[Tuple[str, str], List[Tuple[Subscription, int]]] = defaultdict(list)
+        skipped: List[SkippedService] = []
+
+        for subscription in subscriptions:
+            if not subscription.is_valid:
+                skipped.append(self._skip(subscription, f"Données incomplètes: {', '.join(subscription.problems)}"))
+                continue
+
+            mois_ecoules = subscription.months_elapsed(today)
+            if mois_ecoules < subscription.mois_factures:
+                skipped.append(self._skip(
+                    subscription,
+                    f"Pas de facturation due (mois écoulés: {mois_ecoules} < mois facturés: {subscription.mois_factures})"
+                ))
+                continue
+
+            # Protection anti-double facturation : un seul mois facturé par exécution
+            late_months = max(mois_ecoules - subscription.mois_factures - 1, 0)
+            groups[(subscription.client_id, subscription.billing_month)].append((subscription, late_months))
+
+        invoices = [self._plan_invoice(key, members) for key, members in sorted(groups.items())]
+        return InvoicePlan(today=today, invoices=tuple(invoices), skipped=tuple(skipped))
+
+    def _plan_invoice(self, key: Tuple[str, str], members: List[Tuple[Subscription, int]]) -> PlannedInvoice:
+        discounts = []
+        for subscription, _ in members:
+            discounts.append(self._discount(subscription, subscription.mois_factures + 1))
+
+        priced = price_lines(
+            (subscription.prix_ht, pct)
+            for (subscription, _), (pct, _, _, _) in zip(members, discounts)
+        )
+
+        lines = []
+        updates = []
+        for (subscription, late_months), (pct, label, grid_name, warning), amounts in zip(members, discounts, priced.lines):
+            lines.append(PlannedLine(
+                record_id=subscription.record_id,
+                service_name=subscription.service_name,
+                product_id=subscription.product_id,
+                mois=subscription.mois_factures + 1,
+                prix_ht=amounts.prix_ht,
+                remise_pct=pct,
+                libelle_remise=label,
+                montant_remise=amounts.montant_remise,
+                prix_final=amounts.prix_final,
+                grid_name=grid_name,
+                late_months=late_months,
+                warning=warning,
+            ))
+            updates.append(CounterUpdate(
+                record_id=subscription.record_id,
+                mois_factures_avant=subscription.mois_factures,
+                mois_factures=subscription.mois_factures + 1,
+                occurrences_avant=subscription.occurrences_restantes,
+                occurrences_restantes=max(0, subscription.occurrences_restantes - 1),
+            ))
+
+        return PlannedInvoice(
+            client_id=key[0],
+            billing_month=key[1],
+            lines=tuple(lines),
+            updates=tuple(updates),
+            total_ht=priced.total_ht,
+            total_remise=priced.total_remise,
+            # Moyen de paiement renseigné sur l'un des services (ID_Moyen_Paiement_GoCardless)
+            payment_method_id=next(
+                (subscription.payment_method_id for subscription, _ in members if subscription.payment_method_id),
+                None
+            ),
+        )
+
+    @staticmethod
+    def _skip(subscription: Subscription, reason: str) -> SkippedService:
+        return SkippedService(
+            record_id=subscription.record_id,
+            service_name=subscription.service_name,
+            client_id=subscription.client_id,
+            billing_month=subscription.billing_month,
+            reason=reason,
+        )
@@ -0,0 +1,75 @@
+"""
+Cache du catalogue produits Sellsy (/items)
+Permet de valider en masse les références 'ID Sellsy' avant toute création de facture
+"""
+
+from typing import Any, Dict, Iterable, Optional, Set
+
+from src.sellsy_client_v2 import SellsyClientV2
+
+
+class ProductCatalog:
+    """Catalogue Sellsy chargé une seule fois par exécution"""
+
+    def __init__(self, client: SellsyClientV2):
+        """
+        Initialise le cache du catalogue
+
+        Args:
+            client: Client Sellsy v2
+        """
+        self.client = client
+        self._items: Optional[Dict[int, Dict[str, Any]]] = None
+
+    def load(self) -> int:
+        """
+        Parcourt toutes les pages de /items et remplit le cache
+
+        Returns:
+            Nombre d'articles chargés
+        """
+        items = {}
+        for page in self.client.iter_pages("GET", "/items"):
+            for item in page:
+                items[int(item["id"])] = item
+        self._items = items
+        return len(items)
+
+    @property
+    def items(self) -> Dict[int, Dict[str, Any]]:
+        if self._items is None:
+            self.load()
+        return self._items
+
+    def get(self, product_id) -> Optional[Dict[str, Any]]:
+        """Retourne l'article du catalogue, None s'il n'existe pas"""
+        try:
+            return self.items.get(int(product_id))
+        except (TypeError, ValueError):
+            return None
+
+    def validate(self, product_ids: Iterable) -> Set:
+        """
+        Vérifie en une fois une liste de références produit
+
+        Args:
+            product_ids: Valeurs du champ 'ID Sellsy'
+
+        Returns:
+            Ensemble des références absentes du catalogue
+        """
+        return {product_id for product_id in product_ids if self.get(product_id) is None}
+
+    def get_unit_price(self, product_id) -> Optional[str]:
+        """Prix unitaire HT de référence de l'article (tel que renvoyé par Sellsy)"""
+        item = self.get(product_id)
+        if not item:
+            return None
+        return item.get("reference_price_taxes_exc") or item.get("reference_price")
+
+    def get_tax_id(self, product_id) -> Optional[int]:
+        """ID de la taxe associée à l'article"""
+        item = self.get(product_id)
+        if not item or not item.get("tax_id"):
+            return None
+        return int(item["tax_id"])
@@ -0,0 +1,184 @@
+"""
+Profilage d'une exécution (cProfile ou échantillonnage des piles)
+Sorties : statistiques pstats et piles repliées (format flamegraph.pl / speedscope)
+"""
+
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+PROFILE_MODES = ("deterministic", "sampling")
+
+# Intervalle d'échantillonnage par défaut (secondes)
+DEFAULT_INTERVAL = 0.005
+
+# Bornes des piles reconstruites depuis le graphe d'appels cProfile : profondeur,
+# nombre de piles, part minimale du temps total pour détailler un sous-arbre
+MAX_DEPTH = 64
+MAX_STACKS = 20000
+MIN_FRACTION = 0.001
+
+_THREAD_NUMBER = re.compile(r"[-_]\d+")
+
+
+def frame_label(filename: str, lineno: int, name: str) -> str:
+    """Libellé d'une fonction dans une pile repliée (sans ';')"""
+    if filename == "~":
+        # Fonction native (<built-in method ...>)
+        return name.replace(";", ",")
+    return f"{name} ({os.path.basename(filename)}:{lineno})".replace(";", ",")
+
+
+def write_collapsed(stacks: Dict[str, int], path: str):
+    """Écrit les piles repliées : une ligne 'f1;f2;f3 poids' par pile"""
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, weight in sorted(stacks.items()):
+            if weight > 0:
+                f.write(f"{stack} {weight}\n")
+
+
+def collapsed_from_stats(stats: pstats.Stats) -> Dict[str, int]:
+    """
+    Piles repliées (poids en microsecondes) reconstruites depuis cProfile
+
+    cProfile ne garde que les arcs appelant → appelé : le temps d'une
+    fonction est réparti sur ses chemins d'appel au prorata du temps
+    cumulé de chaque arc. Les appels récursifs sont coupés.
+
+    Avec des appelants partagés, le nombre de chemins croît de façon
+    exponentielle avec la profondeur : un sous-arbre n'est détaillé que
+    s'il pèse au moins MIN_FRACTION du temps total, dans la limite de
+    MAX_DEPTH niveaux et MAX_STACKS piles. Sinon tout son temps cumulé est
+    attribué à sa racine, et le total des poids est conservé.
+    """
+    raw = stats.stats
+    callees: Dict[Tuple, Dict[Tuple, Tuple]] = defaultdict(dict)
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge
+
+    roots = [(func, own, cumulative) for func, (_, _, own, cumulative, callers) in raw.items() if not callers]
+    threshold = sum(cumulative for _, _, cumulative in roots) * MIN_FRACTION
+    stacks: Counter = Counter()
+
+    def walk(func: Tuple, path: Tuple[str, ...], own: float, cumulative: float):
+        path = path + (frame_label(*func),)
+        key = ";".join(path)
+
+        total = raw[func][3]
+        children = callees.get(func)
+        if not children or total <= 0:
+            stacks[key] += round(own * 1e6)
+            return
+        if cumulative < threshold or len(path) >= MAX_DEPTH or len(stacks) >= MAX_STACKS:
+            # Sous-arbre replié sur sa racine
+            stacks[key] += round(max(own, cumulative) * 1e6)
+            return
+
+        stacks[key] += round(own * 1e6)
+        scale = min(1.0, cumulative / total)
+        for child, (_, _, child_own, child_cumulative) in children.items():
+            if frame_label(*child) not in path:
+                walk(child, path, child_own * scale, child_cumulative * scale)
+
+    for func, own, cumulative in roots:
+        walk(func, (), own, cumulative)
+    return dict(stacks)
+
+
+class StackSampler:
+    """
+    Échantillonneur de piles à faible surcoût
+
+    Un thread relève toutes les `interval` secondes la pile de chaque
+    thread (sys._current_frames) : les threads d'envoi et de validation
+    sont donc couverts, contrairement à cProfile qui ne suit que le thread
+    appelant. Le poids d'une pile est son nombre d'échantillons.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(frame_label(code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                # Threads d'un même pool regroupés (ThreadPoolExecutor-0_3 → ThreadPoolExecutor)
+                thread_name = _THREAD_NUMBER.sub("", names.get(thread_id, "thread"))
+                stack.append(thread_name)
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+@contextmanager
+def profiled(mode: Optional[str], output_dir: str, name: str,
+             interval: float = DEFAULT_INTERVAL) -> Iterator[List[str]]:
+    """
+    Profile le bloc et écrit les résultats dans output_dir
+
+    - deterministic : cProfile du thread appelant → name.pstats et
+      name.collapsed (piles reconstruites depuis le graphe d'appels)
+    - sampling : échantillonnage de tous les threads → name.collapsed
+    - None : aucun profilage
+
+    Yields:
+        Liste des fichiers écrits (remplie à la sortie du bloc)
+    """
+    written: List[str] = []
+    if not mode:
+        yield written
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Mode de profilage inconnu '{mode}' (attendu: {', '.join(PROFILE_MODES)})")
+
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, name)
+
+    if mode == "deterministic":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield written
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{base}.pstats")
+            write_collapsed(collapsed_from_stats(pstats.Stats(profiler)), f"{base}.collapsed")
+            written += [f"{base}.pstats", f"{base}.collapsed"]
+    else:
+        sampler = StackSampler(interval)
+        sampler.start()
+        try:
+            yield written
+        finally:
+            sampler.stop()
+            write_collapsed(dict(sampler.counts), f"{base}.collapsed")
+            written.append(f"{base}.collapsed")
@@ -0,0 +1,230 @@
+"""
+Rapprochement entre les compteurs Airtable (Mois facturés) et les factures Sellsy
+Jointure en mémoire par (client, mois de facturation) sur des index de hachage
+"""
+
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.forecast import RevenueForecast
+
+
+# Statuts Sellsy ignorés (factures annulées)
+IGNORED_STATUSES = {'cancelled'}
+
+
+def _add_months(date_debut: date, months: int) -> str:
+    ordinal = date_debut.year * 12 + date_debut.month - 1 + months
+    return f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+
+class InvoiceReconciler:
+    """
+    Compare les facturations attendues d'après Airtable aux factures Sellsy
+
+    Le mois N d'un abonnement est attendu sur une facture datée du mois
+    (date de début + N - 1), avec le montant HT après remise calculé par la
+    même logique que la facturation. Les services d'un même client facturés
+    le même mois sont attendus sur une seule facture groupée.
+    """
+
+    def __init__(self, forecast: RevenueForecast, tolerance: Decimal = Decimal('0.01')):
+        """
+        Initialise le rapprochement
+
+        Args:
+            forecast: Prévision fournissant les grilles et tables de montants mémoïsées
+            tolerance: Écart de montant HT toléré (en euros)
+        """
+        self.forecast = forecast
+        self.tolerance = tolerance
+
+    # ---------------------------------------------------------------------
+    # INDEX
+    # ---------------------------------------------------------------------
+
+    def expected_invoices(self, services: Iterable[Dict],
+                          invalid: Optional[List[Dict]] = None) -> Dict[Tuple[str, str], Dict]:
+        """
+        Construit l'index des facturations attendues
+
+        Les services sont décodés comme pour la facturation : un service
+        incomplet ou invalide est ignoré et ajouté à invalid.
+
+        Args:
+            services: Records Airtable des abonnements facturés
+            invalid: Liste complétée avec les services ignorés (avec la raison)
+
+        Returns:
+            {(client_id, YYYY-MM): {amount_cents, services: [(record_id, mois)]}}
+        """
+        expected: Dict[Tuple[str, str], Dict] = {}
+        valid, skipped = self.forecast.decode(services)
+        if invalid is not None:
+            invalid.extend(skipped)
+
+        for fields, subscription, taux_tva in valid:
+            mois_factures = subscription.mois_factures
+            if mois_factures <= 0:
+                continue
+
+            ht_table, _ = self.forecast.amount_table(
+                self.forecast.grid_key(fields), subscription.prix_ht, taux_tva, mois_factures
+            )
+
+            for mois in range(1, mois_factures + 1):
+                key = (subscription.client_id, _add_months(subscription.date_debut, mois - 1))
+                entry = expected.get(key)
+                if entry is None:
+                    entry = {'amount_cents': 0, 'services': []}
+                    expected[key] = entry
+                entry['amount_cents'] += ht_table[mois - 1]
+                entry['services'].append((subscription.record_id, mois))
+
+        return expected
+
+    @staticmethod
+    def index_invoices(invoices: Iterable[Dict]) -> Dict[Tuple[str, str], List[Dict]]:
+        """
+        Indexe les factures d'abonnement Sellsy par (client_id, YYYY-MM)
+
+        Returns:
+            {(client_id, YYYY-MM): [résumés de factures]}
+        """
+        indexed: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+
+        for invoice in invoices:
+            if invoice.get('status') in IGNORED_STATUSES:
+                continue
+            if not str(invoice.get('subject', '')).startswith('Abonnement'):
+                continue
+            date = invoice.get('date') or ''
+            if len(date) < 7:
+                continue
+
+            try:
+                amount = Decimal(str((invoice.get('amounts') or {}).get('total_excl_tax', '0')))
+            except InvalidOperation:
+                amount = Decimal('0')
+
+            summary = {
+                'id': invoice.get('id'),
+                'number': invoice.get('number'),
+                'date': date,
+                'status': invoice.get('status'),
+                'amount_ht': amount,
+            }
+
+            for related in invoice.get('related', []) or []:
+                if related.get('type') in ('company', 'individual'):
+                    indexed[(str(related.get('id')), date[:7])].append(summary)
+
+        return dict(indexed)
+
+    # ---------------------------------------------------------------------
+    # RAPPROCHEMENT
+    # ---------------------------------------------------------------------
+
+    def reconcile(self, services: Iterable[Dict], invoices: Iterable[Dict]) -> Dict:
+        """
+        Rapproche en une passe les compteurs Airtable et les factures Sellsy
+
+        Returns:
+            Rapport avec les listes missing, duplicates, amount_mismatches,
+            late (mois facturé en retard sur un mois ultérieur), unexpected,
+            invalid (services non rapprochés, données invalides) et un
+            résumé chiffré
+        """
+        invalid: List[Dict] = []
+        expected = self.expected_invoices(services, invalid)
+        actual = self.index_invoices(invoices)
+
+        report = {
+            'missing': [],
+            'duplicates': [],
+            'amount_mismatches': [],
+            'late': [],
+            'unexpected': [],
+            'invalid': invalid,
+        }
+        missing_by_client: Dict[str, List[Tuple[str, Dict]]] = defaultdict(list)
+        matched = 0
+
+        for key, entry in expected.items():
+            client_id, month = key
+            expected_ht = Decimal(entry['amount_cents']) / 100
+            found = actual.get(key)
+
+            if not found:
+                missing_by_client[client_id].append((month, entry))
+                continue
+
+            matched += 1
+            if len(found) > 1:
+                report['duplicates'].append({
+                    'client_id': client_id,
+                    'month': month,
+                    'invoices': [invoice['id'] for invoice in found],
+                })
+
+            actual_ht = found[0]['amount_ht']
+            if abs(actual_ht - expected_ht) > self.tolerance:
+                report['amount_mismatches'].append({
+                    'client_id': client_id,
+                    'month': month,
+                    'invoice_id': found[0]['id'],
+                    'expected_ht': str(expected_ht),
+                    'actual_ht': str(actual_ht),
+                })
+
+        # Factures sans facturation attendue le même mois
+        unexpected_by_client: Dict[str, List[Tuple[str, Dict]]] = defaultdict(list)
+        for (client_id, month), found in actual.items():
+            if (client_id, month) not in expected:
+                for invoice in found:
+                    unexpected_by_client[client_id].append((month, invoice))
+
+        # Rattrapage : un mois manquant facturé plus tard, même client, même montant
+        for client_id, missing in missing_by_client.items():
+            leftovers = sorted(unexpected_by_client.get(client_id, []), key=lambda item: item[0])
+            for month, entry in sorted(missing, key=lambda item: item[0]):
+                expected_ht = Decimal(entry['amount_cents']) / 100
+                match = next(
+                    (i for i, (invoice_month, invoice) in enumerate(leftovers)
+                     if invoice_month > month and abs(invoice['amount_ht'] - expected_ht) <= self.tolerance),
+                    None
+                )
+                if match is not None:
+                    invoice_month, invoice = leftovers.pop(match)
+                    report['late'].append({
+                        'client_id': client_id,
+                        'month': month,
+                        'invoice_id': invoice['id'],
+                        'invoice_month': invoice_month,
+                    })
+                else:
+                    report['missing'].append({
+                        'client_id': client_id,
+                        'month': month,
+                        'expected_ht': str(expected_ht),
+                        'services': [record_id for record_id, _ in entry['services']],
+                    })
+            unexpected_by_client[client_id] = leftovers
+
+        for client_id, leftovers in unexpected_by_client.items():
+            for month, invoice in leftovers:
+                report['unexpected'].append({
+                    'client_id': client_id,
+                    'month': month,
+                    'invoice_id': invoice['id'],
+                    'actual_ht': str(invoice['amount_ht']),
+                })
+
+        report['summary'] = {
+            'expected': len(expected),
+            'matched': matched,
+            **{name: len(items) for name, items in report.items() if name != 'summary'},
+        }
+        return report
@@ -0,0 +1,236 @@
+"""
+Cache des réponses GET de l'API Sellsy (mémoire LRU + disque SQLite)
+Durée de validité par endpoint, puis revalidation conditionnelle (ETag / Last-Modified)
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Pattern, Tuple
+
+
+# Endpoints mis en cache → durée de fraîcheur (secondes). Une entrée périmée
+# est conservée pour la requête conditionnelle ; un endpoint absent n'est pas caché.
+DEFAULT_TTLS: List[Tuple[str, float]] = [
+    (r"^/taxes$", 24 * 3600),
+    (r"^/payments/methods$", 24 * 3600),
+    (r"^/currencies$", 24 * 3600),
+    (r"^/items$", 3600),
+    (r"^/companies/\d+$", 6 * 3600),
+    (r"^/individuals/\d+$", 6 * 3600),
+    (r"^/contacts/\d+$", 6 * 3600),
+    # Le statut d'une facture change (draft → due → payée) : toujours revalidée
+    (r"^/invoices/\d+$", 0),
+]
+
+# Réponses contenant des données personnelles (fiches client, contacts,
+# factures) : gardées en mémoire le temps de l'exécution, jamais écrites sur
+# disque (la base est conservée dans le cache CI d'un run à l'autre)
+DEFAULT_MEMORY_ONLY: List[str] = [
+    r"^/companies/",
+    r"^/individuals/",
+    r"^/contacts/",
+    r"^/invoices/",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_stored ON responses (stored_at);
+"""
+
+
+class CachedResponse(NamedTuple):
+    body: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+
+class ResponseCache:
+    """
+    Cache à deux niveaux des réponses GET
+
+    - Mémoire : LRU bornée en nombre d'entrées (corps JSON bruts, décodés à
+      chaque lecture : l'appelant peut modifier le résultat sans altérer le cache).
+    - Disque (optionnel) : base SQLite partagée entre exécutions et processus,
+      bornée elle aussi (les plus anciennes entrées sont supprimées). Les
+      endpoints `memory_only` n'y sont jamais écrits.
+
+    Une entrée fraîche est servie sans appel réseau. Une entrée périmée
+    fournit If-None-Match / If-Modified-Since : un 304 la rafraîchit sans
+    retransférer le corps.
+
+    Les compteurs `stats` sont tenus sous le verrou du cache (envois
+    parallèles) : hits (lookup frais), revalidated (touch), misses (put).
+    """
+
+    def __init__(self, max_entries: int = 512, disk_path: Optional[str] = None,
+                 max_disk_entries: int = 20000, ttls: Optional[List[Tuple[str, float]]] = None,
+                 memory_only: Optional[List[str]] = None):
+        """
+        Initialise le cache
+
+        Args:
+            max_entries: Nombre maximal d'entrées en mémoire
+            disk_path: Base SQLite du niveau disque (None = mémoire seulement)
+            max_disk_entries: Nombre maximal d'entrées sur disque
+            ttls: Règles (regex d'endpoint, secondes), défaut DEFAULT_TTLS
+            memory_only: Regex des endpoints exclus du disque, défaut DEFAULT_MEMORY_ONLY
+        """
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._rules: List[Tuple[Pattern, float]] = [
+            (re.compile(pattern), ttl) for pattern, ttl in (ttls or DEFAULT_TTLS)
+        ]
+        self._memory_only: List[Pattern] = [
+            re.compile(pattern) for pattern in (DEFAULT_MEMORY_ONLY if memory_only is None else memory_only)
+        ]
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0}
+
+        self._conn = None
+        if disk_path:
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+            # Base écrite par une version antérieure : données personnelles purgées
+            stale = [(key,) for (key,) in self._conn.execute("SELECT key FROM responses") if not self._persistable(key)]
+            if stale:
+                with self._lock:
+                    self._write_disk(*[("DELETE FROM responses WHERE key = ?", row) for row in stale])
+
+    def ttl_for(self, endpoint: str) -> Optional[float]:
+        """Durée de fraîcheur de l'endpoint, None s'il n'est pas mis en cache"""
+        for pattern, ttl in self._rules:
+            if pattern.match(endpoint):
+                return ttl
+        return None
+
+    def _persistable(self, key: str) -> bool:
+        return not any(pattern.match(key) for pattern in self._memory_only)
+
+    @staticmethod
+    def key_for(endpoint: str, params: Optional[Dict]) -> str:
+        if not params:
+            return endpoint
+        query = "&".join(f"{name}={params[name]}" for name in sorted(params))
+        return f"{endpoint}?{query}"
+
+    # ---------------------------------------------------------------------
+    # LECTURE / ÉCRITURE
+    # ---------------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Entrée du cache (mémoire, sinon disque), fraîche ou non"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+            if self._conn is None or not self._persistable(key):
+                return None
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = CachedResponse(*row)
+            self._remember(key, entry)
+            return entry
+
+    def is_fresh(self, entry: CachedResponse, ttl: float) -> bool:
+        return time.time() - entry.stored_at < ttl
+
+    def lookup(self, key: str, ttl: float) -> Tuple[Optional[CachedResponse], bool]:
+        """
+        Entrée du cache et sa fraîcheur (une entrée fraîche compte comme hit)
+
+        Returns:
+            Tuple (entrée ou None, fraîche)
+        """
+        entry = self.get(key)
+        fresh = entry is not None and self.is_fresh(entry, ttl)
+        if fresh:
+            with self._lock:
+                self.stats["hits"] += 1
+        return entry, fresh
+
+    def put(self, key: str, body: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Réponse reçue pour une entrée absente ou modifiée (compte comme miss)"""
+        entry = CachedResponse(body, etag, last_modified, time.time())
+        with self._lock:
+            self.stats["misses"] += 1
+            self._remember(key, entry)
+            if not self._persistable(key):
+                return
+            self._write_disk(
+                ("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                 (key, body, etag, last_modified, entry.stored_at)),
+                ("DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                 "ORDER BY stored_at DESC LIMIT -1 OFFSET ?)", (self.max_disk_entries,)),
+            )
+
+    def touch(self, key: str, entry: CachedResponse) -> CachedResponse:
+        """Réponse 304 : l'entrée redevient fraîche sans changer de corps"""
+        refreshed = entry._replace(stored_at=time.time())
+        with self._lock:
+            self.stats["revalidated"] += 1
+            self._remember(key, refreshed)
+            self._write_disk(("UPDATE responses SET stored_at = ? WHERE key = ?", (refreshed.stored_at, key)))
+        return refreshed
+
+    def invalidate(self, prefix: str):
+        """Supprime les entrées d'une ressource modifiée (ex: /invoices/123)"""
+        with self._lock:
+            for key in [key for key in self._memory if key == prefix or key.startswith((f"{prefix}/", f"{prefix}?"))]:
+                del self._memory[key]
+            self._write_disk((
+                "DELETE FROM responses WHERE key = ? OR key LIKE ? OR key LIKE ?",
+                (prefix, f"{prefix}/%", f"{prefix}?%")
+            ))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+    def _write_disk(self, *statements):
+        # Appelé avec self._lock détenu. Base verrouillée par un autre processus
+        # (shards) : le niveau disque est ignoré, la mémoire reste à jour.
+        if self._conn is None:
+            return
+        try:
+            with self._conn:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+        except sqlite3.OperationalError:
+            pass
+
+    def _remember(self, key: str, entry: CachedResponse):
+        # Appelé avec self._lock détenu
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+def resource_of(endpoint: str) -> Optional[str]:
+    """
+    Ressource identifiée touchée par une écriture
+
+    /invoices/123/validate → /invoices/123 ; /invoices/search → None
+    (création ou recherche : aucune entrée existante n'est modifiée)
+    """
+    parts = endpoint.split("?", 1)[0].strip("/").split("/")
+    for index, part in enumerate(parts):
+        if part.isdigit():
+            return "/" + "/".join(parts[:index + 1])
+    return None
@@ -0,0 +1,181 @@
+"""
+File de priorité des abonnements par prochaine date de facturation
+Seuls les services arrivés à échéance sont relus et facturés
+"""
+
+import calendar
+import heapq
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.subscription import Subscription
+
+
+def billing_date(start: date, mois_factures: int) -> date:
+    """
+    Date anniversaire du prochain mois à facturer
+
+    Date de début + Mois facturés mois (jour ramené à la fin du mois si besoin,
+    ex: 31 janvier + 1 mois = 28 ou 29 février).
+    """
+    ordinal = start.year * 12 + start.month - 1 + mois_factures
+    year, month = divmod(ordinal, 12)
+    month += 1
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def next_billing_date(subscription: Subscription) -> date:
+    """Date anniversaire du prochain mois à facturer d'un abonnement décodé"""
+    return billing_date(subscription.date_debut, subscription.mois_factures)
+
+
+def next_due_from_fields(fields: Dict) -> Optional[str]:
+    """
+    Échéance (ISO) calculée depuis les champs Airtable bruts
+
+    Returns:
+        Date ISO, None si la date de début est absente ou invalide
+    """
+    try:
+        start = date.fromisoformat(fields.get('Date de début') or '')
+        mois_factures = int(fields.get('Mois facturés', 0) or 0)
+    except (TypeError, ValueError):
+        return None
+    return billing_date(start, mois_factures).isoformat()
+
+
+def due_cutoff(today: date) -> date:
+    """
+    Premier jour du mois suivant
+
+    La synchronisation quotidienne facture au mois calendaire (mois écoulés
+    >= mois facturés) : un service est dû dès que son échéance tombe avant
+    cette date, même si le jour anniversaire n'est pas encore atteint.
+    """
+    return date(today.year + today.month // 12, today.month % 12 + 1, 1)
+
+
+def is_eligible(record: Dict) -> bool:
+    """Mêmes critères que la formule Airtable des abonnements éligibles"""
+    fields = record.get('fields', {})
+    return (
+        fields.get('Catégorie') == 'Abonnement'
+        and (fields.get('Occurrences restantes') or 0) > 0
+        and bool(fields.get('Date de début'))
+    )
+
+
+class DueQueue:
+    """
+    Tas (date d'échéance, record_id) des abonnements à facturer
+
+    Une mise à jour d'un service ne retire pas son ancienne entrée du tas :
+    elle est ignorée au dépilement (suppression paresseuse), la date à jour
+    étant conservée dans un index record_id → abonnement. Un second index
+    (client, mois de facturation) → record_ids donne directement les services
+    à regrouper. Ajout et retrait coûtent O(log n), l'extraction des k
+    services dus (regroupés compris) O(k log n).
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[date, str]] = []
+        self._entries: Dict[str, Tuple[date, Subscription]] = {}
+        self._groups: Dict[Tuple, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self._entries
+
+    def push(self, subscription: Subscription, not_before: Optional[date] = None) -> Optional[date]:
+        """
+        Ajoute ou replanifie un abonnement
+
+        Args:
+            subscription: Abonnement décodé
+            not_before: Échéance minimale (ex: report au lendemain après un échec)
+
+        Returns:
+            Date d'échéance retenue, None si l'abonnement est invalide (retiré de la file)
+        """
+        if not subscription.is_valid:
+            self.remove(subscription.record_id)
+            return None
+
+        due = next_billing_date(subscription)
+        if not_before and due < not_before:
+            due = not_before
+        with self._lock:
+            current = self._pop_entry(subscription.record_id)
+            self._entries[subscription.record_id] = (due, subscription)
+            self._groups.setdefault(self._group_key(subscription), set()).add(subscription.record_id)
+            if current is None or current[0] != due:
+                heapq.heappush(self._heap, (due, subscription.record_id))
+        return due
+
+    def remove(self, record_id: str):
+        """Retire un abonnement (terminé, supprimé ou devenu inéligible)"""
+        with self._lock:
+            self._pop_entry(record_id)
+
+    def get(self, record_id: str) -> Optional[Subscription]:
+        entry = self._entries.get(record_id)
+        return entry[1] if entry else None
+
+    def next_due(self) -> Optional[date]:
+        """Plus proche date d'échéance (None si la file est vide)"""
+        with self._lock:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, today: date) -> List[Subscription]:
+        """
+        Retire et retourne les abonnements dont l'échéance est atteinte
+
+        Pour conserver la facturation groupée, les autres services du même
+        client sur le même mois de facturation sont retirés avec eux, même
+        si leur date anniversaire tombe plus tard dans le mois.
+        """
+        due: Dict[str, Subscription] = {}
+        with self._lock:
+            while self._heap:
+                self._discard_stale()
+                if not self._heap or self._heap[0][0] > today:
+                    break
+                _, record_id = heapq.heappop(self._heap)
+                subscription = self._pop_entry(record_id)[1]
+                due[record_id] = subscription
+                # Services du même client et du même mois : leur entrée de tas
+                # devient obsolète et sera ignorée
+                for sibling_id in list(self._groups.get(self._group_key(subscription), ())):
+                    due[sibling_id] = self._pop_entry(sibling_id)[1]
+
+        return list(due.values())
+
+    @staticmethod
+    def _group_key(subscription: Subscription) -> Tuple:
+        return (subscription.client_id, subscription.billing_month)
+
+    def _pop_entry(self, record_id: str) -> Optional[Tuple[date, Subscription]]:
+        # Appelé avec self._lock détenu
+        entry = self._entries.pop(record_id, None)
+        if entry is not None:
+            key = self._group_key(entry[1])
+            group = self._groups.get(key)
+            if group is not None:
+                group.discard(record_id)
+                if not group:
+                    del self._groups[key]
+        return entry
+
+    def _discard_stale(self):
+        # Entrées obsolètes (service retiré ou replanifié) en tête de tas
+        while self._heap:
+            due, record_id = self._heap[0]
+            entry = self._entries.get(record_id)
+            if entry is not None and entry[0] == due:
+                return
+            heapq.heappop(self._heap)
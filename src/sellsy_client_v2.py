@@ -3,80 +3,125 @@ Client Sellsy API v2 pour la création automatique de factures d'abonnement
 OAuth2 moderne et REST standard (CONFORME DOC SELLSY V2)
 """
 
+import json
+import logging
 import os
-from datetime import datetime, timedelta
-from typing import Dict, Optional, Any, List
+import time
+from typing import Dict, Optional, Any, List, Iterable, Iterator, Tuple
 import requests
 
+from src.token_manager import TokenManager, get_token_manager
+from src.metadata_registry import MetadataRegistry
+from src.payment_methods import PaymentMethodResolver
+from src.response_cache import ResponseCache, resource_of
+from src.invoice_batch import InvoiceSubmitQueue
+from src.circuit_breaker import CircuitBreakerRegistry, CircuitOpenError, is_failure_status
+from src.deadline import AdaptiveTimeouts
+from src.json_stream import JsonListStream
+from src.perf_report import endpoint_family, record_api_call
+from src.money import PricedLines, apply_discount, format_amount, price_lines
+
+logger = logging.getLogger(__name__)
+
+
+def _debug_json(title: str, data: Any):
+    # Corps complet des requêtes / réponses, sérialisé seulement en mode debug
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s\n%s", title, json.dumps(data, indent=2, ensure_ascii=False))
+
+
+class SellsyAPIError(Exception):
+    """Réponse d'erreur de l'API Sellsy (status_code : statut HTTP)"""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Erreur API Sellsy v2: {status_code} - {text}")
+        self.status_code = status_code
+
 
 class SellsyClientV2:
     """Client pour interagir avec l'API Sellsy v2"""
 
-    def __init__(self, client_id: str, client_secret: str):
+    def __init__(self, client_id: str, client_secret: str,
+                 token_manager: Optional[TokenManager] = None):
         self.client_id = client_id
         self.client_secret = client_secret
 
         self.token_url = "https://login.sellsy.com/oauth2/access-tokens"
         self.api_url = "https://api.sellsy.com/v2"
 
-        self._access_token: Optional[str] = None
-        self._token_expires_at: Optional[datetime] = None
-
-        self._tva_cache: Optional[int] = None
-        self._gocardless_cache: Optional[int] = None
+        # Token partagé entre toutes les instances (et processus si cache disque)
+        self.token_manager = token_manager or get_token_manager(client_id, client_secret)
 
-    # ---------------------------------------------------------------------
-    # AUTH
-    # ---------------------------------------------------------------------
+        # Session HTTP : connexions keep-alive réutilisées, y compris par les envois parallèles
+        pool_size = int(os.getenv("SELLSY_POOL_SIZE", "16"))
+        self.session = requests.Session()
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
 
-    def _get_access_token(self) -> str:
-        """Récupère un token OAuth2 valide (avec cache)"""
-
-        if self._access_token and self._token_expires_at:
-            if datetime.now() < self._token_expires_at - timedelta(minutes=5):
-                return self._access_token
-
-        response = requests.post(
-            self.token_url,
-            json={
-                "grant_type": "client_credentials",
-                "client_id": self.client_id,
-                "client_secret": self.client_secret,
-            },
-            headers={"Content-Type": "application/json"},
-            timeout=20,
+        # Disjoncteurs par famille d'endpoints : échec immédiat quand Sellsy est dégradé
+        self.breakers = CircuitBreakerRegistry(
+            failure_threshold=int(os.getenv("SELLSY_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("SELLSY_BREAKER_RESET_SECONDS", "30")),
         )
 
-        if response.status_code != 200:
-            raise Exception(
-                f"Erreur OAuth Sellsy ({response.status_code}) - {response.text}"
-            )
+        # Timeouts par famille d'endpoints (latences observées, échéance du run)
+        self.timeouts = AdaptiveTimeouts(default=float(os.getenv("SELLSY_TIMEOUT_SECONDS", "30")))
+
+        # Cache des GET (mémoire LRU, disque optionnel, revalidation ETag / Last-Modified)
+        self.response_cache = ResponseCache(
+            max_entries=int(os.getenv("SELLSY_HTTP_CACHE_SIZE", "512")),
+            disk_path=os.getenv("SELLSY_HTTP_CACHE"),
+        )
 
-        data = response.json()
-        self._access_token = data["access_token"]
-        self._token_expires_at = datetime.now() + timedelta(
-            seconds=data.get("expires_in", 3600)
+        # Taxes, moyens de paiement et devises (cache disque optionnel avec TTL)
+        self.metadata = MetadataRegistry(
+            self,
+            cache_path=os.getenv("SELLSY_METADATA_CACHE"),
+            ttl_hours=float(os.getenv("SELLSY_METADATA_TTL_HOURS", "24")),
         )
 
-        return self._access_token
+        # ID GoCardless imposé par l'environnement (lu une seule fois)
+        payment_id = os.getenv("SELLSY_GOCARDLESS_PAYMENT_ID")
+        self._gocardless_cache: Optional[int] = int(payment_id) if payment_id else None
+
+        # Clients Sellsy déjà résolus (company ou individual), par ID
+        self._client_cache: Dict[int, Dict[str, Any]] = {}
+
+        # Moyen de paiement (mandat GoCardless) de chaque client, mis en cache
+        self.payment_methods = PaymentMethodResolver(self)
+
+    # ---------------------------------------------------------------------
+    # AUTH
+    # ---------------------------------------------------------------------
+
+    def _get_access_token(self) -> str:
+        """Récupère un token OAuth2 valide (cache partagé, rafraîchissement unique)"""
+        return self.token_manager.get_token()
 
     # ---------------------------------------------------------------------
     # API CORE
     # ---------------------------------------------------------------------
 
-    def _make_request(
+    def _send(
         self,
         method: str,
         endpoint: str,
         data: Optional[Dict] = None,
         params: Optional[Dict] = None,
-    ) -> Dict[str, Any]:
+        headers: Optional[Dict] = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        """
+        Envoie une requête authentifiée (un renouvellement du token sur 401)
 
-        token = self._get_access_token()
+        Raises:
+            CircuitOpenError: Famille d'endpoints en échec, aucun appel envoyé
+            SellsyAPIError: Statut HTTP >= 400
+        """
+        family = f"{method} {endpoint_family(endpoint)}"
+        breaker = self.breakers.get(family)
+        breaker.before_call()
 
-        headers = {
-            "Authorization": f"Bearer {token}",
-        }
+        headers = dict(headers or {})
 
         # N'ajouter Content-Type que si on envoie des données
         kwargs = {
@@ -84,54 +129,238 @@ class SellsyClientV2:
             "url": f"{self.api_url}{endpoint}",
             "headers": headers,
             "params": params,
-            "timeout": 30,
+            "timeout": self.timeouts.timeout_for(family),
+            "stream": stream,
         }
 
         if data is not None:
             headers["Content-Type"] = "application/json"
             kwargs["json"] = data
 
-        response = requests.request(**kwargs)
+        try:
+            headers["Authorization"] = f"Bearer {self._get_access_token()}"
+            response = self._timed_request(kwargs, endpoint, family)
+
+            # Token révoqué ou expiré côté Sellsy : un seul renouvellement puis nouvel essai
+            if response.status_code == 401:
+                response.close()
+                self.token_manager.invalidate()
+                headers["Authorization"] = f"Bearer {self._get_access_token()}"
+                response = self._timed_request(kwargs, endpoint, family)
+        except Exception:
+            # Timeout, connexion impossible ou token indisponible (libère aussi l'essai semi-ouvert)
+            breaker.record_failure()
+            raise
+
+        if is_failure_status(response.status_code):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
 
         if response.status_code >= 400:
-            raise Exception(
-                f"Erreur API Sellsy v2: {response.status_code} - {response.text}"
+            raise SellsyAPIError(response.status_code, response.text)
+
+        return response
+
+    def _timed_request(self, kwargs: Dict[str, Any], endpoint: str, family: str) -> requests.Response:
+        # Latence jusqu'aux en-têtes (le corps des listes est lu en flux ensuite)
+        started = time.perf_counter()
+        status = None
+        try:
+            response = self.session.request(**kwargs)
+            status = response.status_code
+            self.timeouts.observe(family, time.perf_counter() - started)
+            return response
+        finally:
+            record_api_call("sellsy", kwargs["method"], endpoint, time.perf_counter() - started, status)
+
+    def _make_request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+    ) -> Dict[str, Any]:
+
+        # Cache des GET : entrée fraîche servie sans appel, périmée revalidée
+        cache_key = cached = None
+        if method == "GET":
+            ttl = self.response_cache.ttl_for(endpoint)
+            if ttl is not None:
+                cache_key = self.response_cache.key_for(endpoint, params)
+                cached, fresh = self.response_cache.lookup(cache_key, ttl)
+                if fresh:
+                    return json.loads(cached.body)
+
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            response = self._send(method, endpoint, data=data, params=params, headers=headers)
+        except CircuitOpenError:
+            # Sellsy dégradé : une réponse en cache, même périmée, vaut mieux qu'un échec
+            if cached is None:
+                raise
+            return json.loads(cached.body)
+
+        if response.status_code == 304 and cached is not None:
+            self.response_cache.touch(cache_key, cached)
+            return json.loads(cached.body)
+
+        if cache_key is not None:
+            self.response_cache.put(
+                cache_key,
+                response.text,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
             )
+        elif method != "GET":
+            # Écriture : les réponses en cache de la ressource sont périmées
+            resource = resource_of(endpoint)
+            if resource:
+                self.response_cache.invalidate(resource)
 
         return response.json()
 
+    def iter_pages(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+        page_size: int = 100,
+        start_offset: int = 0,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Parcourt toutes les pages d'un endpoint de liste ou de recherche
+
+        Args:
+            method: GET (listes) ou POST (endpoints /search)
+            endpoint: Endpoint Sellsy (ex: /invoices/search)
+            data: Corps de la requête (filtres de recherche)
+            params: Paramètres de requête supplémentaires
+            page_size: Nombre d'éléments par page (100 max côté Sellsy)
+            start_offset: Offset de départ (reprise d'un parcours interrompu)
+
+        Yields:
+            Liste des éléments de chaque page
+        """
+        for page in self._stream_pages(method, endpoint, data, params, page_size, start_offset):
+            items = list(page)
+            if items:
+                yield items
+
+    def iter_items(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+        page_size: int = 100,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Parcourt les éléments d'un endpoint de liste ou de recherche, toutes pages
+
+        Contrairement à iter_pages, chaque élément est rendu dès que ses
+        octets sont arrivés, sans attendre la fin de la page.
+
+        Yields:
+            Chaque élément
+        """
+        for page in self._stream_pages(method, endpoint, data, params, page_size, 0):
+            yield from page
+
+    def _stream_pages(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict],
+        params: Optional[Dict],
+        page_size: int,
+        start_offset: int,
+    ) -> Iterator[JsonListStream]:
+        # Chaque page doit être lue entièrement avant de demander la suivante
+        offset = start_offset
+
+        while True:
+            page_params = dict(params or {})
+            page_params["limit"] = page_size
+            page_params["offset"] = offset
+
+            response = self._send(method, endpoint, data=data, params=page_params, stream=True)
+            page = JsonListStream.from_response(response, "data")
+            yield page
+
+            pagination = page.extra.get("pagination") or {}
+            offset += page.count
+            total = pagination.get("total")
+
+            if not page.count or page.count < page_size or (total is not None and offset >= int(total)):
+                return
+
+    def search_invoices(
+        self,
+        filters: Optional[Dict] = None,
+        order: str = "created",
+        direction: str = "desc",
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Recherche des factures côté serveur (POST /invoices/search), toutes pages
+
+        Args:
+            filters: Filtres Sellsy (ex: {"created": {"start": "..."}})
+            order: Champ de tri
+            direction: Sens du tri (asc/desc)
+
+        Yields:
+            Chaque facture trouvée
+        """
+        yield from self.iter_items(
+            "POST",
+            "/invoices/search",
+            data={"filters": filters or {}},
+            params={"order": order, "direction": direction},
+        )
+
+    def get_invoice(self, invoice_id: int) -> Dict[str, Any]:
+        """
+        Récupère le détail complet d'une facture
+
+        Raises:
+            SellsyAPIError: Facture introuvable ou erreur Sellsy
+        """
+        result = self._make_request("GET", f"/invoices/{invoice_id}")
+        return result.get("data") or result
+
     # ---------------------------------------------------------------------
     # METADATA
     # ---------------------------------------------------------------------
 
+    def get_tax_id(self, rate: float) -> int:
+        """Retourne l'ID de la TVA active pour un taux donné (ex: 20, 10, 5.5)"""
+        return self.metadata.get_tax_id(rate)
+
     def get_tva_20_id(self) -> int:
         """Retourne l'ID de la TVA à 20%"""
-
-        if self._tva_cache:
-            return self._tva_cache
-
-        result = self._make_request("GET", "/taxes")
-
-        for tax in result.get("data", []):
-            if tax.get("is_active") and float(tax.get("rate", 0)) == 20:
-                self._tva_cache = int(tax["id"])
-                return self._tva_cache
-
-        raise Exception("TVA 20% non trouvée dans Sellsy")
+        return self.get_tax_id(20)
 
     def get_gocardless_payment_id(self) -> int:
-        """Retourne l'ID GoCardless (env obligatoire)"""
+        """Retourne l'ID GoCardless (variable d'environnement, sinon moyens de paiement Sellsy)"""
 
         if self._gocardless_cache:
             return self._gocardless_cache
 
-        payment_id = os.getenv("SELLSY_GOCARDLESS_PAYMENT_ID")
+        payment_id = self.metadata.find_payment_method_id("gocardless")
         if not payment_id:
             raise Exception(
-                "Variable SELLSY_GOCARDLESS_PAYMENT_ID manquante"
+                "Variable SELLSY_GOCARDLESS_PAYMENT_ID manquante et aucun moyen de paiement GoCardless dans Sellsy"
             )
 
-        self._gocardless_cache = int(payment_id)
+        self._gocardless_cache = payment_id
         return self._gocardless_cache
 
     # ---------------------------------------------------------------------
@@ -142,8 +371,8 @@ class SellsyClientV2:
         self,
         client_id: int,
         product_id: int,
-        prix_ht: float,
-        remise_pct: float,
+        prix_ht,
+        remise_pct,
         libelle_remise: str,
         service_name: str,
     ) -> Dict[str, Any]:
@@ -153,7 +382,7 @@ class SellsyClientV2:
         Args:
             client_id: ID du client (company_id dans Sellsy)
             product_id: ID du produit dans le catalogue Sellsy
-            prix_ht: Prix HT avant remise
+            prix_ht: Prix HT avant remise (Decimal, nombre ou chaîne "57,92")
             remise_pct: Pourcentage de remise
             libelle_remise: Libellé de la remise
             service_name: Nom du service
@@ -164,8 +393,7 @@ class SellsyClientV2:
 
         tva_id = self.get_tva_20_id()
 
-        montant_remise = round(prix_ht * (remise_pct / 100), 2)
-        prix_final = round(prix_ht - montant_remise, 2)
+        montant_remise, prix_final = apply_discount(prix_ht, remise_pct)
 
         # ✅ LIGNE ARTICLE CATALOGUE (sans discount sur la ligne)
         rows = [
@@ -176,7 +404,7 @@ class SellsyClientV2:
                     "id": int(product_id),
                 },
                 "quantity": "1",
-                "unit_amount": str(prix_ht),
+                "unit_amount": format_amount(prix_ht),
                 "tax_id": tva_id,
             }
         ]
@@ -187,7 +415,7 @@ class SellsyClientV2:
                 {
                     "type": "single",
                     "description": libelle_remise,
-                    "unit_amount": str(-montant_remise),
+                    "unit_amount": format_amount(-montant_remise),
                     "quantity": "1",
                     "tax_id": tva_id,
                 }
@@ -214,16 +442,11 @@ class SellsyClientV2:
             "discount_conditions": []
         }
 
-        # Debug
-        import json
-        print("📤 ENVOI SELLSY:")
-        print(json.dumps(invoice_data, indent=2, ensure_ascii=False))
+        _debug_json("📤 ENVOI SELLSY:", invoice_data)
 
         result = self._make_request("POST", "/invoices", data=invoice_data)
 
-        # Debug : voir la structure de la réponse
-        print(f"📥 RÉPONSE SELLSY (création facture):")
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        _debug_json("📥 RÉPONSE SELLSY (création facture):", result)
 
         # Essayer différentes structures possibles
         invoice_id = result.get("data", {}).get("id") or result.get("id")
@@ -234,10 +457,10 @@ class SellsyClientV2:
         # Note: L'API Sellsy v2 ne permet pas l'envoi automatique par email
         # Les factures sont créées en draft et doivent être envoyées depuis l'interface Sellsy
         public_link = result.get("data", {}).get("public_link", {}).get("url") or result.get("public_link", {}).get("url")
-        print(f"✅ Facture {invoice_id} créée en draft")
+        logger.debug(f"✅ Facture {invoice_id} créée en draft")
         if public_link:
-            print(f"🔗 Lien public: {public_link}")
-        print(f"📧 Action requise: Envoyer la facture depuis l'interface Sellsy")
+            logger.debug(f"🔗 Lien public: {public_link}")
+        logger.debug("📧 Action requise: Envoyer la facture depuis l'interface Sellsy")
 
         return {
             "success": True,
@@ -246,46 +469,39 @@ class SellsyClientV2:
             "montant_remise": montant_remise,
         }
 
-    def create_grouped_invoice(
+    def build_grouped_invoice(
         self,
         client_id: int,
         invoice_lines: List[Dict[str, Any]],
-    ) -> Dict[str, Any]:
+        payment_method_id: Optional[int] = None,
+        tva_id: Optional[int] = None,
+    ) -> Tuple[Dict[str, Any], PricedLines]:
         """
-        Crée une facture groupée Sellsy v2 avec plusieurs lignes de produits
+        Construit le corps d'une facture groupée sans l'envoyer
 
         Args:
-            client_id: ID du client (company_id dans Sellsy)
-            invoice_lines: Liste de dictionnaires contenant:
-                - product_id: ID du produit
-                - service_name: Nom du service
-                - prix_ht: Prix HT avant remise
-                - remise_pct: Pourcentage de remise
-                - libelle_remise: Libellé de la remise
+            client_id: ID du client Sellsy
+            invoice_lines: Lignes (voir create_grouped_invoice)
+            payment_method_id: Moyen de paiement (défaut: self.payment_methods)
+            tva_id: ID de la TVA 20% déjà résolu (défaut: registre des métadonnées)
 
         Returns:
-            Réponse avec invoice_id
+            Tuple (corps de la requête POST /invoices, lignes arrondies et totaux)
         """
 
-        tva_id = self.get_tva_20_id()
+        if tva_id is None:
+            tva_id = self.get_tva_20_id()
+
+        # Arrondi en lot des lignes : totaux = somme des lignes arrondies
+        priced = price_lines((line['prix_ht'], line['remise_pct']) for line in invoice_lines)
 
         # Construction des lignes de facture
         rows = []
-        montant_total_ht = 0
-        montant_total_remise = 0
 
-        for line in invoice_lines:
+        for line, amounts in zip(invoice_lines, priced.lines):
             product_id = line['product_id']
-            prix_ht = line['prix_ht']
-            remise_pct = line['remise_pct']
             libelle_remise = line.get('libelle_remise', '')
 
-            montant_remise = round(prix_ht * (remise_pct / 100), 2)
-            prix_final = round(prix_ht - montant_remise, 2)
-
-            montant_total_ht += prix_final
-            montant_total_remise += montant_remise
-
             # Ligne produit (sans discount sur la ligne)
             rows.append({
                 "type": "catalog",
@@ -294,16 +510,16 @@ class SellsyClientV2:
                     "id": int(product_id),
                 },
                 "quantity": "1",
-                "unit_amount": str(prix_ht),
+                "unit_amount": format_amount(amounts.prix_ht),
                 "tax_id": tva_id,
             })
 
             # Ligne remise séparée (si remise > 0)
-            if montant_remise > 0:
+            if amounts.montant_remise > 0:
                 rows.append({
                     "type": "single",
                     "description": libelle_remise,
-                    "unit_amount": str(-montant_remise),
+                    "unit_amount": format_amount(-amounts.montant_remise),
                     "quantity": "1",
                     "tax_id": tva_id,
                 })
@@ -335,39 +551,86 @@ class SellsyClientV2:
             "discount_conditions": []
         }
 
-        # Debug
-        import json
-        print("📤 ENVOI SELLSY (FACTURE GROUPÉE):")
-        print(json.dumps(invoice_data, indent=2, ensure_ascii=False))
+        # Moyen de paiement (prélèvement GoCardless si le client a un mandat)
+        if payment_method_id is None:
+            payment_method_id = self.payment_methods.get(client_id)
+        if payment_method_id:
+            invoice_data["payment_method_ids"] = [int(payment_method_id)]
 
-        result = self._make_request("POST", "/invoices", data=invoice_data)
+        return invoice_data, priced
+
+    def submit_invoice(self, invoice_data: Dict[str, Any]) -> int:
+        """
+        Envoie un corps de facture construit par build_grouped_invoice
 
-        # Debug : voir la structure de la réponse
-        print(f"📥 RÉPONSE SELLSY (création facture groupée):")
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        Returns:
+            ID de la facture créée (draft)
+        """
+        return self._invoice_id(self._make_request("POST", "/invoices", data=invoice_data))
 
+    @staticmethod
+    def _invoice_id(result: Dict[str, Any]) -> int:
         # Essayer différentes structures possibles
         invoice_id = result.get("data", {}).get("id") or result.get("id")
 
         if not invoice_id:
             raise Exception(f"❌ ID de facture non trouvé dans la réponse: {result}")
+        return invoice_id
+
+    def create_grouped_invoice(
+        self,
+        client_id: int,
+        invoice_lines: List[Dict[str, Any]],
+        payment_method_id: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Crée une facture groupée Sellsy v2 avec plusieurs lignes de produits
+
+        Args:
+            client_id: ID du client (company_id dans Sellsy)
+            invoice_lines: Liste de dictionnaires contenant:
+                - product_id: ID du produit
+                - service_name: Nom du service
+                - prix_ht: Prix HT avant remise
+                - remise_pct: Pourcentage de remise
+                - libelle_remise: Libellé de la remise
+            payment_method_id: Moyen de paiement à rattacher (défaut: mandat
+                du client résolu par self.payment_methods, aucun si pas de mandat)
+
+        Returns:
+            Réponse avec invoice_id
+        """
+
+        invoice_data, priced = self.build_grouped_invoice(client_id, invoice_lines, payment_method_id)
+
+        _debug_json("📤 ENVOI SELLSY (FACTURE GROUPÉE):", invoice_data)
+
+        result = self._make_request("POST", "/invoices", data=invoice_data)
+
+        _debug_json("📥 RÉPONSE SELLSY (création facture groupée):", result)
+
+        invoice_id = self._invoice_id(result)
 
         # Note: L'API Sellsy v2 ne permet pas l'envoi automatique par email
         # Les factures sont créées en draft et doivent être envoyées depuis l'interface Sellsy
         public_link = result.get("data", {}).get("public_link", {}).get("url") or result.get("public_link", {}).get("url")
-        print(f"✅ Facture groupée {invoice_id} créée en draft")
+        logger.debug(f"✅ Facture groupée {invoice_id} créée en draft")
         if public_link:
-            print(f"🔗 Lien public: {public_link}")
-        print(f"📧 Action requise: Envoyer la facture depuis l'interface Sellsy")
+            logger.debug(f"🔗 Lien public: {public_link}")
+        logger.debug("📧 Action requise: Envoyer la facture depuis l'interface Sellsy")
 
         return {
             "success": True,
             "invoice_id": invoice_id,
-            "montant_ht": montant_total_ht,
-            "montant_remise": montant_total_remise,
+            "montant_ht": priced.total_ht,
+            "montant_remise": priced.total_remise,
             "nombre_lignes": len(invoice_lines),
         }
 
+    def submit_queue(self, max_workers: int = 4, resolve_clients: bool = True) -> InvoiceSubmitQueue:
+        """File d'envoi groupé de factures (voir src.invoice_batch)"""
+        return InvoiceSubmitQueue(self, max_workers=max_workers, resolve_clients=resolve_clients)
+
     def validate_invoice(
         self,
         invoice_id: int,
@@ -396,10 +659,8 @@ class SellsyClientV2:
             data=data
         )
 
-        import json
-        print(f"✅ Facture {invoice_id} validée (draft → due)")
-        print(f"📥 RÉPONSE SELLSY (validation):")
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        logger.debug(f"✅ Facture {invoice_id} validée (draft → due)")
+        _debug_json("📥 RÉPONSE SELLSY (validation):", result)
 
         return result
 
@@ -408,22 +669,95 @@ class SellsyClientV2:
     # ---------------------------------------------------------------------
 
     def get_client_info(self, client_id: int) -> Dict[str, Any]:
-        """Récupère les informations d'un client et son type (company ou individual)"""
+        """
+        Récupère les informations d'un client et son type (company ou individual)
+
+        Raises:
+            CircuitOpenError, requests.RequestException: Sellsy indisponible
+                (aucun repli : le type du client ne peut pas être déterminé)
+            SellsyAPIError: Client introuvable, ou erreur autre que 404
+        """
+        cached = self._client_cache.get(int(client_id))
+        if cached is not None:
+            return cached
+
         # Essayer d'abord en tant que company
         try:
             result = self._make_request("GET", f"/companies/{client_id}")
             data = result.get("data", {})
             data["_entity_type"] = "company"
-            return data
-        except Exception as e:
-            # Si erreur, essayer en tant que individual (particulier)
+        except SellsyAPIError as e:
+            if e.status_code != 404:
+                raise
+            # Pas une company : essayer en tant que individual (particulier)
             try:
                 result = self._make_request("GET", f"/individuals/{client_id}")
                 data = result.get("data", {})
                 data["_entity_type"] = "individual"
-                return data
-            except Exception as e2:
-                raise Exception(f"Client {client_id} introuvable (ni company ni individual): {e2}")
+            except SellsyAPIError as e2:
+                if e2.status_code != 404:
+                    raise
+                raise SellsyAPIError(404, f"Client {client_id} introuvable (ni company ni individual)")
+
+        self._client_cache[int(client_id)] = data
+        return data
+
+    def get_client_payment_methods(self, client_id: int, entity_type: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Moyens de paiement rattachés à un client
+
+        Args:
+            client_id: ID du client Sellsy
+            entity_type: "company" ou "individual" (voir get_client_info)
+
+        Returns:
+            Liste des moyens de paiement, None si l'endpoint répond 404
+        """
+        endpoint = f"/{'companies' if entity_type == 'company' else 'individuals'}/{client_id}/payment-methods"
+        try:
+            result = self._make_request("GET", endpoint)
+        except SellsyAPIError as e:
+            if e.status_code == 404:
+                return None
+            raise
+        return result.get("data", []) if isinstance(result, dict) else result
+
+    def prefetch_clients(self, client_ids: Iterable[int], chunk_size: int = 100) -> int:
+        """
+        Résout en masse des clients via /companies/search puis /individuals/search
+
+        Les clients trouvés sont mis en cache : get_client_info ne fait plus
+        aucun appel pour eux. Les clients non trouvés seront résolus un par
+        un par get_client_info.
+
+        Args:
+            client_ids: IDs des clients Sellsy
+            chunk_size: Nombre d'IDs par filtre de recherche
+
+        Returns:
+            Nombre de clients résolus par la recherche groupée
+        """
+        pending = sorted({int(client_id) for client_id in client_ids} - set(self._client_cache))
+        resolved = 0
+
+        for endpoint, entity_type in (("/companies/search", "company"),
+                                      ("/individuals/search", "individual")):
+            for start in range(0, len(pending), chunk_size):
+                chunk = pending[start:start + chunk_size]
+                wanted = set(chunk)
+                for page in self.iter_pages("POST", endpoint, data={"filters": {"ids": chunk}}):
+                    for data in page:
+                        if int(data.get("id", 0)) not in wanted:
+                            continue
+                        data["_entity_type"] = entity_type
+                        self._client_cache[int(data["id"])] = data
+                        resolved += 1
+
+            pending = [client_id for client_id in pending if client_id not in self._client_cache]
+            if not pending:
+                break
+
+        return resolved
 
     # ---------------------------------------------------------------------
     # EMAIL
@@ -448,8 +782,6 @@ class SellsyClientV2:
             Réponse de l'API avec les détails de l'email envoyé
         """
 
-        import json
-
         # Récupérer les informations de la facture
         invoice_info = self._make_request("GET", f"/invoices/{invoice_id}")
         invoice_data = invoice_info.get("data") or invoice_info
@@ -515,17 +847,16 @@ class SellsyClientV2:
                 }
             ]
 
-        print(f"📤 ENVOI EMAIL FACTURE {invoice_id} à {contact_email}")
-        print(f"📧 Sujet: {subject}")
+        logger.debug(f"📤 ENVOI EMAIL FACTURE {invoice_id} à {contact_email}")
+        logger.debug(f"📧 Sujet: {subject}")
 
         # Envoyer l'email
         result = self._make_request("POST", "/email/send", data=email_payload)
 
-        print(f"📥 RÉPONSE SELLSY (envoi email):")
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        _debug_json("📥 RÉPONSE SELLSY (envoi email):", result)
 
         email_id = result.get("data", {}).get("id") or result.get("id")
-        print(f"✅ Email envoyé avec succès (ID: {email_id})")
+        logger.debug(f"✅ Email envoyé avec succès (ID: {email_id})")
 
         return result
 
@@ -0,0 +1,128 @@
+"""
+Répartition déterministe des factures groupées entre plusieurs exécutions
+Chaque client appartient toujours au même shard (hash stable du client_id)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Lit une spécification de shard "i/N" (i de 0 à N-1)
+
+    Raises:
+        ValueError: Si la spécification est invalide
+    """
+    try:
+        index, count = (int(part) for part in value.split('/', 1))
+    except ValueError:
+        raise ValueError(f"Shard invalide '{value}' (format attendu: i/N)")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard invalide '{value}' (0 <= i < N)")
+    return index, count
+
+
+def shard_for(client_id, shard_count: int) -> int:
+    """
+    Shard d'un client, identique d'un processus ou d'une machine à l'autre
+
+    hash() n'est pas utilisable ici : il est aléatoire par processus.
+    """
+    digest = hashlib.sha1(str(client_id).strip().encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count
+
+
+def shard_filter(index: int, count: int) -> Callable[[object], bool]:
+    """Prédicat client_id → appartient au shard i sur N"""
+    if count == 1:
+        return lambda client_id: True
+    return lambda client_id: shard_for(client_id, count) == index
+
+
+class ShardJournal:
+    """
+    Journal JSON Lines d'une exécution (un fichier par shard)
+
+    Chaque ligne est un événement : résultat d'un groupe, d'une validation,
+    puis le résumé du shard en dernière ligne.
+    """
+
+    def __init__(self, journal_dir: Optional[str], index: int = 0, count: int = 1):
+        """
+        Initialise le journal
+
+        Args:
+            journal_dir: Dossier des journaux (None = pas de journal)
+            index: Numéro du shard
+            count: Nombre total de shards
+        """
+        self.path = None
+        self._lock = threading.Lock()
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+            self.path = os.path.join(journal_dir, f"shard-{index}-of-{count}.jsonl")
+            # Une nouvelle exécution du shard remplace l'ancien journal
+            open(self.path, 'w').close()
+
+    def write(self, event: str, **data):
+        if not self.path:
+            return
+        line = json.dumps({'event': event, **data}, ensure_ascii=False, default=str) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+def read_journal(path: str) -> Iterable[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def merge_journals(journal_dir: str) -> Dict:
+    """
+    Fusionne les journaux de tous les shards d'un dossier
+
+    Returns:
+        Résumé global (compteurs additionnés, shards incomplets, erreurs)
+    """
+    merged = {
+        'shards': 0,
+        'incomplete_shards': [],
+        'services': 0,
+        'groups': 0,
+        'created': 0,
+        'validated': 0,
+        'errors': 0,
+        'failed_groups': [],
+    }
+
+    for name in sorted(os.listdir(journal_dir)):
+        if not (name.startswith('shard-') and name.endswith('.jsonl')):
+            continue
+
+        merged['shards'] += 1
+        summary = None
+        for entry in read_journal(os.path.join(journal_dir, name)):
+            if entry['event'] == 'group' and entry.get('status') in ('error', 'rejected'):
+                merged['failed_groups'].append({
+                    'client_id': entry.get('client_id'),
+                    'date': entry.get('date'),
+                    'error': entry.get('error'),
+                })
+            elif entry['event'] == 'summary':
+                summary = entry
+
+        # Shard interrompu avant son résumé
+        if summary is None:
+            merged['incomplete_shards'].append(name)
+            continue
+
+        for counter in ('services', 'groups', 'created', 'validated', 'errors'):
+            merged[counter] += summary.get(counter, 0)
+
+    return merged
@@ -0,0 +1,151 @@
+"""
+Modèle d'abonnement décodé une seule fois depuis les enregistrements Airtable
+Dates et prix pré-analysés, validation faite au décodage
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.money import to_decimal
+
+
+@dataclass(frozen=True, slots=True)
+class Subscription:
+    """Service d'abonnement (table service_sellsy) prêt pour la facturation"""
+
+    record_id: str
+    service_name: str
+    client_id: Optional[str]
+    product_id: Optional[int]
+    prix_ht: Decimal
+    date_debut: Optional[date]
+    mois_factures: int
+    occurrences_restantes: int
+    appliquer_remise: bool
+    grid_id: Optional[str]
+    billing_month: Optional[str]
+    problems: Tuple[str, ...]
+    payment_method_id: Optional[int] = None
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.problems
+
+    def months_elapsed(self, today: date) -> int:
+        """Nombre de mois calendaires écoulés depuis la date de début"""
+        return (today.year - self.date_debut.year) * 12 + (today.month - self.date_debut.month)
+
+
+def _parse_date(value, cache: Dict[str, Optional[date]]) -> Optional[date]:
+    if not value:
+        return None
+    parsed = cache.get(value, False)
+    if parsed is False:
+        try:
+            parsed = date.fromisoformat(value)
+        except (TypeError, ValueError):
+            parsed = None
+        cache[value] = parsed
+    return parsed
+
+
+def _parse_price(value) -> Optional[Decimal]:
+    try:
+        return to_decimal(value)
+    except ValueError:
+        return None
+
+
+def _parse_int(value) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_count(value) -> Optional[int]:
+    # Compteur Airtable : vide → 0, None si la valeur n'est pas un entier
+    if value is None or value == '':
+        return 0
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else None
+
+
+def _billing_month(date_debut: date, mois_factures: int) -> str:
+    # Mois suivant le dernier mois facturé (même clé que la facturation groupée)
+    ordinal = date_debut.year * 12 + date_debut.month - 1 + mois_factures + 1
+    return f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+
+def decode_subscription(record: Dict, date_cache: Optional[Dict] = None) -> Subscription:
+    """
+    Décode un enregistrement Airtable en Subscription
+
+    Args:
+        record: Enregistrement Airtable ({'id': ..., 'fields': {...}})
+        date_cache: Cache des dates déjà analysées (partagé pendant un décodage en lot)
+    """
+    fields = record['fields']
+    date_cache = {} if date_cache is None else date_cache
+    problems = []
+
+    client_id = fields.get('ID_Sellsy_abonné')
+    if not client_id:
+        problems.append("ID client (ID_Sellsy_abonné)")
+
+    raw_product = fields.get('ID Sellsy')
+    product_id = None
+    if not raw_product:
+        problems.append("ID produit (ID Sellsy)")
+    else:
+        try:
+            product_id = int(raw_product)
+        except (TypeError, ValueError):
+            problems.append(f"ID produit (ID Sellsy) invalide: {raw_product}")
+
+    raw_date = fields.get('Date de début')
+    date_debut = _parse_date(raw_date, date_cache)
+    if date_debut is None:
+        problems.append("Date de début" if not raw_date else f"Date de début invalide: {raw_date}")
+
+    raw_price = fields.get('Prix HT', 0)
+    prix_ht = _parse_price(raw_price)
+    if prix_ht is None or prix_ht <= 0:
+        problems.append(f"Prix HT valide (actuel: {raw_price})")
+        prix_ht = Decimal('0')
+
+    counters = {}
+    for name in ('Mois facturés', 'Occurrences restantes'):
+        counters[name] = _parse_count(fields.get(name))
+        if counters[name] is None:
+            problems.append(f"{name} invalide: {fields.get(name)}")
+            counters[name] = 0
+    mois_factures = counters['Mois facturés']
+    grids = fields.get('Grille de remise')
+
+    return Subscription(
+        record_id=record['id'],
+        service_name=fields.get('Nom du service', 'Service'),
+        client_id=str(client_id) if client_id else None,
+        product_id=product_id,
+        prix_ht=prix_ht,
+        date_debut=date_debut,
+        mois_factures=mois_factures,
+        occurrences_restantes=counters['Occurrences restantes'],
+        appliquer_remise=fields.get('Appliquer remise dégressive', True),
+        grid_id=grids[0] if grids else None,
+        billing_month=_billing_month(date_debut, mois_factures) if date_debut else None,
+        problems=tuple(problems),
+        payment_method_id=_parse_int(fields.get('ID_Moyen_Paiement_GoCardless')),
+    )
+
+
+def decode_subscriptions(records: Iterable[Dict]) -> List[Subscription]:
+    """Décode un lot d'enregistrements Airtable (dates communes analysées une fois)"""
+    date_cache: Dict[str, Optional[date]] = {}
+    return [decode_subscription(record, date_cache) for record in records]
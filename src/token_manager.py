@@ -0,0 +1,217 @@
+"""
+Gestion partagée du token OAuth2 Sellsy
+Rafraîchissement unique sous concurrence (threads et processus), cache disque optionnel
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from src.deadline import cap_timeout
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus
+    fcntl = None
+
+
+class TokenManager:
+    """
+    Fournit un token OAuth2 valide à tous les clients Sellsy d'un même compte
+
+    - Un seul appel OAuth à la fois : les threads concurrents attendent le
+      rafraîchissement en cours puis réutilisent son résultat.
+    - Cache disque optionnel (fichier JSON, droits 600) protégé par un verrou
+      fcntl : les processus lancés en parallèle partagent le même token.
+    - Rafraîchissement proactif optionnel dans un thread de fond, avant
+      l'expiration, pour qu'aucune requête n'attende l'OAuth.
+    """
+
+    def __init__(self, client_id: str, client_secret: str,
+                 token_url: str = "https://login.sellsy.com/oauth2/access-tokens",
+                 cache_path: Optional[str] = None,
+                 refresh_margin: int = 300):
+        """
+        Initialise le gestionnaire de token
+
+        Args:
+            client_id: Client ID OAuth2 Sellsy
+            client_secret: Client secret OAuth2 Sellsy
+            token_url: URL d'obtention des tokens
+            cache_path: Fichier de cache partagé entre processus (optionnel)
+            refresh_margin: Secondes avant expiration à partir desquelles on renouvelle
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+
+        self._lock = threading.Lock()
+        self._access_token: Optional[str] = None
+        self._expires_at: float = 0.0
+        self._revoked_token: Optional[str] = None
+
+        self._refresher: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # ---------------------------------------------------------------------
+    # TOKEN
+    # ---------------------------------------------------------------------
+
+    def _is_valid(self, expires_at: float, margin: Optional[float] = None) -> bool:
+        margin = self.refresh_margin if margin is None else margin
+        return time.time() < expires_at - margin
+
+    def get_token(self, margin: Optional[float] = None) -> str:
+        """
+        Retourne un token valide (rafraîchi si nécessaire, un seul appel à la fois)
+
+        Args:
+            margin: Durée de validité minimale restante exigée (défaut: refresh_margin)
+        """
+        token, expires_at = self._access_token, self._expires_at
+        if token and self._is_valid(expires_at, margin):
+            return token
+
+        with self._lock:
+            # Un autre thread a pu rafraîchir pendant l'attente du verrou
+            if self._access_token and self._is_valid(self._expires_at, margin):
+                return self._access_token
+            self._refresh_locked(margin)
+            return self._access_token
+
+    def invalidate(self):
+        """Force le renouvellement au prochain appel (ex: réponse 401)"""
+        with self._lock:
+            self._revoked_token = self._access_token
+            self._expires_at = 0.0
+
+    def _refresh_locked(self, margin: Optional[float] = None):
+        """Rafraîchit le token (appelé avec self._lock détenu)"""
+        if not self.cache_path:
+            self._access_token, self._expires_at = self._request_token()
+            return
+
+        lock_path = f"{self.cache_path}.lock"
+        with open(lock_path, "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Un autre processus a pu rafraîchir pendant l'attente du verrou
+                cached = self._read_cache()
+                if cached and cached[0] != self._revoked_token and self._is_valid(cached[1], margin):
+                    self._access_token, self._expires_at = cached
+                    return
+
+                self._access_token, self._expires_at = self._request_token()
+                self._write_cache(self._access_token, self._expires_at)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _request_token(self) -> Tuple[str, float]:
+        response = requests.post(
+            self.token_url,
+            json={
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            },
+            headers={"Content-Type": "application/json"},
+            timeout=cap_timeout(20),
+        )
+
+        if response.status_code != 200:
+            raise Exception(
+                f"Erreur OAuth Sellsy ({response.status_code}) - {response.text}"
+            )
+
+        data = response.json()
+        return data["access_token"], time.time() + data.get("expires_in", 3600)
+
+    # ---------------------------------------------------------------------
+    # CACHE DISQUE
+    # ---------------------------------------------------------------------
+
+    def _read_cache(self) -> Optional[Tuple[str, float]]:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get("client_id") != self.client_id or not data.get("access_token"):
+            return None
+        return data["access_token"], float(data.get("expires_at", 0))
+
+    def _write_cache(self, token: str, expires_at: float):
+        tmp_path = f"{self.cache_path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"client_id": self.client_id, "access_token": token, "expires_at": expires_at}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    # ---------------------------------------------------------------------
+    # RAFRAÎCHISSEMENT PROACTIF
+    # ---------------------------------------------------------------------
+
+    def start_background_refresh(self):
+        """Démarre le renouvellement automatique avant expiration (thread démon)"""
+        if self._refresher and self._refresher.is_alive():
+            return
+        self._stop_event.clear()
+        self._refresher = threading.Thread(
+            target=self._refresh_loop, name="sellsy-token-refresh", daemon=True
+        )
+        self._refresher.start()
+
+    def stop_background_refresh(self):
+        """Arrête le thread de renouvellement"""
+        self._stop_event.set()
+
+    def _refresh_loop(self):
+        # Le thread renouvelle avec une marge double : les requêtes ne voient
+        # jamais un token entrer dans leur propre marge de renouvellement
+        proactive_margin = 2 * self.refresh_margin
+        while not self._stop_event.is_set():
+            try:
+                self.get_token(margin=proactive_margin)
+                delay = max(self._expires_at - proactive_margin - time.time() + 1, 1)
+            except Exception:
+                delay = 30
+            if self._stop_event.wait(delay):
+                return
+
+
+_managers: Dict[str, TokenManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(client_id: str, client_secret: str,
+                      cache_path: Optional[str] = None) -> TokenManager:
+    """
+    Retourne le gestionnaire de token partagé pour un client ID
+
+    Args:
+        client_id: Client ID OAuth2 Sellsy
+        client_secret: Client secret OAuth2 Sellsy
+        cache_path: Cache disque (défaut: variable SELLSY_TOKEN_CACHE, sinon mémoire)
+
+    Returns:
+        Instance unique de TokenManager pour ce client ID dans le processus
+    """
+    with _managers_lock:
+        manager = _managers.get(client_id)
+        if manager is None:
+            manager = TokenManager(
+                client_id,
+                client_secret,
+                cache_path=cache_path or os.getenv("SELLSY_TOKEN_CACHE"),
+            )
+            _managers[client_id] = manager
+        return manager
@@ -0,0 +1,5 @@
+"""
+CLI SUNLIB : synchronisation et outils Sellsy / Airtable
+
+Usage: python -m sunlib <commande> [options]
+"""
@@ -0,0 +1,146 @@
+"""
+Point d'entrée unique des scripts SUNLIB
+
+Chaque sous-commande importe son module au moment de son exécution : `--help`
+ou une commande de consultation ne chargent ni requests, ni sqlite3, ni les
+modules des autres commandes. Les clients sont fournis par src.factory et
+réutilisent les caches disque du token OAuth2 et des métadonnées Sellsy.
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+
+# Caches disque par défaut en usage interactif (surchargés par l'environnement)
+DEFAULT_CACHES = {
+    'SELLSY_TOKEN_CACHE': '.sellsy_token.json',
+    'SELLSY_METADATA_CACHE': 'sellsy_metadata.json',
+    'SELLSY_HTTP_CACHE': 'sellsy_http_cache.db',
+}
+
+
+def _call(module_name: str, function_name: str, *args, **kwargs):
+    """Importe le module de la commande et appelle sa fonction"""
+    module = importlib.import_module(module_name)
+    return getattr(module, function_name)(*args, **kwargs)
+
+
+def _run_sync(args):
+    if args.dry_run:
+        os.environ['DRY_RUN'] = 'true'
+    # Options non fournies : défauts du script (variables SYNC_* comprises)
+    argv = []
+    if args.shard:
+        argv += ['--shard', args.shard]
+    if args.workers is not None:
+        argv += ['--workers', str(args.workers)]
+    if args.journal_dir:
+        argv += ['--journal-dir', args.journal_dir]
+    if args.plan_dir:
+        argv += ['--plan-dir', args.plan_dir]
+    if args.from_plan:
+        argv += ['--from-plan', args.from_plan]
+    if args.report_dir:
+        argv += ['--report-dir', args.report_dir]
+    if args.perf_budgets:
+        argv += ['--perf-budgets', args.perf_budgets]
+    if args.profile:
+        argv += ['--profile', args.profile]
+    if args.deadline:
+        argv += ['--deadline', str(args.deadline)]
+    _call('sync_subscription_invoices', 'main', argv)
+
+
+def _run_search(args):
+    from src.factory import get_sellsy_client
+    _call('search_invoice', 'search_invoices', get_sellsy_client(), args.term, args.limit)
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='sunlib',
+        description="Facturation des abonnements SUNLIB (Airtable → Sellsy)",
+    )
+    commands = parser.add_subparsers(dest='command', metavar='<commande>')
+    commands.required = True
+
+    sync = commands.add_parser('sync', help="Crée les factures d'abonnement du jour")
+    sync.add_argument('--dry-run', action='store_true', help="Simule sans créer de facture")
+    sync.add_argument('--shard', metavar='i/N', help="Ne traite que le shard i sur N (défaut: 0/1)")
+    sync.add_argument('--workers', type=int,
+                      help="Nombre de processus, un shard par processus (défaut: SYNC_WORKERS ou 1)")
+    sync.add_argument('--journal-dir', help="Dossier des journaux par shard")
+    sync.add_argument('--plan-dir', help="Dossier des artefacts du plan (JSON, CSV, diff)")
+    sync.add_argument('--from-plan', metavar='PLAN.json', help="Exécute un plan déjà calculé")
+    sync.add_argument('--report-dir', help="Dossier du rapport de performance")
+    sync.add_argument('--perf-budgets', metavar='METRIQUE=MAX,...', help="Budgets faisant échouer le job")
+    sync.add_argument('--profile', nargs='?', const='deterministic', choices=('deterministic', 'sampling'),
+                      help="Profile l'exécution (pstats et piles repliées dans sync_profiles/)")
+    sync.add_argument('--deadline', type=float, metavar='SECONDES',
+                      help="Budget de temps du run (arrêt propre et point de reprise au-delà)")
+    sync.set_defaults(handler=_run_sync)
+
+    serve = commands.add_parser('serve', help="Service de facturation en continu (webhooks)")
+    serve.add_argument('--host')
+    serve.add_argument('--port', type=int)
+    serve.set_defaults(handler=lambda args: _call('billing_service', 'main', [
+        *(['--host', args.host] if args.host else []),
+        *(['--port', str(args.port)] if args.port else []),
+    ]))
+
+    search = commands.add_parser('search', help="Cherche des factures (index local)")
+    search.add_argument('term', nargs='?', help="Numéro, sujet ou client")
+    search.add_argument('limit', nargs='?', type=int, default=50)
+    search.set_defaults(handler=_run_search)
+
+    list_cmd = commands.add_parser('list', help="Liste les dernières factures")
+    list_cmd.add_argument('limit', nargs='?', type=int, default=20)
+    list_cmd.set_defaults(handler=lambda args: _call('list_invoices', 'list_invoices', args.limit))
+
+    invoice = commands.add_parser('invoice', help="Inspecte une facture")
+    invoice.add_argument('invoice_id')
+    invoice.set_defaults(handler=lambda args: _call('inspect_invoice', 'inspect_invoice', args.invoice_id))
+
+    client = commands.add_parser('client', help="Inspecte un client Sellsy (GoCardless)")
+    client.add_argument('client_id', type=int)
+    client.set_defaults(handler=lambda args: _call('inspect_client_gocardless', 'inspect_client', args.client_id))
+
+    gocardless = commands.add_parser('gocardless-id', help="Affiche l'ID du moyen de paiement GoCardless")
+    gocardless.set_defaults(handler=lambda args: _call('get_gocardless_id', 'main'))
+
+    export = commands.add_parser('export', help="Exporte les factures d'une période (NDJSON gzip)")
+    export.add_argument('start_date', help="YYYY-MM-DD")
+    export.add_argument('end_date', help="YYYY-MM-DD")
+    export.add_argument('output', nargs='?')
+    export.set_defaults(handler=lambda args: _call(
+        'export_invoices', 'export_invoices', args.start_date, args.end_date, args.output
+    ))
+
+    forecast = commands.add_parser('forecast', help="Prévision des revenus d'abonnement")
+    forecast.add_argument('horizon', nargs='?', type=int, help="Nombre de mois projetés")
+    forecast.set_defaults(handler=lambda args: _call('forecast_revenue', 'forecast_revenue', args.horizon))
+
+    reconcile = commands.add_parser('reconcile', help="Rapproche Airtable et Sellsy")
+    reconcile.set_defaults(handler=lambda args: _call('reconcile_invoices', 'main'))
+
+    mirror = commands.add_parser('mirror', help="Rafraîchit le miroir SQLite d'Airtable")
+    mirror.add_argument('--full', action='store_true', help="Rechargement complet")
+    mirror.set_defaults(handler=lambda args: _call('sync_airtable_mirror', 'refresh_mirror', args.full))
+
+    return parser
+
+
+def main(argv=None):
+    args = _build_parser().parse_args(argv)
+
+    from src.factory import load_env
+    load_env()
+    for name, path in DEFAULT_CACHES.items():
+        os.environ.setdefault(name, path)
+
+    try:
+        args.handler(args)
+    except KeyboardInterrupt:
+        sys.exit(130)
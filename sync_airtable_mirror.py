@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Script pour rafraîchir le miroir SQLite local des tables Airtable
+
+Usage: python sync_airtable_mirror.py [--full]
+"""
+
+import os
+import sys
+from src.factory import get_airtable_client
+from src.airtable_mirror import AirtableMirror
+
+
+def refresh_mirror(full=False):
+    airtable = get_airtable_client(use_mirror=False)
+    db_path = os.getenv('AIRTABLE_MIRROR_PATH', 'airtable_mirror.db')
+    mirror = AirtableMirror(airtable, db_path)
+
+    print(f"🗄️  Rafraîchissement {'complet' if full else 'incrémental'} du miroir: {db_path}\n")
+
+    try:
+        changed = mirror.refresh(full=full)
+        print(f"✅ {len(changed)} service(s) ajouté(s) ou modifié(s)")
+        print(f"📊 {len(mirror.get_eligible_subscriptions())} abonnement(s) éligible(s)")
+        print(f"📊 {len(mirror.get_discount_grids())} grille(s) de remise")
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        sys.exit(1)
+    finally:
+        mirror.close()
+
+
+def main():
+    refresh_mirror(full='--full' in sys.argv[1:])
+
+
+if __name__ == "__main__":
+    main()
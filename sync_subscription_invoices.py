@@ -3,16 +3,30 @@ Synchronisation automatique des factures d'abonnement Sellsy V2.0
 Gestion des remises dynamiques via grilles Airtable
 """
 
+import glob
+import json
 import os
 import sys
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
-from typing import Dict, List, Optional
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import argparse
 
 # Import des clients
-from src.airtable_client import AirtableClient
-from src.sellsy_client_v2 import SellsyClientV2
+from src.airtable_mirror import AirtableMirror
+from src.deadline import Deadline, deadline_expired, propagate
+from src.factory import get_airtable_client, get_sellsy_client, open_airtable_mirror
+from src.perf_report import PerfRecorder, parse_budgets, report_path, write_report
+from src.plan_artifacts import load_plan, write_plan_artifacts
+from src.planner import InvoicePlan, InvoicePlanner, PlannedInvoice
+from src.profiling import DEFAULT_INTERVAL, PROFILE_MODES, profiled
+from src.product_catalog import ProductCatalog
+from src.sharding import ShardJournal, merge_journals, parse_shard, shard_filter
+from src.subscription import Subscription, decode_subscriptions
 
 # Configuration du logging
 logging.basicConfig(
@@ -26,34 +40,54 @@ logger = logging.getLogger(__name__)
 class SubscriptionInvoiceSync:
     """Gestionnaire de synchronisation des factures d'abonnement"""
     
-    def __init__(self, dry_run: bool = False):
+    def __init__(self, dry_run: bool = False, shard: Tuple[int, int] = (0, 1),
+                 journal_dir: Optional[str] = None, concurrency: Optional[int] = None,
+                 plan_dir: Optional[str] = None, from_plan: Optional[str] = None,
+                 report_dir: Optional[str] = None, budgets: Optional[Dict[str, float]] = None,
+                 deadline: Optional[float] = None, checkpoint_dir: Optional[str] = None):
         """
         Initialise le synchroniseur
         
         Args:
             dry_run: Si True, simule sans créer réellement les factures
+            shard: (i, N) pour ne traiter que les clients du shard i sur N
+            journal_dir: Dossier du journal JSON Lines de l'exécution (optionnel)
+            concurrency: Factures créées en parallèle (défaut: SYNC_CONCURRENCY ou 4)
+            plan_dir: Dossier des artefacts du plan (JSON, CSV, diff), optionnel
+            from_plan: Plan JSON à exécuter tel quel au lieu de le recalculer
+            report_dir: Dossier du rapport de performance JSON (optionnel)
+            budgets: Maximum par métrique du rapport (ex: {'api_calls_per_invoice': 4})
+            deadline: Échéance du run (timestamp) : plus aucune facture n'est
+                lancée au-delà, le reste est reporté au run suivant
+            checkpoint_dir: Dossier des points de reprise (défaut: SYNC_CHECKPOINT_DIR
+                ou sync_checkpoints)
         """
         self.dry_run = dry_run
+        self.plan_dir = plan_dir
+        self.from_plan = from_plan
+        self.report_dir = report_dir
+        self.budgets = budgets or {}
+        self.perf = PerfRecorder()
+        self.perf_report: Optional[Dict] = None
+        self.deadline = Deadline(deadline) if deadline else None
+        self.checkpoint_dir = checkpoint_dir or os.getenv('SYNC_CHECKPOINT_DIR', 'sync_checkpoints')
+        # Factures créées dont la validation a été reportée (échéance atteinte)
+        self.pending_validation: List[int] = []
+        self.concurrency = concurrency or int(os.getenv('SYNC_CONCURRENCY', '4'))
+        self.shard_index, self.shard_count = shard
+        self.journal = ShardJournal(journal_dir, self.shard_index, self.shard_count)
         
         # Validation de la configuration
         self._validate_config()
         
-        # Initialisation des clients
-        self.airtable = AirtableClient(
-            api_key=os.getenv('AIRTABLE_API_KEY'),
-            base_id=os.getenv('AIRTABLE_BASE_ID'),
-            table_services=os.getenv('AIRTABLE_TABLE_NAME', 'service_sellsy'),
-            table_grilles=os.getenv('AIRTABLE_TABLE_GRILLES', 'grilles_remise')
-        )
+        # Initialisation des clients (miroir SQLite local si AIRTABLE_MIRROR_PATH est défini)
+        self.airtable = get_airtable_client()
         
         # ✅ Nouveau client Sellsy v2 avec OAuth2
-        self.sellsy = SellsyClientV2(
-            client_id=os.getenv('SELLSY_V2_CLIENT_ID'),
-            client_secret=os.getenv('SELLSY_V2_CLIENT_SECRET')
-        )
+        self.sellsy = get_sellsy_client()
         
-        # Cache pour la grille par défaut
-        self._default_grid: Optional[Dict] = None
+        # Catalogue produits Sellsy (chargé une fois par exécution)
+        self.catalog = ProductCatalog(self.sellsy)
     
     def _validate_config(self):
         """Valide que toutes les variables d'environnement sont présentes"""
@@ -76,482 +110,728 @@ class SubscriptionInvoiceSync:
         logger.info(f"📊 Table grilles: {os.getenv('AIRTABLE_TABLE_GRILLES', 'grilles_remise')}")
         logger.info(f"🔐 Sellsy API: v2 (OAuth2)")
     
-    def get_default_discount_grid(self) -> Dict:
+    def load_discount_grids(self) -> Tuple[Dict[str, Dict], Optional[Dict]]:
         """
-        Récupère la grille de remise par défaut depuis Airtable
-        Utilise un cache pour éviter les appels répétés
+        Charge toutes les grilles de remise en une lecture
 
         Returns:
-            Dictionnaire contenant les pourcentages de remise par année
+            Tuple (grilles indexées par ID de record, grille par défaut ou None)
+        """
+        grids_by_id = self.airtable.get_discount_grids_by_id()
+        default_grid = next(
+            (grid for grid in grids_by_id.values() if grid.get('Grille par défaut', False)),
+            None
+        )
+        if default_grid is None:
+            logger.warning("⚠️  Aucune grille de remise par défaut n'est définie dans Airtable")
+        return grids_by_id, default_grid
 
-        Raises:
-            Exception: Si aucune grille par défaut n'est trouvée
+    def build_plan(self, subscriptions: List[Subscription]) -> InvoicePlan:
         """
-        if self._default_grid:
-            return self._default_grid
+        Phase de planification : calcule toutes les factures sans appel d'écriture
 
-        grids = self.airtable.get_discount_grids()
+        Args:
+            subscriptions: Abonnements éligibles décodés
 
-        for grid in grids:
-            if grid.get('Grille par défaut', False):
-                self._default_grid = grid
-                return grid
+        Returns:
+            Plan limité au shard courant
+        """
+        grids_by_id, default_grid = self.load_discount_grids()
+        plan = InvoicePlanner(grids_by_id, default_grid).plan(subscriptions)
+        if self.shard_count > 1:
+            plan = plan.select(shard_filter(self.shard_index, self.shard_count))
+        return plan
+
+    def write_artifacts(self, plan: InvoicePlan):
+        """Écrit les artefacts du plan et résume le diff avec le plan précédent"""
+        if not self.plan_dir:
+            return
+        try:
+            diff = write_plan_artifacts(plan, self.plan_dir, self.shard_index, self.shard_count)
+        except OSError as e:
+            logger.warning(f"⚠️  Artefacts du plan non écrits: {str(e)}")
+            return
+
+        logger.info(f"🗒️  Plan écrit dans {self.plan_dir}/")
+        if diff['previous_today'] is None:
+            logger.info("   Aucun plan précédent à comparer")
+        else:
+            logger.info(f"   Diff avec le plan du {diff['previous_today']}: "
+                        f"{len(diff['added'])} ajoutée(s), {len(diff['removed'])} retirée(s), "
+                        f"{len(diff['changed'])} modifiée(s), {diff['unchanged']} inchangée(s)")
+        logger.info("")
 
-        raise Exception("❌ Aucune grille de remise par défaut n'est définie dans Airtable")
-    
-    def get_discount_info(self, mois_ecoules: int, grid: Dict) -> tuple:
+    def reject_stale_invoices(self, plan: InvoicePlan, services: List[Subscription]) -> Tuple[InvoicePlan, int]:
         """
-        Récupère le pourcentage de remise et le label selon l'année en cours
+        Écarte les factures d'un plan chargé dont les compteurs Airtable ont changé
+
+        Un plan relu (--from-plan) n'est exécuté que si chaque service est
+        toujours éligible avec le même nombre de mois facturés qu'au moment
+        du calcul : sinon le mois a déjà été facturé (ou le service modifié)
+        et la facture est écartée pour éviter une double facturation.
+
+        Returns:
+            Tuple (plan sans les factures périmées, nombre de factures écartées)
+        """
+        current = {service.record_id: service.mois_factures for service in services}
+        stale = []
+        for invoice in plan.invoices:
+            changed = [
+                update.record_id for update in invoice.updates
+                if current.get(update.record_id) != update.mois_factures_avant
+            ]
+            if changed:
+                stale.append(invoice.key)
+                logger.error(f"❌ Groupe Client {invoice.client_id} - Date {invoice.billing_month} écarté: "
+                             f"compteurs modifiés depuis le plan ({', '.join(changed)})")
+                self.journal.write(
+                    'group', client_id=invoice.client_id, date=invoice.billing_month,
+                    services=[line.record_id for line in invoice.lines],
+                    status='rejected', error='Plan périmé'
+                )
+        return plan.without(stale), len(stale)
+
+    def log_plan(self, plan: InvoicePlan):
+        """Affiche le plan calculé (factures, lignes, remises, services ignorés)"""
+        for invoice in plan.invoices:
+            logger.info(f"📋 Client {invoice.client_id} - Date {invoice.billing_month}: "
+                        f"{len(invoice.lines)} ligne(s), total HT {invoice.total_ht}€")
+            for line in invoice.lines:
+                if line.montant_remise > 0:
+                    logger.info(f"  • {line.service_name} (mois {line.mois}) | {line.prix_ht}€ "
+                                f"- {line.remise_pct}% ({line.libelle_remise}) = {line.prix_final}€")
+                else:
+                    logger.info(f"  • {line.service_name} (mois {line.mois}) | {line.prix_ht}€ | Pas de remise")
+                if line.late_months:
+                    logger.warning(f"    ⚠️  RETARD : {line.late_months + 1} mois non facturés, "
+                                   f"facturation uniquement du mois {line.mois}")
+                if line.warning:
+                    logger.warning(f"    ⚠️  {line.warning}")
+
+        for skip in plan.skipped:
+            logger.info(f"⏭️  {skip.service_name} ({skip.record_id}): {skip.reason}")
+        logger.info("")
+
+    def reject_invalid_products(self, plan: InvoicePlan) -> Tuple[InvoicePlan, int]:
+        """
+        Écarte les factures dont un produit 'ID Sellsy' n'existe pas dans le catalogue
 
         Args:
-            mois_ecoules: Nombre de mois écoulés depuis le début
-            grid: Grille de remise (dict avec Année 1 (%), Label Année 1, etc.)
+            plan: Plan de facturation
 
         Returns:
-            Tuple (pourcentage de remise, label) ou (0, "") si pas de remise
+            Tuple (plan sans les factures rejetées, nombre de factures rejetées)
         """
-        if mois_ecoules <= 12:
-            pct = grid.get('Année 1 (%)', 0)
-            label = grid.get('Label Année 1', '')
-        elif mois_ecoules <= 24:
-            pct = grid.get('Année 2 (%)', 0)
-            label = grid.get('Label Année 2', '')
-        else:
-            pct = grid.get('Année 3+ (%)', 0)
-            label = grid.get('Label Année 3+', '')
+        try:
+            count = self.catalog.load()
+            logger.info(f"🗂️  Catalogue Sellsy chargé ({count} article(s))")
+        except Exception as e:
+            logger.warning(f"⚠️  Catalogue Sellsy indisponible, produits non validés: {str(e)}")
+            return plan, 0
 
-        # Convertir en float et s'assurer que c'est un nombre valide
+        invalid = self.catalog.validate({
+            line.product_id for invoice in plan.invoices for line in invoice.lines
+        })
+
+        if not invalid:
+            logger.info("")
+            return plan, 0
+
+        rejected = []
+        for invoice in plan.invoices:
+            bad = [line for line in invoice.lines if line.product_id in invalid]
+            if bad:
+                rejected.append(invoice.key)
+                logger.error(f"❌ Groupe Client {invoice.client_id} - Date {invoice.billing_month} rejeté: "
+                             f"produit(s) inconnu(s) dans Sellsy")
+                for line in bad:
+                    logger.error(f"     - {line.service_name} (ID Sellsy: {line.product_id})")
+                self.journal.write(
+                    'group', client_id=invoice.client_id, date=invoice.billing_month,
+                    services=[line.record_id for line in invoice.lines],
+                    status='rejected', error='Produit inconnu dans Sellsy'
+                )
+
+        logger.info("")
+        return plan.without(rejected), len(rejected)
+
+    def prefetch_clients(self, plan: InvoicePlan):
+        """Résolution groupée des clients Sellsy du plan (évite 1 à 2 GET par facture)"""
+        if not plan.invoices:
+            return
+        client_ids = {int(invoice.client_id) for invoice in plan.invoices}
         try:
-            pct = float(pct) if pct else 0
-        except (ValueError, TypeError):
-            pct = 0
+            resolved = self.sellsy.prefetch_clients(client_ids)
+            logger.info(f"👥 {resolved}/{len(client_ids)} client(s) Sellsy résolu(s) en masse")
+        except Exception as e:
+            logger.warning(f"⚠️  Préchargement des clients impossible, résolution unitaire: {str(e)}")
+        logger.info("")
 
-        # Ne retourner que si le pourcentage est > 0
-        if pct > 0 and label:
-            return (pct, label)
-        else:
-            return (0, "")
-    
-    def process_single_subscription(self, service: Dict) -> bool:
+    def resolve_payment_methods(self, plan: InvoicePlan):
         """
-        Traite un abonnement individuel
-        
-        Args:
-            service: Dictionnaire contenant les données du service Airtable
-            
-        Returns:
-            True si la facture a été créée avec succès, False sinon
+        Résout en parallèle le moyen de paiement (mandat GoCardless) des clients du plan
+
+        Le champ Airtable ID_Moyen_Paiement_GoCardless est prioritaire ; les
+        autres clients sont recherchés dans Sellsy, une fois par client.
         """
+        if not plan.invoices:
+            return
+        resolver = self.sellsy.payment_methods
+        resolver.prime({
+            invoice.client_id: invoice.payment_method_id
+            for invoice in plan.invoices if invoice.payment_method_id
+        })
         try:
-            record_id = service['id']
-            fields = service['fields']
-            
-            # Extraction des données
-            service_name = fields.get('Nom du service', 'Service')
-            client_id = fields.get('ID_Sellsy_abonné')  # ID du client dans Sellsy
-            product_id = fields.get('ID Sellsy')  # ID du produit dans Sellsy
-            prix_ht = fields.get('Prix HT', 0)
-            date_debut = fields.get('Date de début')
-            mois_factures = fields.get('Mois facturés', 0)
-            occurrences_restantes = fields.get('Occurrences restantes', 0)
-            
-            # Validation des données essentielles
-            missing_data = []
-            if not client_id:
-                missing_data.append("ID client (ID_Sellsy_abonné)")
-            if not product_id:
-                missing_data.append("ID produit (ID Sellsy)")
-            if not date_debut:
-                missing_data.append("Date de début")
-            if not (prix_ht and prix_ht > 0):
-                missing_data.append(f"Prix HT valide (actuel: {prix_ht})")
-            
-            if missing_data:
-                logger.warning(f"⚠️  Données incomplètes pour {service_name}")
-                logger.warning(f"     Champs manquants: {', '.join(missing_data)}")
-                return False
-            
-            # Calcul des mois écoulés
-            date_debut_obj = datetime.strptime(date_debut, '%Y-%m-%d')
-            aujourd_hui = datetime.now()
-            mois_ecoules = (aujourd_hui.year - date_debut_obj.year) * 12 + \
-                          (aujourd_hui.month - date_debut_obj.month)
-            
-            logger.info(f"📋 Traitement: {service_name}")
-            logger.info("=" * 70)
-            logger.info(f"  📅 Date début: {date_debut}, Mois écoulés: {mois_ecoules}, "
-                       f"Mois facturés: {mois_factures}, Aujourd'hui: {aujourd_hui.strftime('%Y-%m-%d')}")
-            
-            # Vérifier si une facturation est due
-            if mois_ecoules < mois_factures:
-                logger.info(f"  ⏭️  Pas de facturation due (mois écoulés: {mois_ecoules} < mois facturés: {mois_factures})")
-                return False
-
-            # Protection anti-double facturation : ne facturer qu'UN SEUL mois à la fois
-            if mois_ecoules > mois_factures + 1:
-                logger.warning(f"  ⚠️  RETARD DÉTECTÉ : {mois_ecoules - mois_factures} mois non facturés")
-                logger.warning(f"  ⚠️  Pour éviter la double facturation, on facture uniquement le mois {mois_factures + 1}")
-                logger.warning(f"  ⚠️  Les mois suivants seront facturés lors des prochaines exécutions")
-
-            logger.info(f"  ✅ Facturation du mois {mois_factures + 1}")
-            logger.info(f"  🚀 Création de la facture...")
-
-            # Calcul de la remise (optionnel)
-            appliquer_remise = fields.get('Appliquer remise dégressive', True)
-
-            if appliquer_remise:
-                # Récupération de la grille de remise uniquement si nécessaire
-                try:
-                    grille_id = fields.get('Grille de remise')
-                    if grille_id and len(grille_id) > 0:
-                        # Grille spécifique liée
-                        grille = self.airtable.get_discount_grid(grille_id[0])
-                        logger.info(f"  📊 Grille spécifique: '{grille.get('Nom de la grille', 'N/A')}'")
-                    else:
-                        # Grille par défaut
-                        grille = self.get_default_discount_grid()
-                        logger.info(f"  📊 Grille par défaut: '{grille.get('Nom de la grille', 'N/A')}'")
-
-                    # Récupération du pourcentage et du label pour l'année en cours
-                    remise_pct, libelle_remise = self.get_discount_info(mois_factures + 1, grille)
-                    montant_remise = round(prix_ht * (remise_pct / 100), 2)
-                    prix_final = round(prix_ht - montant_remise, 2)
-
-                except Exception as e:
-                    logger.warning(f"  ⚠️  Impossible de récupérer la grille de remise: {str(e)}")
-                    logger.warning(f"  ⚠️  Facture créée sans remise")
-                    remise_pct = 0
-                    montant_remise = 0
-                    prix_final = prix_ht
-                    libelle_remise = ""
-            else:
-                logger.info(f"  📊 Remise désactivée pour cet abonnement")
-                remise_pct = 0
-                montant_remise = 0
-                prix_final = prix_ht
-                libelle_remise = ""
-            
-            if remise_pct > 0 and libelle_remise:
-                logger.info(f"  💰 Prix HT: {prix_ht}€ | Remise: {remise_pct}% ({libelle_remise}) | Final: {prix_final}€")
-            else:
-                logger.info(f"  💰 Prix HT: {prix_ht}€ | Pas de remise")
-            
-            # Mode dry-run : simulation uniquement
-            if self.dry_run:
-                logger.info(f"  🧪 MODE DRY-RUN: Facture non créée (test uniquement)")
-                logger.info(f"     - Client ID: {client_id}")
-                logger.info(f"     - Produit ID: {product_id}")
-                logger.info(f"     - Montant final: {prix_final}€ HT")
-                logger.info(f"     - Remise: {libelle_remise}")
-                return True
-            
-            # Création de la facture dans Sellsy
-            logger.info(f"  📤 Envoi de la facture à Sellsy v2...")
-            result = self.sellsy.create_invoice(
-                client_id=int(client_id),
-                product_id=int(product_id),
-                prix_ht=prix_ht,
-                remise_pct=remise_pct,
-                libelle_remise=libelle_remise,
-                service_name=service_name
-            )
-            
-            invoice_id = result.get('invoice_id')
-            logger.info(f"  ✅ Facture créée dans Sellsy ! (ID: {invoice_id})")
-            
-            # Mise à jour des compteurs dans Airtable
-            nouveau_mois_factures = mois_factures + 1
-            nouvelles_occurrences = max(0, occurrences_restantes - 1)
-            
-            self.airtable.update_service_counters(
-                record_id=record_id,
-                mois_factures=nouveau_mois_factures,
-                occurrences_restantes=nouvelles_occurrences
-            )
-            
-            logger.info(f"  ✅ Compteurs mis à jour dans Airtable")
-            logger.info(f"     - Mois facturés: {mois_factures} → {nouveau_mois_factures}")
-            logger.info(f"     - Occurrences restantes: {occurrences_restantes} → {nouvelles_occurrences}")
-            
-            return True
-            
+            resolved = resolver.resolve_many(invoice.client_id for invoice in plan.invoices)
+        except Exception as e:
+            logger.warning(f"⚠️  Moyens de paiement non résolus: {str(e)}")
+            return
+        with_mandate = sum(1 for payment_id in resolved.values() if payment_id)
+        logger.info(f"💳 {with_mandate}/{len(resolved)} client(s) avec un moyen de paiement GoCardless")
+        logger.info("")
+
+    def update_counters(self, invoice: PlannedInvoice, invoice_id: int):
+        """
+        Met à jour les compteurs Airtable d'une facture créée (un seul appel)
+
+        Raises:
+            Exception: Si la mise à jour échoue
+        """
+        logger.info(f"  ✅ Facture groupée créée pour le client {invoice.client_id} (ID: {invoice_id}, "
+                    f"{len(invoice.lines)} ligne(s)) - en attente de validation (draft)")
+        with self.perf.phase('counters'):
+            self.airtable.update_counters_batch([
+                {
+                    'record_id': update.record_id,
+                    'mois_factures': update.mois_factures,
+                    'occurrences_restantes': update.occurrences_restantes,
+                }
+                for update in invoice.updates
+            ])
+        logger.info(f"  ✅ Compteurs mis à jour dans Airtable ({len(invoice.updates)} services)")
+
+    def validate_and_send(self, invoice_id: int) -> bool:
+        """Valide une facture créée (draft → due) puis envoie l'email"""
+        if deadline_expired():
+            # Reste en brouillon : validée au prochain run (point de reprise)
+            self.pending_validation.append(invoice_id)
+            self.journal.write('validation', invoice_id=invoice_id, validated=False, deferred=True)
+            return False
+
+        try:
+            self.sellsy.validate_invoice(invoice_id)
+            logger.info(f"  ✅ Facture {invoice_id} validée (draft → due)")
         except Exception as e:
-            logger.error(f"  ❌ Échec de la création de la facture")
-            logger.error(f"  ❌ {str(e)}")
+            logger.error(f"  ❌ Échec validation facture {invoice_id}: {str(e)}")
+            self.journal.write('validation', invoice_id=invoice_id, validated=False, error=str(e))
             return False
-    
-    def group_services_by_client_and_date(self, services: List[Dict]) -> Dict[tuple, List[Dict]]:
+
+        # Envoi automatique de l'email après validation
+        email_sent = False
+        try:
+            with self.perf.phase('email'):
+                self.sellsy.send_invoice_email(invoice_id)
+            logger.info(f"  ✅ Email envoyé pour la facture {invoice_id}")
+            email_sent = True
+        except Exception as email_error:
+            logger.warning(f"  ⚠️  Échec envoi email facture {invoice_id}: {str(email_error)}")
+            logger.warning(f"  ⚠️  La facture a été validée mais l'email n'a pas été envoyé")
+        self.journal.write('validation', invoice_id=invoice_id, validated=True, email_sent=email_sent)
+        return True
+
+    def execute_plan(self, plan: InvoicePlan) -> Tuple[List[int], int]:
         """
-        Groupe les services par (client_id, date_facturation)
+        Phase d'exécution : crée les factures du plan en lot
 
-        Args:
-            services: Liste des services éligibles
+        Les factures passent par la file d'envoi Sellsy (préparation commune
+        puis POST parallèles) ; les compteurs d'une facture sont mis à jour
+        dès sa création, dans le thread d'envoi.
 
         Returns:
-            Dictionnaire avec clé (client_id, date) et valeur liste de services
+            Tuple (IDs des factures créées dans l'ordre du plan, nombre d'échecs)
         """
-        from collections import defaultdict
-        grouped = defaultdict(list)
+        self.prefetch_clients(plan)
+        self.resolve_payment_methods(plan)
+
+        # Clients et moyens de paiement résolus ci-dessus : la file ne les recherche pas à nouveau
+        invoices = {invoice.key: invoice for invoice in plan.invoices}
+        queue = self.sellsy.submit_queue(max_workers=self.concurrency, resolve_clients=False)
+        for invoice in plan.invoices:
+            queue.add(
+                int(invoice.client_id),
+                invoice.sellsy_lines(),
+                payment_method_id=self.sellsy.payment_methods.get(invoice.client_id),
+                key=invoice.key,
+            )
 
-        for service in services:
-            fields = service['fields']
-            client_id = fields.get('ID_Sellsy_abonné')
-            date_debut = fields.get('Date de début')
-            mois_factures = fields.get('Mois facturés', 0)
+        def on_created(job, result):
+            if result.ok:
+                self.update_counters(invoices[job.key], result.invoice_id)
 
-            # Calculer la date de facturation (mois suivant)
-            if client_id and date_debut:
-                date_debut_obj = datetime.strptime(date_debut, '%Y-%m-%d')
-                date_facturation = date_debut_obj + relativedelta(months=mois_factures + 1)
-                date_key = date_facturation.strftime('%Y-%m')
+        report = queue.submit(on_result=on_created)
 
-                key = (str(client_id), date_key)
-                grouped[key].append(service)
+        error_count = 0
+        for result in report.results:
+            invoice = invoices[result.key]
+            record_ids = [line.record_id for line in invoice.lines]
+            if result.ok:
+                self.journal.write(
+                    'group', client_id=invoice.client_id, date=invoice.billing_month,
+                    services=record_ids, status='created', invoice_id=result.invoice_id
+                )
+            elif result.deferred:
+                self.journal.write(
+                    'group', client_id=invoice.client_id, date=invoice.billing_month,
+                    services=record_ids, status='deferred'
+                )
+            else:
+                error_count += 1
+                logger.error(f"❌ Échec de la facture Client {invoice.client_id} - "
+                             f"Date {invoice.billing_month}: {result.error}")
+                self.journal.write(
+                    'group', client_id=invoice.client_id, date=invoice.billing_month,
+                    services=record_ids, status='error', error=result.error,
+                    invoice_id=result.invoice_id
+                )
 
-        return dict(grouped)
+        if report.results:
+            logger.info(f"📨 Lot Sellsy: {len(report.created)}/{len(report.results)} facture(s) créée(s) "
+                        f"(préparation {report.prepare_seconds:.1f}s, envoi {report.submit_seconds:.1f}s)")
+        if report.deferred:
+            logger.warning(f"⏳ {len(report.deferred)} facture(s) reportée(s) au prochain run (échéance atteinte)")
+        return [result.invoice_id for result in report.created], error_count
 
-    def process_grouped_subscription(self, client_id: str, date_key: str, services: List[Dict]) -> bool:
+    def validate_invoices(self, invoice_ids: List[int]) -> int:
         """
-        Traite un groupe d'abonnements pour un même client et une même date
-        Crée une seule facture avec plusieurs lignes
+        Valide et envoie en parallèle les factures créées
 
-        Args:
-            client_id: ID du client Sellsy
-            date_key: Clé de date au format YYYY-MM
-            services: Liste des services à facturer ensemble
+        Returns:
+            Nombre de factures validées
+        """
+        if not invoice_ids:
+            return 0
+
+        logger.info("=" * 70)
+        logger.info(f"🔄 VALIDATION DES FACTURES CRÉÉES ({len(invoice_ids)} facture(s))")
+        logger.info("=" * 70)
+
+        deferred_before = len(self.pending_validation)
+        with self.perf.phase('validate'), ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            validated_count = sum(executor.map(propagate(self.validate_and_send), invoice_ids))
+        deferred = len(self.pending_validation) - deferred_before
+        validation_errors = len(invoice_ids) - validated_count - deferred
+
+        logger.info("")
+        logger.info(f"✅ Factures validées: {validated_count}/{len(invoice_ids)}")
+        if validation_errors > 0:
+            logger.warning(f"⚠️  Échecs de validation: {validation_errors}")
+        if deferred > 0:
+            logger.warning(f"⏳ Validations reportées (échéance du run): {deferred}")
+        logger.info("")
+        return validated_count
+
+    def log_open_circuits(self):
+        """
+        Signale les familles d'endpoints Sellsy coupées pendant l'exécution
+
+        Les appels refusés ont échoué immédiatement au lieu d'attendre leur
+        timeout. Une facture non créée n'a pas touché ses compteurs : elle
+        est reprise au prochain run. Les factures restées en brouillon sont
+        dans le journal (événements 'validation' avec validated=false).
+        """
+        open_circuits = self.sellsy.breakers.open_circuits()
+        if not open_circuits:
+            return
+        logger.error(f"⛔ Sellsy dégradé, circuits ouverts: {', '.join(open_circuits)}")
+        logger.error("   Les factures non créées seront reprises au prochain run")
+        logger.info("")
+
+    def checkpoint_path(self) -> str:
+        return os.path.join(self.checkpoint_dir, f"checkpoint-{self.shard_index}-of-{self.shard_count}.json")
+
+    def write_checkpoint(self):
+        """
+        Écrit le point de reprise d'un run arrêté par son échéance
+
+        Les factures non créées n'ont pas touché leurs compteurs : elles
+        reviennent d'elles-mêmes dans le plan du run suivant. Seules les
+        factures créées mais restées en brouillon sont à mémoriser.
+        """
+        if not self.pending_validation:
+            return
+        path = self.checkpoint_path()
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'written_at': datetime.now().isoformat(timespec='seconds'),
+                'shard': f"{self.shard_index}/{self.shard_count}",
+                'pending_validation': sorted(set(self.pending_validation)),
+            }, f, indent=2)
+        logger.info(f"💾 Point de reprise écrit dans {path} ({len(set(self.pending_validation))} facture(s) à valider)")
+
+    def resume_checkpoint(self) -> int:
+        """
+        Valide les factures laissées en brouillon par un run arrêté
+
+        Chaque shard reprend son propre point de reprise ; le shard 0 reprend
+        aussi ceux d'un nombre de shards différent.
 
         Returns:
-            True si la facture a été créée avec succès, False sinon
+            Nombre de factures validées
         """
-        try:
-            logger.info(f"📋 Traitement groupé: Client {client_id} - Date {date_key}")
-            logger.info("=" * 70)
-            logger.info(f"  📦 {len(services)} service(s) à facturer ensemble")
-
-            # Préparation des lignes de facture
-            invoice_lines = []
-            services_to_update = []
-
-            for service in services:
-                record_id = service['id']
-                fields = service['fields']
-
-                # Extraction des données
-                service_name = fields.get('Nom du service', 'Service')
-                product_id = fields.get('ID Sellsy')
-                prix_ht = fields.get('Prix HT', 0)
-                date_debut = fields.get('Date de début')
-                mois_factures = fields.get('Mois facturés', 0)
-                occurrences_restantes = fields.get('Occurrences restantes', 0)
-
-                # Validation des données essentielles
-                if not product_id or not date_debut or not (prix_ht and prix_ht > 0):
-                    logger.warning(f"  ⚠️  Données incomplètes pour {service_name}, ignoré")
-                    continue
-
-                # Calcul des mois écoulés
-                date_debut_obj = datetime.strptime(date_debut, '%Y-%m-%d')
-                aujourd_hui = datetime.now()
-                mois_ecoules = (aujourd_hui.year - date_debut_obj.year) * 12 + \
-                              (aujourd_hui.month - date_debut_obj.month)
-
-                logger.info(f"  • {service_name}")
-                logger.info(f"    📅 Mois écoulés: {mois_ecoules}, Mois facturés: {mois_factures}")
-
-                # Vérifier si une facturation est due
-                if mois_ecoules < mois_factures:
-                    logger.info(f"    ⏭️  Pas de facturation due")
-                    continue
-
-                if mois_ecoules > mois_factures + 1:
-                    logger.warning(f"    ⚠️  RETARD : {mois_ecoules - mois_factures} mois non facturés")
-                    logger.warning(f"    ⚠️  Facturation uniquement du mois {mois_factures + 1}")
-
-                logger.info(f"    ✅ Facturation du mois {mois_factures + 1}")
-
-                # Calcul de la remise
-                appliquer_remise = fields.get('Appliquer remise dégressive', True)
-                remise_pct = 0
-                montant_remise = 0
-                libelle_remise = ""
-
-                if appliquer_remise:
-                    try:
-                        grille_id = fields.get('Grille de remise')
-                        if grille_id and len(grille_id) > 0:
-                            grille = self.airtable.get_discount_grid(grille_id[0])
-                            logger.info(f"    📊 Grille: '{grille.get('Nom de la grille', 'N/A')}'")
-                        else:
-                            grille = self.get_default_discount_grid()
-                            logger.info(f"    📊 Grille par défaut: '{grille.get('Nom de la grille', 'N/A')}'")
-
-                        # Récupération du pourcentage et du label pour l'année en cours
-                        remise_pct, libelle_remise = self.get_discount_info(mois_factures + 1, grille)
-                        montant_remise = round(prix_ht * (remise_pct / 100), 2)
-                    except Exception as e:
-                        logger.warning(f"    ⚠️  Impossible de récupérer la grille de remise: {str(e)}")
-
-                prix_final = round(prix_ht - montant_remise, 2)
-
-                if remise_pct > 0 and libelle_remise:
-                    logger.info(f"    💰 Prix HT: {prix_ht}€ | Remise: {remise_pct}% ({libelle_remise}) | Final: {prix_final}€")
-                else:
-                    logger.info(f"    💰 Prix HT: {prix_ht}€ | Pas de remise")
-
-                # Ajouter la ligne à la facture
-                invoice_lines.append({
-                    'product_id': int(product_id),
-                    'service_name': service_name,
-                    'prix_ht': prix_ht,
-                    'remise_pct': remise_pct,
-                    'libelle_remise': libelle_remise
-                })
-
-                # Mémoriser les mises à jour à faire
-                services_to_update.append({
-                    'record_id': record_id,
-                    'mois_factures': mois_factures + 1,
-                    'occurrences_restantes': max(0, occurrences_restantes - 1)
-                })
-
-            # Si aucune ligne valide, on arrête
-            if not invoice_lines:
-                logger.info(f"  ⏭️  Aucune ligne de facture valide pour ce groupe")
-                return False
-
-            # Mode dry-run : simulation uniquement
-            if self.dry_run:
-                logger.info(f"  🧪 MODE DRY-RUN: Facture non créée (test uniquement)")
-                logger.info(f"     - Client ID: {client_id}")
-                logger.info(f"     - Nombre de lignes: {len(invoice_lines)}")
-                return True
-
-            # Création de la facture groupée dans Sellsy
-            logger.info(f"  📤 Envoi de la facture groupée à Sellsy v2...")
-            result = self.sellsy.create_grouped_invoice(
-                client_id=int(client_id),
-                invoice_lines=invoice_lines
+        own = self.checkpoint_path()
+        paths = [
+            path for path in sorted(glob.glob(os.path.join(self.checkpoint_dir, 'checkpoint-*.json')))
+            if path == own or (self.shard_index == 0 and not path.endswith(f"-of-{self.shard_count}.json"))
+        ]
+        if not paths:
+            return 0
+
+        invoice_ids = set()
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                invoice_ids.update(json.load(f).get('pending_validation', []))
+        logger.info(f"♻️  Reprise: {len(invoice_ids)} facture(s) en brouillon laissée(s) par un run précédent")
+        validated = self.validate_invoices(sorted(invoice_ids))
+
+        # Les validations encore reportées sont réécrites par write_checkpoint()
+        for path in paths:
+            os.remove(path)
+        return validated
+
+    def stop_at_deadline(self, plan: InvoicePlan, summary: Dict, error_count: int) -> Dict:
+        """Arrêt avant création : toutes les factures du plan sont reportées"""
+        for invoice in plan.invoices:
+            self.journal.write(
+                'group', client_id=invoice.client_id, date=invoice.billing_month,
+                services=[line.record_id for line in invoice.lines], status='deferred'
             )
+        logger.warning(f"⏳ Échéance du run atteinte : {len(plan.invoices)} facture(s) reportée(s) au prochain run")
+        self.write_checkpoint()
+        summary['errors'] = error_count
+        self.journal.write('summary', **summary)
+        return summary
 
-            invoice_id = result.get('invoice_id')
-            logger.info(f"  ✅ Facture groupée créée dans Sellsy ! (ID: {invoice_id})")
-            logger.info(f"     Nombre de lignes: {len(invoice_lines)}")
-            logger.info(f"  ⏸️  Facture en attente de validation (draft)")
-
-            # Mise à jour des compteurs dans Airtable pour tous les services
-            for update_info in services_to_update:
-                self.airtable.update_service_counters(
-                    record_id=update_info['record_id'],
-                    mois_factures=update_info['mois_factures'],
-                    occurrences_restantes=update_info['occurrences_restantes']
-                )
-
-            logger.info(f"  ✅ Compteurs mis à jour dans Airtable ({len(services_to_update)} services)")
+    def bill(self, subscriptions: List[Subscription]) -> Dict:
+        """
+        Planifie et facture un lot d'abonnements déjà relus (mode service)
 
-            # Retourner l'ID de la facture créée
-            return invoice_id
+        Mêmes étapes que run() sans la lecture de la table : plan, contrôle
+        des produits, création, compteurs, validation.
 
-        except Exception as e:
-            logger.error(f"  ❌ Échec de la création de la facture groupée")
-            logger.error(f"  ❌ {str(e)}")
-            return False
+        Returns:
+            Résumé (services, groups, created, validated, errors)
+        """
+        # Mesures propres à chaque lot (le service tourne en continu)
+        self.perf = PerfRecorder()
+        plan = self.build_plan(subscriptions)
+        summary = {'services': plan.service_count, 'groups': len(plan.invoices),
+                   'created': 0, 'validated': 0, 'errors': 0}
+        self.log_plan(plan)
+        if self.dry_run or not plan.invoices:
+            return summary
+
+        plan, rejected = self.reject_invalid_products(plan)
+        created_invoice_ids, failed = self.execute_plan(plan)
+        summary.update(
+            created=len(created_invoice_ids),
+            validated=self.validate_invoices(created_invoice_ids),
+            errors=rejected + failed,
+        )
+        self.log_open_circuits()
+        return summary
 
-    def run(self):
-        """Point d'entrée principal : traite tous les abonnements éligibles"""
+    def run(self, refresh_mirror: bool = True) -> Dict:
+        """
+        Point d'entrée principal : traite tous les abonnements éligibles du shard
+        
+        Args:
+            refresh_mirror: Rafraîchit le miroir local avant lecture (désactivé
+                dans les processus de shard, le parent l'a déjà fait)
+        
+        Returns:
+            Résumé de l'exécution (aussi écrit en dernière ligne du journal)
+        """
+        summary = {'services': 0, 'groups': 0, 'created': 0, 'validated': 0, 'errors': 0}
+        self.perf = PerfRecorder()
+        self.pending_validation = []
+        with self.perf.activate(), (self.deadline.activate() if self.deadline else nullcontext()):
+            try:
+                return self._run(summary, refresh_mirror)
+            finally:
+                self.write_perf_report(summary)
+
+    def write_perf_report(self, summary: Dict):
+        """Écrit le rapport de performance et signale les budgets dépassés"""
+        self.perf_report = self.perf.report(
+            summary, self.budgets,
+            shard=f"{self.shard_index}/{self.shard_count}", dry_run=self.dry_run,
+            circuits=self.sellsy.breakers.snapshot(),
+        )
+        metrics = self.perf_report['metrics']
+        calls_per_invoice = metrics['api_calls_per_invoice']
+        logger.info(f"⏱️  Durée {metrics['total_seconds']:.1f}s | "
+                    f"{self.perf_report['api']['calls']} appel(s) API"
+                    f"{f' ({calls_per_invoice}/facture)' if calls_per_invoice is not None else ''} | "
+                    f"p50 {metrics['p50_ms']} ms, p95 {metrics['p95_ms']} ms")
+        for failure in self.perf_report['budget_failures']:
+            logger.error(f"❌ Budget de performance dépassé: {failure}")
+        if self.perf_report['budgets_skipped']:
+            logger.info(f"ℹ️  Budgets non vérifiés (trop peu de factures): "
+                        f"{', '.join(self.perf_report['budgets_skipped'])}")
+
+        if self.report_dir:
+            path = report_path(self.report_dir, self.shard_index, self.shard_count)
+            write_report(self.perf_report, path)
+            logger.info(f"⏱️  Rapport de performance écrit dans {path}")
+
+    def _run(self, summary: Dict, refresh_mirror: bool) -> Dict:
+        """Étapes de run(), chacune chronométrée ; summary est complété au fil de l'eau"""
         try:
             logger.info("=" * 70)
             logger.info("DÉMARRAGE DE LA SYNCHRONISATION DES FACTURES D'ABONNEMENT V2.0")
+            if self.shard_count > 1:
+                logger.info(f"🧩 Shard {self.shard_index}/{self.shard_count}")
             logger.info("=" * 70)
 
-            # Récupération des abonnements éligibles
-            services = self.airtable.get_eligible_subscriptions()
+            with self.perf.phase('fetch'):
+                # Rafraîchissement incrémental du miroir local (si activé)
+                if refresh_mirror and isinstance(self.airtable, AirtableMirror):
+                    changed = self.airtable.refresh()
+                    logger.info(f"🗄️  Miroir Airtable rafraîchi ({len(changed)} service(s) modifié(s))")
 
-            if not services:
-                logger.info("ℹ️  Aucun abonnement éligible à facturer aujourd'hui")
-                return
+                # Abonnements arrivés à échéance (index next_due du miroir), décodés en une passe
+                services = decode_subscriptions(self.airtable.get_due_subscriptions())
 
-            logger.info(f"📊 {len(services)} abonnement(s) éligible(s) trouvé(s)")
-            logger.info("")
+            # Factures laissées en brouillon par un run arrêté à son échéance
+            if not self.dry_run:
+                self.resume_checkpoint()
+
+            if not services:
+                logger.info("ℹ️  Aucun abonnement à échéance aujourd'hui")
+                self.journal.write('summary', **summary)
+                return summary
 
-            # Groupement des services par client et date
-            grouped_services = self.group_services_by_client_and_date(services)
-            logger.info(f"📦 {len(grouped_services)} facture(s) groupée(s) à créer")
+            logger.info(f"📊 {len(services)} abonnement(s) à échéance trouvé(s)")
             logger.info("")
 
-            # Traitement de chaque groupe
-            created_invoice_ids = []
             error_count = 0
 
-            for (client_id, date_key), service_group in grouped_services.items():
-                try:
-                    invoice_id = self.process_grouped_subscription(client_id, date_key, service_group)
-                    if invoice_id:
-                        created_invoice_ids.append(invoice_id)
-                    logger.info("")  # Ligne vide entre les groupes
+            with self.perf.phase('group'):
+                if self.from_plan:
+                    # Plan déjà calculé (et relu) : exécuté tel quel, sans recalcul des remises
+                    plan = load_plan(self.from_plan)
+                    if self.shard_count > 1:
+                        plan = plan.select(shard_filter(self.shard_index, self.shard_count))
+                    logger.info(f"🗒️  Plan du {plan.today.isoformat()} chargé depuis {self.from_plan}")
+                    summary['services'] = plan.service_count
+                    summary['groups'] = len(plan.invoices)
+                    plan, stale = self.reject_stale_invoices(plan, services)
+                    error_count += stale
+                else:
+                    # Planification : factures groupées par client et date, remises et compteurs
+                    plan = self.build_plan(services)
+                    self.write_artifacts(plan)
+                    summary['services'] = plan.service_count
+                    summary['groups'] = len(plan.invoices)
+
+            logger.info(f"📦 {len(plan.invoices)} facture(s) groupée(s) à créer")
+            logger.info("")
+            self.log_plan(plan)
 
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"❌ Erreur: {str(e)}")
-                    logger.info("")
+            # Mode dry-run : le plan n'est pas exécuté
+            if self.dry_run:
+                for invoice in plan.invoices:
+                    self.journal.write(
+                        'group', client_id=invoice.client_id, date=invoice.billing_month,
+                        services=[line.record_id for line in invoice.lines], status='planned'
+                    )
+                logger.info("🧪 Mode DRY-RUN: Aucune modification réelle effectuée")
+                summary['errors'] = error_count
+                self.journal.write('summary', **summary)
+                return summary
+
+            # Échéance déjà atteinte (lecture ou planification trop longues) : rien n'est lancé
+            if deadline_expired():
+                return self.stop_at_deadline(plan, summary, error_count)
+
+            with self.perf.phase('create'):
+                if plan.invoices:
+                    # Validation groupée des produits : les factures vouées à l'échec ne consomment pas d'appels API
+                    plan, rejected = self.reject_invalid_products(plan)
+                    error_count += rejected
+
+                # Exécution du plan
+                created_invoice_ids, failed = self.execute_plan(plan)
+            error_count += failed
+            logger.info("")
 
             # Validation de toutes les factures créées
-            if created_invoice_ids and not self.dry_run:
-                logger.info("=" * 70)
-                logger.info(f"🔄 VALIDATION DES FACTURES CRÉÉES ({len(created_invoice_ids)} facture(s))")
-                logger.info("=" * 70)
-
-                validated_count = 0
-                validation_errors = 0
-
-                for invoice_id in created_invoice_ids:
-                    try:
-                        logger.info(f"  🔄 Validation de la facture {invoice_id}...")
-                        self.sellsy.validate_invoice(invoice_id)
-                        logger.info(f"  ✅ Facture {invoice_id} validée (draft → due)")
-                        validated_count += 1
-
-                        # Envoi automatique de l'email après validation
-                        try:
-                            logger.info(f"  📧 Envoi de l'email pour la facture {invoice_id}...")
-                            self.sellsy.send_invoice_email(invoice_id)
-                            logger.info(f"  ✅ Email envoyé pour la facture {invoice_id}")
-                        except Exception as email_error:
-                            logger.warning(f"  ⚠️  Échec envoi email facture {invoice_id}: {str(email_error)}")
-                            logger.warning(f"  ⚠️  La facture a été validée mais l'email n'a pas été envoyé")
-
-                    except Exception as e:
-                        logger.error(f"  ❌ Échec validation facture {invoice_id}: {str(e)}")
-                        validation_errors += 1
-
-                logger.info("")
-                logger.info(f"✅ Factures validées: {validated_count}/{len(created_invoice_ids)}")
-                if validation_errors > 0:
-                    logger.warning(f"⚠️  Échecs de validation: {validation_errors}")
-                logger.info("")
+            validated_count = self.validate_invoices(created_invoice_ids)
+            self.log_open_circuits()
+            self.write_checkpoint()
 
             # Résumé
             logger.info("=" * 70)
             logger.info("RÉSUMÉ DE LA SYNCHRONISATION")
             logger.info("=" * 70)
             logger.info(f"✅ Factures créées: {len(created_invoice_ids)}")
-            if not self.dry_run and created_invoice_ids:
+            if created_invoice_ids:
                 logger.info(f"✅ Factures validées: {validated_count}/{len(created_invoice_ids)}")
             logger.info(f"❌ Échecs: {error_count}")
-            logger.info(f"📊 Total services traités: {len(services)}")
+            logger.info(f"📊 Total services traités: {summary['services']}")
 
-            if self.dry_run:
-                logger.info("🧪 Mode DRY-RUN: Aucune modification réelle effectuée")
+            summary.update(created=len(created_invoice_ids), validated=validated_count, errors=error_count)
+            self.journal.write('summary', **summary)
+            return summary
 
         except Exception as e:
             logger.error(f"❌ ERREUR CRITIQUE: {str(e)}")
             raise
 
 
-def main():
+def run_shard(dry_run: bool, shard: Tuple[int, int], journal_dir: Optional[str],
+              plan_dir: Optional[str] = None, from_plan: Optional[str] = None,
+              report_dir: Optional[str] = None, budgets: Optional[Dict[str, float]] = None,
+              profile: Optional[Tuple[str, str, float]] = None, deadline: Optional[float] = None) -> List[str]:
+    """
+    Exécute un shard dans un processus du pool (clients propres au processus)
+
+    Returns:
+        Budgets de performance dépassés par le shard
+    """
+    sync = SubscriptionInvoiceSync(dry_run=dry_run, shard=shard, journal_dir=journal_dir,
+                                   plan_dir=plan_dir, from_plan=from_plan,
+                                   report_dir=report_dir, budgets=budgets, deadline=deadline)
+    with profiled_run(profile, shard):
+        sync.run(refresh_mirror=False)
+    return sync.perf_report['budget_failures']
+
+
+@contextmanager
+def profiled_run(profile: Optional[Tuple[str, str, float]], shard: Tuple[int, int]):
+    """Profile le bloc si profile = (mode, dossier, intervalle) est fourni"""
+    mode, profile_dir, interval = profile or (None, '', DEFAULT_INTERVAL)
+    with profiled(mode, profile_dir, f"profile-{shard[0]}-of-{shard[1]}", interval) as written:
+        yield
+    for path in written:
+        logger.info(f"🔬 Profil écrit dans {path}")
+
+
+def run_sharded(dry_run: bool, workers: int, journal_dir: str,
+                plan_dir: Optional[str] = None, from_plan: Optional[str] = None,
+                report_dir: Optional[str] = None, budgets: Optional[Dict[str, float]] = None,
+                profile: Optional[Tuple[str, str, float]] = None, deadline: Optional[float] = None) -> Dict:
+    """
+    Répartit les clients sur un pool de processus, un shard par processus
+
+    Le miroir est rafraîchi une seule fois ici, avant le lancement des shards.
+    Le résumé global est fusionné depuis les journaux de chaque shard ; les
+    budgets de performance sont vérifiés (et le profilage fait) shard par shard.
+    """
+    # Miroir dédié : le client partagé du processus (get_airtable_client) reste ouvert
+    mirror = open_airtable_mirror()
+    if mirror is not None:
+        try:
+            mirror.refresh()
+        finally:
+            mirror.close()
+
+    # Les processus partagent le token OAuth2 via le cache disque (un seul appel OAuth)
+    os.environ.setdefault('SELLSY_TOKEN_CACHE', os.path.join(journal_dir, '.sellsy_token.json'))
+    os.makedirs(journal_dir, exist_ok=True)
+
+    # spawn : aucun client (sockets, connexion SQLite) hérité du processus parent
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [
+            executor.submit(run_shard, dry_run, (index, workers), journal_dir, plan_dir, from_plan,
+                            report_dir, budgets, profile, deadline)
+            for index in range(workers)
+        ]
+        budget_failures = []
+        for index, future in enumerate(futures):
+            try:
+                budget_failures += [f"shard {index}/{workers}: {failure}" for failure in future.result()]
+            except Exception as e:
+                logger.error(f"❌ Shard {index}/{workers} interrompu: {str(e)}")
+
+    merged = merge_journals(journal_dir)
+    merged['budget_failures'] = budget_failures
+    return merged
+
+
+def log_merged_summary(merged: Dict):
+    logger.info("=" * 70)
+    logger.info(f"RÉSUMÉ GLOBAL ({merged['shards']} shard(s))")
+    logger.info("=" * 70)
+    logger.info(f"✅ Factures créées: {merged['created']}")
+    logger.info(f"✅ Factures validées: {merged['validated']}")
+    logger.info(f"❌ Échecs: {merged['errors']}")
+    logger.info(f"📊 Total services traités: {merged['services']}")
+    for name in merged['incomplete_shards']:
+        logger.error(f"❌ Journal incomplet (shard interrompu): {name}")
+    for failure in merged.get('budget_failures', []):
+        logger.error(f"❌ Budget de performance dépassé ({failure})")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Synchronisation des factures d'abonnement")
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                        help="Ne traite que les clients du shard i sur N (jobs en matrice, défaut: 0/1)")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SYNC_WORKERS', '1')),
+                        help="Nombre de processus (un shard par processus)")
+    parser.add_argument('--journal-dir', default=os.getenv('SYNC_JOURNAL_DIR', 'sync_journals'),
+                        help="Dossier des journaux par shard")
+    parser.add_argument('--plan-dir', default=os.getenv('SYNC_PLAN_DIR', 'sync_plans'),
+                        help="Dossier des artefacts du plan (JSON, CSV, diff avec le plan précédent)")
+    parser.add_argument('--from-plan', metavar='PLAN.json',
+                        help="Exécute un plan écrit par un dry-run au lieu de le recalculer")
+    parser.add_argument('--report-dir', default=os.getenv('SYNC_REPORT_DIR', 'sync_reports'),
+                        help="Dossier du rapport de performance (perf-i-of-N.json)")
+    parser.add_argument('--perf-budgets', type=parse_budgets, default=os.getenv('PERF_BUDGETS', ''),
+                        metavar='METRIQUE=MAX,...',
+                        help="Budgets faisant échouer le job (ex: api_calls_per_invoice=4,p95_ms=2000)")
+    parser.add_argument('--profile', nargs='?', const='deterministic', choices=PROFILE_MODES,
+                        default=os.getenv('SYNC_PROFILE') or None,
+                        help="Profile l'exécution : deterministic (cProfile, défaut) ou sampling "
+                             "(échantillonnage de tous les threads, faible surcoût)")
+    parser.add_argument('--profile-dir', default=os.getenv('SYNC_PROFILE_DIR', 'sync_profiles'),
+                        help="Dossier des profils (profile-i-of-N.pstats / .collapsed)")
+    parser.add_argument('--profile-interval', type=float,
+                        default=float(os.getenv('SYNC_PROFILE_INTERVAL_MS', DEFAULT_INTERVAL * 1000)),
+                        metavar='MS', help="Intervalle d'échantillonnage en millisecondes")
+    parser.add_argument('--deadline', type=float, default=float(os.getenv('SYNC_DEADLINE_SECONDS', '0')),
+                        metavar='SECONDES',
+                        help="Budget de temps du run : au-delà, plus aucune facture n'est lancée et un point "
+                             "de reprise est écrit (à régler sous la limite du job CI ; 0 = illimité)")
+    parser.add_argument('--merge-journals', action='store_true',
+                        help="Fusionne les journaux existants sans rien synchroniser")
+    args = parser.parse_args(argv)
+
+    if args.shard is not None and args.workers > 1:
+        # --workers répartit déjà tous les clients : un shard imposé serait ignoré
+        parser.error("--shard ne peut pas être combiné avec --workers > 1 (ou SYNC_WORKERS > 1)")
+    if args.shard is None:
+        args.shard = (0, 1)
+    return args
+
+
+def main(argv=None):
     """Point d'entrée du script"""
+    args = parse_args(argv)
+    # L'échéance court dès le lancement (rafraîchissement du miroir compris)
+    deadline = time.time() + args.deadline if args.deadline > 0 else None
+
+    if args.merge_journals:
+        merged = merge_journals(args.journal_dir)
+        log_merged_summary(merged)
+        sys.exit(1 if merged['errors'] or merged['incomplete_shards'] else 0)
+
     # Lecture du mode dry-run depuis les variables d'environnement
     dry_run_env = os.getenv('DRY_RUN', 'false').lower()
     dry_run = dry_run_env in ['true', '1', 'yes']
+    profile = (args.profile, args.profile_dir, args.profile_interval / 1000) if args.profile else None
     
     logger.info(f"🎯 Démarrage de la synchronisation...")
     logger.info(f"📅 Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -559,8 +839,24 @@ def main():
     logger.info("")
     
     try:
-        sync = SubscriptionInvoiceSync(dry_run=dry_run)
-        sync.run()
+        if args.workers > 1:
+            merged = run_sharded(dry_run, args.workers, args.journal_dir, args.plan_dir, args.from_plan,
+                                 args.report_dir, args.perf_budgets, profile, deadline)
+            log_merged_summary(merged)
+            if merged['incomplete_shards']:
+                raise Exception(f"{len(merged['incomplete_shards'])} shard(s) interrompu(s)")
+            budget_failures = merged['budget_failures']
+        else:
+            sync = SubscriptionInvoiceSync(dry_run=dry_run, shard=args.shard, journal_dir=args.journal_dir,
+                                           plan_dir=args.plan_dir, from_plan=args.from_plan,
+                                           report_dir=args.report_dir, budgets=args.perf_budgets,
+                                           deadline=deadline)
+            with profiled_run(profile, args.shard):
+                sync.run()
+            budget_failures = sync.perf_report['budget_failures']
+
+        if budget_failures:
+            raise Exception(f"{len(budget_failures)} budget(s) de performance dépassé(s)")
         
         logger.info("")
         logger.info("🎉 Synchronisation terminée avec succès !")
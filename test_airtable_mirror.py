@@ -0,0 +1,39 @@
+"""
+Tests du miroir SQLite : lecture locale et relecture d'un service modifié
+"""
+
+from src.airtable_mirror import AirtableMirror
+
+
+class FakeAirtable:
+    table_services = 'service_sellsy'
+    table_grilles = 'grilles_remise'
+
+    def __init__(self, records):
+        self.records = {record['id']: record for record in records}
+
+    def iter_records(self, table, params=None):
+        return iter(list(self.records.values()) if table == self.table_services else [])
+
+    def get_service(self, record_id):
+        return self.records[record_id]
+
+
+def service(mois_factures):
+    return {'id': 'rec1', 'fields': {
+        'Catégorie': 'Abonnement', 'ID_Sellsy_abonné': '42', 'Date de début': '2025-01-15',
+        'Mois facturés': mois_factures, 'Occurrences restantes': 12 - mois_factures,
+    }}
+
+
+def test_fetch_service_refreshes_stale_row():
+    airtable = FakeAirtable([service(3)])
+    mirror = AirtableMirror(airtable, db_path=':memory:')
+    mirror.refresh(full=True)
+
+    airtable.records['rec1'] = service(4)
+    assert mirror.get_service('rec1')['fields']['Mois facturés'] == 3
+
+    assert mirror.fetch_service('rec1')['fields']['Mois facturés'] == 4
+    assert mirror.get_service('rec1')['fields']['Mois facturés'] == 4
+    assert mirror.get_eligible_subscriptions()[0]['fields']['Occurrences restantes'] == 8
@@ -0,0 +1,84 @@
+"""
+Tests des disjoncteurs par famille d'endpoints (horloge simulée)
+"""
+
+import pytest
+
+from src.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerRegistry, CircuitOpenError, is_failure_status,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def breaker(clock, threshold=3, reset=30):
+    return CircuitBreaker('POST /invoices', failure_threshold=threshold, reset_timeout=reset, clock=clock)
+
+
+def test_failure_statuses():
+    assert is_failure_status(500) and is_failure_status(503) and is_failure_status(429)
+    assert not is_failure_status(404) and not is_failure_status(400) and not is_failure_status(200)
+
+
+def test_opens_after_consecutive_failures_only():
+    circuit = breaker(Clock())
+    circuit.record_failure()
+    circuit.record_failure()
+    circuit.record_success()
+    circuit.record_failure()
+    circuit.record_failure()
+    assert circuit.state == CLOSED
+
+    circuit.record_failure()
+    assert circuit.state == OPEN
+    with pytest.raises(CircuitOpenError) as error:
+        circuit.before_call()
+    assert error.value.retry_in == 30
+    assert circuit.snapshot() == {'state': OPEN, 'failures': 3, 'rejected': 1}
+
+
+def test_half_open_allows_a_single_probe():
+    clock = Clock()
+    circuit = breaker(clock, threshold=1)
+    circuit.record_failure()
+    clock.now = 30
+    assert circuit.state == HALF_OPEN
+
+    circuit.before_call()
+    with pytest.raises(CircuitOpenError):
+        circuit.before_call()
+
+    circuit.record_success()
+    assert circuit.state == CLOSED
+    circuit.before_call()
+
+
+def test_failed_probe_reopens_for_a_new_delay():
+    clock = Clock()
+    circuit = breaker(clock, threshold=1)
+    circuit.record_failure()
+    clock.now = 31
+    circuit.before_call()
+    circuit.record_failure()
+
+    assert circuit.state == OPEN
+    clock.now = 60
+    assert circuit.state == OPEN
+    clock.now = 61
+    assert circuit.state == HALF_OPEN
+
+
+def test_registry():
+    registry = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=30)
+    assert registry.get('GET /taxes') is registry.get('GET /taxes')
+    assert registry.find('GET /items') is None
+
+    registry.get('POST /invoices').record_failure()
+    assert registry.open_circuits() == ['POST /invoices']
+    assert registry.snapshot()['GET /taxes']['state'] == CLOSED
@@ -0,0 +1,25 @@
+"""
+Tests de la ligne de commande sunlib : arguments transmis au script de synchronisation
+"""
+
+from sunlib import cli
+
+
+def sync_argv(monkeypatch, *args):
+    calls = []
+    monkeypatch.setattr(cli, '_call', lambda module, function, argv: calls.append(argv))
+    parsed = cli._build_parser().parse_args(['sync', *args])
+    parsed.handler(parsed)
+    return calls[0]
+
+
+def test_workers_not_forwarded_by_default(monkeypatch):
+    # SYNC_WORKERS reste lu par le script
+    assert sync_argv(monkeypatch) == []
+
+
+def test_explicit_options_forwarded(monkeypatch):
+    assert sync_argv(monkeypatch, '--shard', '1/2', '--deadline', '600') == [
+        '--shard', '1/2', '--deadline', '600.0',
+    ]
+    assert sync_argv(monkeypatch, '--workers', '4') == ['--workers', '4']
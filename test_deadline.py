@@ -0,0 +1,53 @@
+"""
+Tests de l'échéance du run et des timeouts adaptatifs
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.deadline import (
+    MIN_TIMEOUT, AdaptiveTimeouts, Deadline, cap_timeout, current_deadline, deadline_expired, propagate,
+)
+
+
+def test_no_deadline():
+    assert not deadline_expired()
+    assert cap_timeout(20) == 20
+
+
+def test_cap_timeout_keeps_a_floor():
+    with Deadline.after(60).activate():
+        assert cap_timeout(20) == 20
+        assert 50 < cap_timeout(120) <= 60
+    with Deadline(time.time() - 1).activate():
+        assert deadline_expired()
+        assert cap_timeout(20) == MIN_TIMEOUT
+    assert current_deadline.get() is None
+
+
+def test_propagate_to_pool_threads():
+    deadline = Deadline.after(60)
+    with deadline.activate(), ThreadPoolExecutor(max_workers=2) as executor:
+        bare = list(executor.map(lambda _: current_deadline.get(), range(2)))
+        wrapped = list(executor.map(propagate(lambda _: current_deadline.get()), range(4)))
+    assert bare == [None, None]
+    assert wrapped == [deadline] * 4
+
+
+def test_adaptive_timeouts():
+    timeouts = AdaptiveTimeouts(default=30, factor=4, window=50, min_samples=5)
+    assert timeouts.timeout_for('GET /taxes') == 30
+
+    for latency in (0.2, 0.3, 0.25, 0.4, 2.0):
+        timeouts.observe('GET /taxes', latency)
+    # p99 = 2,0 s × 4
+    assert timeouts.timeout_for('GET /taxes') == 8.0
+
+    for _ in range(50):
+        timeouts.observe('GET /taxes', 0.1)
+    # Fenêtre glissante, plancher MIN_TIMEOUT
+    assert timeouts.timeout_for('GET /taxes') == MIN_TIMEOUT
+
+    for _ in range(5):
+        timeouts.observe('POST /invoices', 60)
+    assert timeouts.timeout_for('POST /invoices') == 30
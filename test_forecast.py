@@ -0,0 +1,79 @@
+"""
+Tests de la prévision des revenus (tables mémoïsées et tableaux de différences)
+"""
+
+from datetime import date
+
+from src.forecast import RevenueForecast
+
+GRID = {'Année 1 (%)': 50, 'Label Année 1': 'Lancement', 'Année 2 (%)': 10, 'Label Année 2': 'Fidélité'}
+
+
+def service(client_id='1', prix=100, mois_factures=10, restantes=6, **extra):
+    fields = {'ID_Sellsy_abonné': client_id, 'Date de début': '2025-01-01', 'Prix HT': prix,
+              'Mois facturés': mois_factures, 'Occurrences restantes': restantes,
+              'Grille de remise': ['recGrid'], 'ID Sellsy': 42}
+    fields.update(extra)
+    return {'id': f'rec{client_id}', 'fields': fields}
+
+
+def forecast():
+    return RevenueForecast({'recGrid': GRID})
+
+
+def test_projection_follows_the_grid_year_by_year():
+    result = forecast().project([service()], start=date(2025, 11, 1))
+    assert result['months'] == ['2025-11', '2025-12', '2026-01', '2026-02', '2026-03', '2026-04']
+    assert result['total']['ht'] == [50.0, 50.0, 90.0, 90.0, 90.0, 90.0]
+    assert result['total']['ttc'] == [60.0, 60.0, 108.0, 108.0, 108.0, 108.0]
+    assert result['clients']['1']['total_ht'] == 460.0
+
+
+def test_late_months_billed_on_the_first_projected_month():
+    result = forecast().project([service()], start=date(2026, 1, 1))
+    assert result['total']['ht'] == [190.0, 90.0, 90.0, 90.0]
+    assert result['total']['total_ht'] == 460.0
+
+
+def test_horizon_clients_and_ignored_services():
+    services = [
+        service('1'),
+        service('2', prix='12,50', mois_factures=0, restantes=3, **{'Appliquer remise dégressive': False}),
+        service('3', restantes=0),
+        service('4', prix='abc'),
+    ]
+    result = forecast().project(services, start=date(2025, 1, 1), horizon=3)
+    assert sorted(result['clients']) == ['1', '2']
+    assert [skip['record_id'] for skip in result['skipped']] == ['rec4']
+    assert result['clients']['2']['ht'] == [12.5, 12.5, 12.5]
+    assert result['clients']['1']['ht'] == [0.0, 0.0, 0.0]
+    assert len(result['months']) == 3
+
+
+def test_amount_segments_compress_constant_runs():
+    segments = forecast().amount_segments('recGrid', 100, 20, 30)
+    assert segments == ((1, 12, 5000, 6000), (13, 24, 9000, 10800), (25, 30, 10000, 12000))
+
+
+def test_invalid_records_are_reported_not_fatal():
+    services = [
+        service('1'),
+        service('2', **{'Date de début': '01/02/2025'}),
+        service('3', mois_factures='abc'),
+        service('4', restantes=2.5),
+        service('5', **{'Taux TVA': 'vingt'}),
+    ]
+    result = forecast().project(services, start=date(2025, 11, 1))
+    assert list(result['clients']) == ['1']
+    assert result['total']['total_ht'] == 460.0
+    reasons = {skip['record_id']: skip['reason'] for skip in result['skipped']}
+    assert sorted(reasons) == ['rec2', 'rec3', 'rec4', 'rec5']
+    assert 'Date de début invalide: 01/02/2025' in reasons['rec2']
+    assert 'Mois facturés invalide: abc' in reasons['rec3']
+    assert 'Occurrences restantes invalide: 2.5' in reasons['rec4']
+    assert 'Taux TVA invalide: vingt' in reasons['rec5']
+
+
+def test_string_counters_are_decoded():
+    result = forecast().project([service(mois_factures='10', restantes='6')], start=date(2025, 11, 1))
+    assert result['total']['ht'] == [50.0, 50.0, 90.0, 90.0, 90.0, 90.0]
@@ -0,0 +1,94 @@
+"""
+Tests de la file d'envoi de factures (client Sellsy simulé)
+"""
+
+import time
+
+from src.deadline import Deadline
+from src.invoice_batch import InvoiceSubmitQueue
+
+
+class FakeResolver:
+    def __init__(self):
+        self.lookups = []
+
+    def resolve_many(self, client_ids):
+        self.lookups.append(sorted(client_ids))
+
+
+class FakeSellsy:
+    def __init__(self, fail_clients=()):
+        self.payment_methods = FakeResolver()
+        self.prefetched = []
+        self.fail_clients = set(fail_clients)
+        self.next_id = 1000
+
+    def get_tva_20_id(self):
+        return 20
+
+    def prefetch_clients(self, client_ids):
+        self.prefetched.append(sorted(client_ids))
+        raise RuntimeError("recherche indisponible")
+
+    def build_grouped_invoice(self, client_id, lines, payment_method_id, tva_id=None):
+        return {'client': client_id, 'rows': lines, 'tax': tva_id}, None
+
+    def submit_invoice(self, payload):
+        if payload['client'] in self.fail_clients:
+            raise RuntimeError("Erreur API Sellsy v2: 500")
+        self.next_id += 1
+        return self.next_id
+
+
+def fill(queue):
+    for client_id in (1, 2, 3):
+        queue.add(client_id, [{'product_id': 1}], key=f"c{client_id}")
+
+
+def test_submit_reports_created_and_failed():
+    sellsy = FakeSellsy(fail_clients={2})
+    queue = InvoiceSubmitQueue(sellsy, max_workers=2)
+    fill(queue)
+    seen = []
+    report = queue.submit(on_result=lambda job, result: seen.append(job.key))
+
+    assert [result.key for result in report.results] == ['c1', 'c2', 'c3']
+    assert sorted(result.key for result in report.created) == ['c1', 'c3']
+    assert [result.key for result in report.failed] == ['c2']
+    assert sorted(seen) == ['c1', 'c2', 'c3']
+    assert len(queue) == 0
+
+
+def test_prefetch_failure_falls_back_to_unit_lookups(caplog):
+    sellsy = FakeSellsy()
+    queue = InvoiceSubmitQueue(sellsy)
+    fill(queue)
+    report = queue.submit()
+
+    assert sellsy.prefetched == [[1, 2, 3]]
+    assert sellsy.payment_methods.lookups == [[1, 2, 3]]
+    assert len(report.created) == 3
+    assert "Préchargement des clients impossible" in caplog.text
+
+
+def test_already_resolved_clients_are_not_searched_again():
+    sellsy = FakeSellsy()
+    queue = InvoiceSubmitQueue(sellsy, resolve_clients=False)
+    fill(queue)
+    report = queue.submit()
+
+    assert sellsy.prefetched == []
+    assert sellsy.payment_methods.lookups == []
+    assert len(report.created) == 3
+
+
+def test_expired_deadline_defers_every_invoice():
+    sellsy = FakeSellsy()
+    queue = InvoiceSubmitQueue(sellsy, resolve_clients=False)
+    fill(queue)
+    with Deadline(time.time() - 1).activate():
+        report = queue.submit()
+
+    assert report.created == [] and report.failed == []
+    assert len(report.deferred) == 3
+    assert report.to_dict()['deferred'] == 3
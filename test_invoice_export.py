@@ -0,0 +1,85 @@
+"""
+Tests de l'export des factures : reprise après interruption
+"""
+
+import gzip
+import json
+import os
+
+import pytest
+
+from src.invoice_export import InvoiceExporter
+
+INVOICES = [{"id": i} for i in range(1, 8)]
+
+
+class FakeClient:
+    """Pages de 3 factures, détail = {"id", "detail": True}"""
+
+    def __init__(self):
+        self.offsets = []
+
+    def iter_pages(self, method, endpoint, data=None, params=None, page_size=100, start_offset=0):
+        self.offsets.append(start_offset)
+        for start in range(start_offset, len(INVOICES), page_size):
+            yield INVOICES[start:start + page_size]
+
+    def get_invoice(self, invoice_id):
+        return {"id": invoice_id, "detail": True}
+
+
+def read_ids(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+def test_resume_after_crash_before_state_save(tmp_path, monkeypatch):
+    output = str(tmp_path / "invoices.ndjson.gz")
+    client = FakeClient()
+    exporter = InvoiceExporter(client, output, max_workers=2, page_size=3)
+
+    # Arrêt brutal après l'écriture de la 2e page, avant l'enregistrement de l'offset
+    save_state = exporter._save_state
+    saves = []
+
+    def crashing_save(state):
+        saves.append(state["offset"])
+        if len(saves) == 2:
+            raise KeyboardInterrupt
+        save_state(state)
+
+    monkeypatch.setattr(exporter, "_save_state", crashing_save)
+    with pytest.raises(KeyboardInterrupt):
+        exporter.export("2025-01-01", "2025-12-31")
+    assert not os.path.exists(output)
+
+    # Écriture de page interrompue : fichier temporaire tronqué
+    with open(os.path.join(exporter.parts_dir, "0000000006.ndjson.gz.tmp"), "wb") as f:
+        f.write(b"\x1f\x8b")
+
+    resumed = InvoiceExporter(client, output, max_workers=2, page_size=3)
+    state = resumed.export("2025-01-01", "2025-12-31")
+
+    assert client.offsets == [0, 3]
+    assert state["completed"] and state["exported"] == 7
+    assert read_ids(output) == [1, 2, 3, 4, 5, 6, 7]
+    assert not os.path.exists(resumed.parts_dir)
+
+
+def test_completed_export_is_not_repeated(tmp_path):
+    output = str(tmp_path / "invoices.ndjson.gz")
+    client = FakeClient()
+    InvoiceExporter(client, output, page_size=3).export("2025-01-01", "2025-12-31")
+    InvoiceExporter(client, output, page_size=3).export("2025-01-01", "2025-12-31")
+    assert client.offsets == [0]
+    assert read_ids(output) == [1, 2, 3, 4, 5, 6, 7]
+
+
+def test_new_period_restarts_from_scratch(tmp_path):
+    output = str(tmp_path / "invoices.ndjson.gz")
+    client = FakeClient()
+    InvoiceExporter(client, output, page_size=3).export("2025-01-01", "2025-12-31")
+    state = InvoiceExporter(client, output, page_size=3).export("2026-01-01", "2026-12-31")
+    assert client.offsets == [0, 0]
+    assert state["exported"] == 7
+    assert read_ids(output) == [1, 2, 3, 4, 5, 6, 7]
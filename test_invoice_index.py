@@ -0,0 +1,86 @@
+"""
+Tests de l'index local des factures et de sa recherche
+"""
+
+import search_invoice
+from src.invoice_index import InvoiceIndex
+
+
+def invoice(invoice_id, number, subject="", client_name="", date="2025-01-01"):
+    return {
+        "id": invoice_id,
+        "number": number,
+        "date": date,
+        "subject": subject,
+        "related": [{"type": "company", "id": 900 + invoice_id, "name": client_name}],
+    }
+
+
+def build(tmp_path):
+    index = InvoiceIndex(str(tmp_path / "index.json"))
+    index.add_invoices([
+        invoice(1, "FA00123", "Abonnement solaire", "Énergies Durand", "2025-01-01"),
+        invoice(2, "FA00456", "Maintenance", "Boulangerie Martin", "2025-02-01"),
+        invoice(3, "FA10123", "Abonnement éolien", "Martinez SARL", "2025-03-01"),
+    ])
+    return index
+
+
+def ids(documents):
+    return [document["id"] for document in documents]
+
+
+def test_substring_matches_inside_tokens(tmp_path):
+    index = build(tmp_path)
+    assert ids(index.search("00123")) == ["1"]
+    assert ids(index.search("0123")) == ["3", "1"]
+    assert ids(index.search("artin")) == ["3", "2"]
+    assert ids(index.search("durand")) == ["1"]
+
+
+def test_short_terms_accents_and_all_words_required(tmp_path):
+    index = build(tmp_path)
+    assert ids(index.search("ol")) == ["3", "1"]
+    assert ids(index.search("energies")) == ["1"]
+    assert ids(index.search("abonnement eolien")) == ["3"]
+    assert index.search("abonnement boulangerie") == []
+    assert ids(index.search(None, limit=2)) == ["3", "2"]
+
+
+def test_replaced_invoice_drops_old_tokens(tmp_path):
+    index = build(tmp_path)
+    index.add_invoices([invoice(1, "FA99999", "Abonnement solaire", "Énergies Durand")])
+    assert index.search("00123") == []
+    assert ids(index.search("999")) == ["1"]
+
+
+def test_refresh_is_incremental_and_persisted(tmp_path):
+    class Client:
+        def __init__(self):
+            self.filters = []
+
+        def search_invoices(self, filters):
+            self.filters.append(filters)
+            return [invoice(4, "FA00777", "Régularisation", "Dupont")]
+
+    client = Client()
+    index = build(tmp_path)
+    assert index.refresh(client) == 1
+    assert client.filters == [{}]
+
+    reloaded = InvoiceIndex(index.path)
+    assert ids(reloaded.search("777")) == ["4"]
+    reloaded.refresh(client)
+    assert "updated" in client.filters[1]
+
+
+def test_search_uses_stale_index_when_refresh_fails(tmp_path, monkeypatch):
+    index = build(tmp_path)
+    index.save()
+    monkeypatch.setenv("SELLSY_INVOICE_INDEX_PATH", index.path)
+
+    class DownClient:
+        def search_invoices(self, filters):
+            raise ConnectionError("Sellsy injoignable")
+
+    assert ids(search_invoice.search_invoices(DownClient(), "00123")) == ["1"]
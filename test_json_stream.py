@@ -0,0 +1,62 @@
+"""
+Tests du décodage incrémental des listes JSON
+"""
+
+import json
+
+import pytest
+
+from src.json_stream import JsonListStream
+
+BODY = {
+    'records': [{'id': f'rec{i}', 'fields': {'Nom': 'Hébergement €', 'Prix': 12.5 + i}} for i in range(5)],
+    'offset': 'itr123/rec4',
+}
+
+
+def chunked(data: bytes, size: int):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 64, 100000])
+def test_items_and_extra_whatever_the_chunk_size(size):
+    # Blocs d'un octet : caractères UTF-8 multi-octets et nombres coupés
+    stream = JsonListStream(chunked(json.dumps(BODY, ensure_ascii=False).encode('utf-8'), size), 'records')
+    assert list(stream) == BODY['records']
+    assert stream.extra == {'offset': 'itr123/rec4'}
+    assert stream.count == 5
+
+
+def test_extra_keys_before_the_list_and_empty_list():
+    body = b'{"pagination": {"offset": 0, "total": 0}, "data": [] }'
+    stream = JsonListStream([body], 'data')
+    assert list(stream) == []
+    assert stream.extra == {'pagination': {'offset': 0, 'total': 0}}
+
+
+def test_items_are_yielded_before_the_body_ends():
+    def chunks():
+        yield b'{"data": [1, 2,'
+        raise AssertionError('lecture au-delà du nécessaire')
+
+    assert next(iter(JsonListStream(chunks(), 'data'))) == 1
+
+
+def test_truncated_body_raises():
+    with pytest.raises(json.JSONDecodeError):
+        list(JsonListStream([b'{"data": [1, 2'], 'data'))
+
+
+def test_response_is_closed():
+    class Response:
+        closed = False
+
+        def iter_content(self, chunk_size):
+            return iter([b'{"data": [1]}'])
+
+        def close(self):
+            self.closed = True
+
+    response = Response()
+    assert list(JsonListStream.from_response(response, 'data')) == [1]
+    assert response.closed
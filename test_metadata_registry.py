@@ -0,0 +1,84 @@
+"""
+Tests du registre des métadonnées Sellsy : caches mémoire et disque
+"""
+
+import json
+import time
+
+import pytest
+
+from src.metadata_registry import MetadataRegistry
+
+SECTIONS = {
+    "/taxes": [{"id": 1, "rate": "20.00", "is_active": True}, {"id": 2, "rate": "5.5", "is_active": False},
+               {"id": 3, "rate": "5.50", "is_active": True}],
+    "/payments/methods": [{"id": 9, "label": "Prélèvement GoCardless"}],
+    "/currencies": [{"code": "eur", "symbol": "€"}],
+}
+
+
+class FakeClient:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+
+    def iter_pages(self, method, endpoint, data=None, params=None, page_size=100, start_offset=0):
+        self.calls.append(endpoint)
+        if endpoint in self.failing:
+            raise ConnectionError(endpoint)
+        yield SECTIONS[endpoint]
+
+
+def test_memory_cache_hit_after_first_load():
+    client = FakeClient()
+    registry = MetadataRegistry(client)
+
+    assert registry.get_tax_id(20) == 1
+    assert registry.get_tax_id(5.5) == 3
+    assert registry.find_payment_method_id("gocardless") == 9
+    assert registry.get_currency("EUR")["symbol"] == "€"
+    assert client.calls == ["/taxes", "/payments/methods", "/currencies"]
+
+    with pytest.raises(Exception, match="TVA 10% non trouvée"):
+        registry.get_tax_id(10)
+    assert len(client.calls) == 3
+
+
+def test_disk_cache_shared_between_instances_until_expiry(tmp_path):
+    cache_path = str(tmp_path / "metadata.json")
+    MetadataRegistry(FakeClient(), cache_path=cache_path).load()
+
+    # Nouveau processus : cache disque frais, aucun appel
+    client = FakeClient()
+    assert MetadataRegistry(client, cache_path=cache_path).get_tax_id(20) == 1
+    assert client.calls == []
+
+    # Cache périmé : rechargé depuis l'API
+    with open(cache_path, encoding="utf-8") as f:
+        cached = json.load(f)
+    cached["loaded_at"] = time.time() - 2 * 3600
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(cached, f)
+    client = FakeClient()
+    MetadataRegistry(client, cache_path=cache_path, ttl_hours=1).load()
+    assert client.calls == ["/taxes", "/payments/methods", "/currencies"]
+
+
+def test_force_reload_and_corrupt_cache(tmp_path):
+    cache_path = tmp_path / "metadata.json"
+    cache_path.write_text("{pas du json")
+    client = FakeClient()
+    registry = MetadataRegistry(client, cache_path=str(cache_path))
+
+    registry.load()
+    registry.load(force=True)
+    assert client.calls.count("/taxes") == 2
+
+
+def test_optional_sections_may_fail_but_taxes_may_not():
+    registry = MetadataRegistry(FakeClient(failing={"/currencies"}))
+    assert registry.load()["currencies"] == []
+    assert registry.get_currency("EUR") is None
+
+    with pytest.raises(ConnectionError):
+        MetadataRegistry(FakeClient(failing={"/taxes"})).load()
@@ -0,0 +1,58 @@
+"""
+Tests des calculs monétaires (Decimal, arrondi au centime comme Sellsy)
+"""
+
+from decimal import Decimal
+
+import pytest
+
+from src.money import apply_discount, format_amount, price_lines, quantize, to_cents, to_decimal
+
+
+def test_to_decimal_accepts_airtable_formats():
+    assert to_decimal('57,92') == Decimal('57.92')
+    assert to_decimal('1 234,50 €') == Decimal('1234.50')
+    assert to_decimal(57.92) == Decimal('57.92')
+    assert to_decimal(None) == Decimal('0')
+    for invalid in ('abc', True, 'NaN'):
+        with pytest.raises(ValueError):
+            to_decimal(invalid)
+
+
+def test_half_cent_rounds_up():
+    assert format_amount('0.125') == '0.13'
+    assert format_amount(10) == '10.00'
+    assert to_cents('19.995') == 2000
+
+
+def test_apply_discount():
+    assert apply_discount('99', 30) == (Decimal('29.70'), Decimal('69.30'))
+    assert apply_discount('29.90', 100) == (Decimal('29.90'), Decimal('0.00'))
+    assert apply_discount('33.33', '12.5') == (Decimal('4.17'), Decimal('29.16'))
+
+
+def test_totals_are_sums_of_rounded_lines():
+    # Lignes de l'exemple de facture du README
+    priced = price_lines([('29.90', 100), ('12.00', 0), ('99.00', 30), ('15.00', 25)])
+    assert [line.prix_final for line in priced.lines] == [
+        Decimal('0.00'), Decimal('12.00'), Decimal('69.30'), Decimal('11.25'),
+    ]
+    assert priced.total_ht == Decimal('92.55')
+    assert priced.total_remise == Decimal('63.35')
+    assert priced.total_ht + priced.total_remise == Decimal('155.90')
+
+
+def test_rounding_per_line_not_on_total():
+    priced = price_lines([('0.05', 50)] * 3)
+    # 3 × 0,025 € de remise : chaque ligne arrondie à 0,03 €
+    assert priced.total_remise == Decimal('0.09')
+    assert priced.total_ht == Decimal('0.06')
+
+
+def test_equal_decimals_keep_their_own_sign_and_exponent():
+    # Decimal('0') == Decimal('-0') == Decimal('0.00') : aucun cache ne doit les confondre
+    for value in (Decimal('0'), Decimal('-0'), Decimal('0.000'), Decimal('-0')):
+        assert quantize(value).as_tuple() == value.quantize(Decimal('0.01')).as_tuple()
+    assert str(apply_discount(Decimal('-0'), 0)[0]) == '-0.00'
+    assert str(apply_discount(Decimal('0'), 0)[0]) == '0.00'
+    assert str(apply_discount(Decimal('-0'), 0)[0]) == '-0.00'
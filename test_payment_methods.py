@@ -0,0 +1,67 @@
+"""
+Tests de la résolution du moyen de paiement : le mandat n'est jamais deviné
+"""
+
+from src.payment_methods import PaymentMethodResolver, has_active_mandate
+
+GOCARDLESS_ID = 77
+
+
+class FakeSellsy:
+    def __init__(self, info, methods):
+        self.info = info
+        self.methods = methods
+        self.method_calls = 0
+
+    def get_client_info(self, client_id):
+        return {'_entity_type': 'company', **self.info}
+
+    def get_client_payment_methods(self, client_id, entity_type):
+        self.method_calls += 1
+        return self.methods
+
+    def get_gocardless_payment_id(self):
+        return GOCARDLESS_ID
+
+
+def resolve(info=None, methods=None):
+    return PaymentMethodResolver(FakeSellsy(info or {}, methods)).get(1)
+
+
+def test_active_mandate_on_payment_method():
+    assert resolve(methods=[{'mandate': {'id': 'MD1', 'status': 'active'}}]) == GOCARDLESS_ID
+    assert resolve(methods=[{'mandate_status': 'Submitted'}]) == GOCARDLESS_ID
+
+
+def test_active_mandate_on_client_record():
+    assert resolve(info={'gocardless_mandate_status': 'active'}, methods=[]) == GOCARDLESS_ID
+    # Endpoint absent (404) : repli sur la fiche client
+    assert resolve(info={'mandate_status': 'pending_submission'}, methods=None) == GOCARDLESS_ID
+
+
+def test_cancelled_mandate():
+    assert resolve(methods=[{'mandate': {'status': 'cancelled'}}]) is None
+    assert resolve(info={'mandate_status': 'cancelled'}, methods=[]) is None
+
+
+def test_no_mandate_or_ambiguous_mentions():
+    assert resolve(info={'note': 'pas de mandat GoCardless'}, methods=[]) is None
+    assert resolve(info={'mandate_reference': 'MD123'}, methods=[]) is None
+    assert resolve(methods=[{'name': 'GoCardless', 'mandate': {'status': 'unknown'}}]) is None
+
+
+def test_payment_method_status_wins_over_client_record():
+    assert resolve(info={'mandate_status': 'active'}, methods=[{'mandate_status': 'expired'}]) is None
+
+
+def test_missing_endpoint_is_not_retried():
+    sellsy = FakeSellsy({}, None)
+    resolver = PaymentMethodResolver(sellsy)
+    assert [resolver.get(client_id) for client_id in (1, 2, 3)] == [None, None, None]
+    assert sellsy.method_calls == 1
+
+
+def test_has_active_mandate():
+    assert has_active_mandate([{'mandate_status': 'failed'}, {'mandate_status': 'active'}]) is True
+    assert has_active_mandate([{'mandate_status': 'failed'}]) is False
+    assert has_active_mandate([{}, 'texte']) is None
@@ -0,0 +1,70 @@
+"""
+Tests du rapport de performance : métriques et verdict des budgets
+"""
+
+import pytest
+
+from src.perf_report import PerfRecorder, endpoint_family, parse_budgets, percentile
+
+BUDGETS = {'api_calls_per_invoice': 8, 'p95_ms': 3000}
+
+# Appels fixes d'un run, indépendants du nombre de factures
+FIXED_CALLS = [
+    ('sellsy', 'POST', '/oauth2/access-tokens'),
+    ('sellsy', 'GET', '/taxes'),
+    ('airtable', 'GET', '/service_sellsy'),
+    ('airtable', 'GET', '/grilles_remise'),
+    ('sellsy', 'POST', '/companies/search'),
+    ('sellsy', 'GET', '/payments/methods'),
+]
+
+
+def build_report(invoices: int, calls_per_invoice: int = 3):
+    recorder = PerfRecorder()
+    for service, method, endpoint in FIXED_CALLS * 2:
+        recorder.record_call(service, method, endpoint, 0.1, 200)
+    for index in range(invoices):
+        recorder.record_call('sellsy', 'POST', '/invoices', 0.2, 201)
+        for _ in range(calls_per_invoice - 1):
+            recorder.record_call('airtable', 'PATCH', f'/service_sellsy/{index}', 0.1, 200)
+    return recorder.report({'created': invoices}, BUDGETS)
+
+
+def test_single_invoice_skips_per_invoice_budgets():
+    report = build_report(1)
+    assert report['metrics']['api_calls_per_invoice'] > BUDGETS['api_calls_per_invoice']
+    assert report['budgets_skipped'] == ['api_calls_per_invoice']
+    assert report['budget_failures'] == []
+
+
+def test_hundred_invoices_within_budget():
+    report = build_report(100)
+    assert report['budgets_skipped'] == []
+    assert report['budget_failures'] == []
+    assert report['metrics']['api_calls_per_invoice'] == 3.12
+
+
+def test_hundred_invoices_regression_fails():
+    report = build_report(100, calls_per_invoice=9)
+    assert report['budgets_skipped'] == []
+    assert report['budget_failures'] == ['api_calls_per_invoice = 9.12 > 8']
+
+
+def test_latency_budget_checked_whatever_the_invoice_count():
+    recorder = PerfRecorder()
+    recorder.record_call('sellsy', 'POST', '/invoices', 5.0, 201)
+    report = recorder.report({'created': 1}, BUDGETS)
+    assert report['budget_failures'] == ['p95_ms = 5000.0 > 3000']
+
+
+def test_parse_budgets():
+    assert parse_budgets('api_calls_per_invoice=8, p95_ms=3000') == BUDGETS
+    assert parse_budgets('') == {}
+    with pytest.raises(ValueError):
+        parse_budgets('unknown=1')
+
+
+def test_endpoint_family_and_percentile():
+    assert endpoint_family('/invoices/123/validate?x=1') == '/invoices/{id}/validate'
+    assert percentile([], 95) is None
+    assert percentile(list(range(1, 101)), 95) == 95
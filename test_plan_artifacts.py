@@ -0,0 +1,62 @@
+"""
+Tests des artefacts du plan : diff avec le plan précédent et relecture
+"""
+
+import csv
+from datetime import date
+
+from src.plan_artifacts import diff_plans, load_plan, plan_paths, write_plan_artifacts
+from src.planner import InvoicePlanner
+from src.subscription import decode_subscriptions
+
+GRID = {'Nom de la grille': 'Standard', 'Année 1 (%)': 50, 'Label Année 1': 'Lancement'}
+
+
+def service(record_id, client_id, prix, mois_factures=5):
+    return {'id': record_id, 'fields': {
+        'Nom du service': record_id, 'ID_Sellsy_abonné': client_id, 'ID Sellsy': '100',
+        'Prix HT': prix, 'Date de début': '2025-01-05', 'Mois facturés': mois_factures,
+        'Occurrences restantes': 6,
+    }}
+
+
+def plan(*records, today=date(2025, 6, 10)):
+    return InvoicePlanner({}, GRID).plan(decode_subscriptions(records), today)
+
+
+def test_first_plan_has_no_baseline():
+    diff = diff_plans(None, plan(service('rec1', 1, '10')).to_dict())
+    assert diff['previous_today'] is None
+    assert [invoice['client_id'] for invoice in diff['added']] == ['1']
+
+
+def test_diff_added_removed_changed_unchanged():
+    before = plan(service('rec1', 1, '10'), service('rec2', 2, '20'), service('rec3', 3, '30'))
+    after = plan(service('rec1', 1, '10'), service('rec2', 2, '25'), service('rec4', 4, '40'),
+                 today=date(2025, 6, 11))
+    diff = diff_plans(before.to_dict(), after.to_dict())
+
+    assert diff['previous_today'] == '2025-06-10'
+    assert [invoice['client_id'] for invoice in diff['added']] == ['4']
+    assert [invoice['client_id'] for invoice in diff['removed']] == ['3']
+    assert diff['unchanged'] == 1
+    [changed] = diff['changed']
+    assert (changed['client_id'], changed['total_ht_avant'], changed['total_ht']) == ('2', '10.00', '12.50')
+    assert changed['lines'][0]['avant']['prix_final'] == '10.00'
+    assert changed['lines'][0]['apres']['prix_final'] == '12.50'
+
+
+def test_write_artifacts_diffs_against_previous_run(tmp_path):
+    plan_dir = str(tmp_path)
+    first = plan(service('rec1', 1, '10'))
+    assert write_plan_artifacts(first, plan_dir)['previous_today'] is None
+
+    second = plan(service('rec1', 1, '10'), service('rec2', 2, '20'), today=date(2025, 6, 11))
+    diff = write_plan_artifacts(second, plan_dir)
+    assert diff['previous_today'] == '2025-06-10'
+    assert diff['unchanged'] == 1 and len(diff['added']) == 1
+
+    paths = plan_paths(plan_dir)
+    assert load_plan(paths['json']) == second
+    with open(paths['csv'], encoding='utf-8') as f:
+        assert [row['record_id'] for row in csv.DictReader(f)] == ['rec1', 'rec2']
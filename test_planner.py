@@ -0,0 +1,86 @@
+"""
+Tests du planificateur : groupement, remises, totaux et compteurs (sans réseau)
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from src.planner import InvoicePlan, InvoicePlanner
+from src.subscription import decode_subscriptions
+
+GRIDS = {
+    'recVIP': {'Nom de la grille': 'VIP', 'Année 1 (%)': 30, 'Label Année 1': 'Remise VIP',
+               'Année 2 (%)': 10, 'Label Année 2': 'Fidélité'},
+}
+DEFAULT_GRID = {'Nom de la grille': 'Standard', 'Année 1 (%)': 100, 'Label Année 1': 'Offre de lancement'}
+TODAY = date(2025, 6, 10)
+
+
+def service(record_id, client_id, prix, start='2025-01-05', mois_factures=5, **extra):
+    fields = {'Nom du service': record_id, 'ID_Sellsy_abonné': client_id, 'ID Sellsy': '100',
+              'Prix HT': prix, 'Date de début': start, 'Mois facturés': mois_factures,
+              'Occurrences restantes': 12 - mois_factures}
+    fields.update(extra)
+    return {'id': record_id, 'fields': fields}
+
+
+def plan(*records):
+    return InvoicePlanner(GRIDS, DEFAULT_GRID).plan(decode_subscriptions(records), TODAY)
+
+
+def test_groups_by_client_and_month_with_totals():
+    result = plan(
+        service('rec1', 1, '29.90'),
+        service('rec2', 1, '99', **{'Grille de remise': ['recVIP']}),
+        # En retard : mois de facturation différent, facture séparée
+        service('rec3', 1, '15', mois_factures=3),
+        service('rec4', 2, '12', **{'Appliquer remise dégressive': False}),
+    )
+    assert [invoice.key for invoice in result.invoices] == [
+        ('1', '2025-05'), ('1', '2025-07'), ('2', '2025-07'),
+    ]
+
+    grouped = result.invoices[1]
+    assert [line.record_id for line in grouped.lines] == ['rec1', 'rec2']
+    assert [line.remise_pct for line in grouped.lines] == [Decimal('100'), Decimal('30')]
+    assert grouped.total_remise == Decimal('59.60')
+    assert grouped.total_ht == Decimal('69.30')
+    assert result.invoices[2].total_ht == Decimal('12.00')
+    assert result.invoices[2].total_remise == Decimal('0')
+    assert result.skipped == ()
+
+
+def test_counters_and_late_months():
+    result = plan(service('rec1', 1, '10', mois_factures=2))
+    line, update = result.invoices[0].lines[0], result.invoices[0].updates[0]
+    assert line.mois == 3 and line.late_months == 2
+    assert (update.mois_factures_avant, update.mois_factures) == (2, 3)
+    assert (update.occurrences_avant, update.occurrences_restantes) == (10, 9)
+
+
+def test_skips_invalid_and_not_due():
+    result = plan(
+        service('rec1', 1, '10', mois_factures=6),
+        service('rec2', 1, '0'),
+        service('rec3', None, '10'),
+    )
+    assert result.invoices == ()
+    reasons = {skip.record_id: skip.reason for skip in result.skipped}
+    assert reasons['rec1'].startswith('Pas de facturation due')
+    assert reasons['rec2'].startswith('Données incomplètes')
+    assert reasons['rec3'].startswith('Données incomplètes')
+    assert result.service_count == 3
+
+
+def test_missing_grid_bills_without_discount():
+    result = plan(service('rec1', 1, '10', **{'Grille de remise': ['recGone']}))
+    line = result.invoices[0].lines[0]
+    assert line.montant_remise == Decimal('0.00')
+    assert 'introuvable' in line.warning
+
+
+def test_plan_round_trips_through_json_dict():
+    result = plan(service('rec1', 1, '29.90'), service('rec2', 2, '12'))
+    assert InvoicePlan.from_dict(result.to_dict()) == result
+    assert result.select(lambda client_id: client_id == '2').invoices[0].client_id == '2'
+    assert result.without([('1', '2025-07')]).invoices == result.invoices[1:]
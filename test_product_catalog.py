@@ -0,0 +1,100 @@
+"""
+Tests du catalogue produits Sellsy et du rejet des factures à produit inconnu
+"""
+
+import json
+from datetime import date
+
+import sync_subscription_invoices as sync
+from src.planner import InvoicePlanner
+from src.product_catalog import ProductCatalog
+from src.sharding import ShardJournal
+from src.subscription import decode_subscriptions
+
+
+class FakeClient:
+    def __init__(self, pages=None, error=None):
+        self.pages = pages if pages is not None else [[
+            {"id": 100, "reference_price_taxes_exc": "29.90", "tax_id": "7"},
+            {"id": "101", "reference_price": "12.00"},
+        ]]
+        self.error = error
+        self.loads = 0
+
+    def iter_pages(self, method, endpoint, data=None, params=None, page_size=100, start_offset=0):
+        assert (method, endpoint) == ("GET", "/items")
+        self.loads += 1
+        if self.error:
+            raise self.error
+        yield from self.pages
+
+
+def test_catalog_loaded_once_then_served_from_cache():
+    client = FakeClient()
+    catalog = ProductCatalog(client)
+
+    assert catalog.get(100)["tax_id"] == "7"
+    assert catalog.get("101") is not None
+    assert catalog.get(102) is None
+    assert catalog.get("abc") is None
+    assert client.loads == 1
+
+    assert catalog.get_unit_price(100) == "29.90"
+    assert catalog.get_unit_price(101) == "12.00"
+    assert catalog.get_tax_id(100) == 7
+    assert catalog.get_tax_id(101) is None
+    assert client.loads == 1
+
+    # load() recharge explicitement (une fois par exécution)
+    catalog.load()
+    assert client.loads == 2
+
+
+def test_validate_returns_unknown_references():
+    catalog = ProductCatalog(FakeClient())
+    assert catalog.validate([100, "101", 102, "abc", None]) == {102, "abc", None}
+
+
+def service(record_id, client_id, product_id):
+    return {'id': record_id, 'fields': {
+        'Nom du service': record_id, 'ID_Sellsy_abonné': client_id, 'ID Sellsy': product_id,
+        'Prix HT': 10, 'Date de début': '2025-01-05', 'Mois facturés': 5,
+        'Occurrences restantes': 7, 'Appliquer remise dégressive': False,
+    }}
+
+
+def make_sync(client, journal_dir):
+    instance = object.__new__(sync.SubscriptionInvoiceSync)
+    instance.catalog = ProductCatalog(client)
+    instance.journal = ShardJournal(journal_dir)
+    return instance
+
+
+def build_plan():
+    records = [service('rec1', 1, 100), service('rec2', 1, 102), service('rec3', 2, 101)]
+    return InvoicePlanner({}, None).plan(decode_subscriptions(records), date(2025, 6, 10))
+
+
+def test_reject_invalid_products_drops_whole_group(tmp_path):
+    instance = make_sync(FakeClient(), str(tmp_path))
+
+    plan, rejected = instance.reject_invalid_products(build_plan())
+
+    assert rejected == 1
+    assert [invoice.client_id for invoice in plan.invoices] == ['2']
+    with open(instance.journal.path, encoding='utf-8') as f:
+        events = [json.loads(line) for line in f]
+    assert events == [{
+        'event': 'group', 'client_id': '1', 'date': '2025-07', 'services': ['rec1', 'rec2'],
+        'status': 'rejected', 'error': 'Produit inconnu dans Sellsy',
+    }]
+
+
+def test_unavailable_catalog_keeps_the_plan(tmp_path):
+    instance = make_sync(FakeClient(error=ConnectionError("Sellsy injoignable")), str(tmp_path))
+    original = build_plan()
+
+    plan, rejected = instance.reject_invalid_products(original)
+
+    assert rejected == 0
+    assert plan is original
@@ -0,0 +1,102 @@
+"""
+Tests du profilage : piles repliées depuis cProfile et échantillonnage
+"""
+
+import os
+import time
+
+import pytest
+
+from src import profiling
+from src.profiling import StackSampler, collapsed_from_stats, profiled
+
+
+class FakeStats:
+    """Équivalent minimal de pstats.Stats : {func: (cc, nc, tt, ct, callers)}"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+
+def func(name):
+    return ("app.py", 1, name)
+
+
+def diamond(levels, total=1.0):
+    """Chaque niveau : deux fonctions appelées par les deux fonctions du niveau précédent"""
+    stats = {func("root"): (1, 1, 0.0, total, {})}
+    parents = [func("root")]
+    for level in range(1, levels + 1):
+        names = [func(f"a{level}"), func(f"b{level}")]
+        own = total / 2 if level == levels else 0.0
+        for name in names:
+            edge = (1, 1, own / len(parents), total / 2 / len(parents))
+            stats[name] = (2, 2, own, total / 2, {parent: edge for parent in parents})
+        parents = names
+    return FakeStats(stats)
+
+
+def test_shared_callers_stay_bounded_and_keep_total_weight():
+    # 2^40 chemins sans borne
+    stacks = collapsed_from_stats(diamond(40))
+    assert len(stacks) <= profiling.MAX_STACKS
+    assert sum(stacks.values()) == pytest.approx(1e6, rel=0.01)
+
+
+def test_small_graph_is_fully_expanded():
+    stacks = collapsed_from_stats(diamond(2))
+    assert stacks["root (app.py:1);a1 (app.py:1);a2 (app.py:1)"] == 250000
+    assert sum(stacks.values()) == 1000000
+    assert len([stack for stack in stacks if stack.count(";") == 2]) == 4
+
+
+def test_stack_budget_caps_the_output(monkeypatch):
+    monkeypatch.setattr(profiling, "MIN_FRACTION", 0)
+    monkeypatch.setattr(profiling, "MAX_STACKS", 50)
+    stacks = collapsed_from_stats(diamond(30))
+    assert len(stacks) <= 50 + 2 * profiling.MAX_DEPTH
+    assert sum(stacks.values()) == pytest.approx(1e6, rel=0.01)
+
+
+def test_recursive_calls_are_cut():
+    recursive = func("recurse")
+    stats = FakeStats({
+        func("root"): (1, 1, 0.0, 1.0, {}),
+        recursive: (5, 1, 1.0, 1.0, {func("root"): (1, 1, 0.2, 1.0), recursive: (4, 4, 0.8, 0.8)}),
+    })
+    stacks = collapsed_from_stats(stats)
+    assert list(stacks) == ["root (app.py:1)", "root (app.py:1);recurse (app.py:1)"]
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_profiled_writes_the_expected_files(tmp_path):
+    with profiled("deterministic", str(tmp_path), "det") as written:
+        busy(0.01)
+    assert written == [str(tmp_path / "det.pstats"), str(tmp_path / "det.collapsed")]
+    assert all(os.path.getsize(path) > 0 for path in written)
+
+    with profiled("sampling", str(tmp_path), "smp", interval=0.001) as written:
+        busy(0.05)
+    assert written == [str(tmp_path / "smp.collapsed")]
+
+    with profiled(None, str(tmp_path), "none") as written:
+        pass
+    assert written == []
+
+    with pytest.raises(ValueError):
+        with profiled("tracing", str(tmp_path), "bad"):
+            pass
+
+
+def test_sampler_counts_stacks_of_other_threads():
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    busy(0.05)
+    sampler.stop()
+    assert sampler.samples > 0
+    assert any(stack.startswith("MainThread;") for stack in sampler.counts)
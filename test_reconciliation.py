@@ -0,0 +1,83 @@
+"""
+Tests du rapprochement Airtable / Sellsy
+"""
+
+from src.forecast import RevenueForecast
+from src.reconciliation import InvoiceReconciler
+
+
+def service(record_id, client_id, prix, mois_factures, date_debut='2025-01-01'):
+    return {'id': record_id, 'fields': {
+        'ID_Sellsy_abonné': client_id, 'ID Sellsy': 42, 'Date de début': date_debut,
+        'Prix HT': prix, 'Mois facturés': mois_factures, 'Occurrences restantes': 6,
+        'Appliquer remise dégressive': False,
+    }}
+
+
+def invoice(invoice_id, client_id, date, amount, subject='Abonnement', status='due'):
+    return {
+        'id': invoice_id, 'number': f"FA{invoice_id}", 'date': date, 'status': status,
+        'subject': subject, 'amounts': {'total_excl_tax': amount},
+        'related': [{'type': 'company', 'id': client_id}],
+    }
+
+
+def reconcile(services, invoices):
+    return InvoiceReconciler(RevenueForecast({})).reconcile(services, invoices)
+
+
+def test_matched_duplicate_late_and_unexpected():
+    services = [service('rec1', 1, 100, 3)]
+    invoices = [
+        invoice(10, 1, '2025-01-05', '100.00'),
+        invoice(11, 1, '2025-02-05', '100.00'),
+        invoice(12, 1, '2025-02-06', '100.00'),
+        invoice(13, 1, '2025-04-05', '100.00'),
+        invoice(14, 1, '2025-06-05', '999.00'),
+        invoice(15, 1, '2025-03-05', '100.00', status='cancelled'),
+        invoice(16, 1, '2025-03-05', '100.00', subject='Installation'),
+    ]
+    report = reconcile(services, invoices)
+
+    assert report['duplicates'] == [{'client_id': '1', 'month': '2025-02', 'invoices': [11, 12]}]
+    assert report['late'] == [{'client_id': '1', 'month': '2025-03', 'invoice_id': 13, 'invoice_month': '2025-04'}]
+    assert [item['invoice_id'] for item in report['unexpected']] == [14]
+    assert report['missing'] == [] and report['amount_mismatches'] == []
+    assert report['summary']['expected'] == 3
+    assert report['summary']['matched'] == 2
+
+
+def test_missing_and_amount_mismatch():
+    services = [service('rec2', 2, 50, 1), service('rec3', 3, 80, 1)]
+    report = reconcile(services, [invoice(20, 2, '2025-01-10', '45.00')])
+
+    assert report['amount_mismatches'] == [{
+        'client_id': '2', 'month': '2025-01', 'invoice_id': 20,
+        'expected_ht': '50', 'actual_ht': '45.00',
+    }]
+    assert report['missing'] == [{
+        'client_id': '3', 'month': '2025-01', 'expected_ht': '80', 'services': ['rec3'],
+    }]
+
+
+def test_grouped_services_expected_on_one_invoice():
+    services = [service('rec4', 4, 30, 1), service('rec5', 4, 20, 1)]
+    report = reconcile(services, [invoice(40, 4, '2025-01-10', '50.00')])
+    assert report['summary']['matched'] == 1
+    assert report['missing'] == [] and report['amount_mismatches'] == []
+
+
+def test_invalid_records_are_reported_not_fatal():
+    services = [
+        service('rec1', 1, 100, 1),
+        service('rec6', 6, 100, 2, date_debut='2025-13-01'),
+        service('rec7', 7, 100, 'deux'),
+        service('rec8', 8, 100, 0),
+    ]
+    report = reconcile(services, [invoice(10, 1, '2025-01-05', '100.00')])
+
+    assert [item['record_id'] for item in report['invalid']] == ['rec6', 'rec7']
+    assert 'Date de début invalide: 2025-13-01' in report['invalid'][0]['reason']
+    assert 'Mois facturés invalide: deux' in report['invalid'][1]['reason']
+    assert report['summary']['invalid'] == 2
+    assert report['summary']['matched'] == 1
@@ -0,0 +1,78 @@
+"""
+Tests du cache des réponses GET Sellsy (mémoire + disque SQLite)
+"""
+
+import sqlite3
+import threading
+
+from src.response_cache import ResponseCache, resource_of
+
+
+def test_ttl_rules():
+    cache = ResponseCache()
+    assert cache.ttl_for('/taxes') == 24 * 3600
+    assert cache.ttl_for('/invoices/12') == 0
+    assert cache.ttl_for('/invoices/search') is None
+    assert cache.key_for('/items', {'offset': 10, 'limit': 100}) == '/items?limit=100&offset=10'
+
+
+def test_memory_lru_and_invalidation():
+    cache = ResponseCache(max_entries=2)
+    cache.put('/invoices/1', '{}')
+    cache.put('/invoices/2', '{}')
+    cache.get('/invoices/1')
+    cache.put('/invoices/3', '{}')
+    assert cache.get('/invoices/2') is None
+    assert cache.get('/invoices/1') is not None
+
+    cache.invalidate(resource_of('/invoices/1/validate'))
+    assert cache.get('/invoices/1') is None
+    assert cache.get('/invoices/3') is not None
+
+
+def test_personal_data_never_written_to_disk(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = ResponseCache(disk_path=path)
+    cache.put('/taxes', '{"data": []}', etag='"v1"')
+    cache.put('/companies/42', '{"data": {"name": "Example SAS"}}')
+    cache.put('/contacts/7', '{"data": {"email": "a@example.com"}}')
+    # Servies depuis la mémoire pendant l'exécution
+    assert cache.get('/companies/42') is not None
+    cache.close()
+
+    reopened = ResponseCache(disk_path=path)
+    assert reopened.get('/taxes').etag == '"v1"'
+    assert reopened.get('/companies/42') is None
+    assert reopened.get('/contacts/7') is None
+
+
+def test_legacy_personal_rows_are_purged(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    ResponseCache(disk_path=path, memory_only=[]).put('/individuals/9', '{}')
+
+    ResponseCache(disk_path=path).close()
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT key FROM responses").fetchall() == []
+
+
+def test_stats_counted_under_lock_from_many_threads():
+    cache = ResponseCache()
+    cache.put('/taxes', '[]')
+
+    def worker():
+        for _ in range(2000):
+            entry, fresh = cache.lookup('/taxes', 3600)
+            assert fresh
+            cache.touch('/taxes', entry)
+            cache.put('/items', '[]')
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.stats == {'hits': 16000, 'revalidated': 16000, 'misses': 16001}
+    assert cache.lookup('/absent', 3600) == (None, False)
+    assert cache.lookup('/taxes', 0)[1] is False
+    assert cache.stats['hits'] == 16000
@@ -0,0 +1,76 @@
+"""
+Tests de la planification : dates d'échéance et file des abonnements dus
+"""
+
+from datetime import date
+
+from src.scheduler import DueQueue, billing_date, due_cutoff, next_due_from_fields
+from src.subscription import decode_subscription
+
+
+def subscription(record_id, client_id='42', start='2025-01-15', mois_factures=0):
+    return decode_subscription({'id': record_id, 'fields': {
+        'Nom du service': record_id, 'ID_Sellsy_abonné': client_id, 'ID Sellsy': '100',
+        'Prix HT': 10, 'Date de début': start, 'Mois facturés': mois_factures,
+        'Occurrences restantes': 12,
+    }})
+
+
+def test_billing_date_clamps_to_month_end():
+    assert billing_date(date(2025, 1, 31), 1) == date(2025, 2, 28)
+    assert billing_date(date(2024, 1, 31), 1) == date(2024, 2, 29)
+    assert billing_date(date(2025, 11, 15), 2) == date(2026, 1, 15)
+
+
+def test_next_due_from_fields():
+    assert next_due_from_fields({'Date de début': '2025-01-15', 'Mois facturés': 3}) == '2025-04-15'
+    assert next_due_from_fields({'Date de début': '2025-01-15'}) == '2025-01-15'
+    assert next_due_from_fields({'Date de début': ''}) is None
+    assert next_due_from_fields({'Date de début': 'demain'}) is None
+    assert next_due_from_fields({'Date de début': '2025-01-15', 'Mois facturés': 'x'}) is None
+
+
+def test_due_cutoff():
+    assert due_cutoff(date(2025, 3, 10)) == date(2025, 4, 1)
+    assert due_cutoff(date(2025, 12, 31)) == date(2026, 1, 1)
+
+
+def test_pop_due_returns_due_services_only():
+    queue = DueQueue()
+    queue.push(subscription('rec1', client_id='1', start='2025-01-05'))
+    queue.push(subscription('rec2', client_id='2', start='2025-01-20'))
+
+    assert queue.next_due() == date(2025, 1, 5)
+    assert [sub.record_id for sub in queue.pop_due(date(2025, 1, 10))] == ['rec1']
+    assert len(queue) == 1 and 'rec2' in queue
+
+
+def test_pop_due_groups_same_client_and_month():
+    queue = DueQueue()
+    queue.push(subscription('rec1', start='2025-01-05'))
+    queue.push(subscription('rec2', start='2025-01-25'))
+    queue.push(subscription('rec3', start='2025-02-05'))
+
+    due = queue.pop_due(date(2025, 1, 10))
+    assert sorted(sub.record_id for sub in due) == ['rec1', 'rec2']
+    # L'entrée de tas de rec2 est obsolète : elle ne ressort pas
+    assert queue.next_due() == date(2025, 2, 5)
+    assert queue.pop_due(date(2025, 1, 31)) == []
+
+
+def test_push_reschedules_and_regroups():
+    queue = DueQueue()
+    queue.push(subscription('rec1', start='2025-01-05'))
+    queue.push(subscription('rec2', start='2025-01-25'))
+    # rec2 facturé ailleurs : il passe au mois suivant et quitte le groupe de janvier
+    queue.push(subscription('rec2', start='2025-01-25', mois_factures=1))
+
+    assert [sub.record_id for sub in queue.pop_due(date(2025, 1, 10))] == ['rec1']
+    queue.remove('rec2')
+    assert len(queue) == 0 and queue.next_due() is None
+
+
+def test_not_before_postpones():
+    queue = DueQueue()
+    assert queue.push(subscription('rec1', start='2025-01-05'), not_before=date(2025, 1, 11)) == date(2025, 1, 11)
+    assert queue.pop_due(date(2025, 1, 10)) == []
@@ -0,0 +1,128 @@
+"""
+Tests du client Sellsy sans réseau : résolution du type de client et recherche groupée
+"""
+
+import pytest
+
+from src.circuit_breaker import CircuitOpenError
+from src.sellsy_client_v2 import SellsyAPIError, SellsyClientV2
+
+
+def make_client(responses):
+    """Client dont _make_request répond depuis {endpoint: dict ou exception}"""
+    client = SellsyClientV2("id", "secret", token_manager=object())
+    calls = []
+
+    def make_request(method, endpoint, data=None, params=None):
+        calls.append(endpoint)
+        response = responses.get(endpoint, SellsyAPIError(404, "not found"))
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client._make_request = make_request
+    return client, calls
+
+
+def test_company_then_individual_on_404():
+    client, calls = make_client({"/individuals/7": {"data": {"id": 7}}})
+    assert client.get_client_info(7)["_entity_type"] == "individual"
+    assert calls == ["/companies/7", "/individuals/7"]
+    # Résultat mis en cache
+    client.get_client_info(7)
+    assert len(calls) == 2
+
+
+def test_unknown_client():
+    client, _ = make_client({})
+    with pytest.raises(SellsyAPIError) as error:
+        client.get_client_info(7)
+    assert error.value.status_code == 404
+
+
+def test_open_circuit_fails_fast_without_fallback():
+    client, calls = make_client({"/companies/7": CircuitOpenError("GET /companies/{id}", 30)})
+    with pytest.raises(CircuitOpenError):
+        client.get_client_info(7)
+    assert calls == ["/companies/7"]
+
+
+def test_server_error_is_not_a_missing_company():
+    client, calls = make_client({"/companies/7": SellsyAPIError(503, "unavailable")})
+    with pytest.raises(SellsyAPIError) as error:
+        client.get_client_info(7)
+    assert error.value.status_code == 503
+    assert calls == ["/companies/7"]
+
+
+def make_search_client(companies, individuals, responses=None):
+    """Client dont les recherches groupées répondent depuis des annuaires {id: données}"""
+    client, calls = make_client(responses or {})
+    searches = []
+    directories = {"/companies/search": companies, "/individuals/search": individuals}
+
+    def iter_pages(method, endpoint, data=None, params=None, page_size=100, start_offset=0):
+        ids = data["filters"]["ids"]
+        searches.append((endpoint, list(ids)))
+        # Sellsy peut renvoyer des résultats hors filtre : ils doivent être ignorés
+        found = [dict(directories[endpoint][i], id=i) for i in ids if i in directories[endpoint]]
+        yield found + [{"id": 999}]
+
+    client.iter_pages = iter_pages
+    return client, calls, searches
+
+
+def test_prefetch_searches_by_chunk_then_individuals_for_the_rest():
+    client, calls, searches = make_search_client(
+        companies={1: {"name": "A"}, 2: {"name": "B"}, 4: {"name": "D"}},
+        individuals={3: {"name": "C"}, 5: {"name": "E"}},
+    )
+
+    assert client.prefetch_clients([5, 4, 3, 2, 1, 1], chunk_size=2) == 5
+
+    assert searches == [
+        ("/companies/search", [1, 2]),
+        ("/companies/search", [3, 4]),
+        ("/companies/search", [5]),
+        ("/individuals/search", [3, 5]),
+    ]
+    assert client.get_client_info(4)["_entity_type"] == "company"
+    assert client.get_client_info(5)["_entity_type"] == "individual"
+    assert 999 not in client._client_cache
+    assert calls == []
+
+
+def test_prefetch_skips_cached_and_stops_when_all_found():
+    client, _, searches = make_search_client(companies={2: {}}, individuals={})
+    client._client_cache[1] = {"id": 1, "_entity_type": "individual"}
+
+    assert client.prefetch_clients([1, 2]) == 1
+    assert searches == [("/companies/search", [2])]
+
+
+def test_ids_missed_by_search_fall_back_to_get_client_info():
+    client, calls, _ = make_search_client(
+        companies={1: {}},
+        individuals={},
+        responses={"/individuals/8": {"data": {"id": 8}}},
+    )
+
+    assert client.prefetch_clients([1, 8]) == 1
+    assert calls == []
+    assert client.get_client_info(8)["_entity_type"] == "individual"
+    assert calls == ["/companies/8", "/individuals/8"]
+
+
+def test_grouped_invoice_amounts_use_the_api_format():
+    client, _ = make_client({})
+    client._client_cache[7] = {"id": 7, "_entity_type": "company"}
+    lines = [
+        {"product_id": "100", "service_name": "A", "prix_ht": 10, "remise_pct": 0, "libelle_remise": ""},
+        {"product_id": "101", "service_name": "B", "prix_ht": "33,33", "remise_pct": "12.5",
+         "libelle_remise": "Remise"},
+    ]
+
+    invoice, priced = client.build_grouped_invoice(7, lines, payment_method_id=5, tva_id=1)
+
+    assert [row["unit_amount"] for row in invoice["rows"]] == ["10.00", "33.33", "-4.17"]
+    assert str(priced.total_ht) == "39.16"
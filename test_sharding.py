@@ -0,0 +1,91 @@
+"""
+Tests de la répartition des clients entre shards et de la fusion des journaux
+"""
+
+from concurrent.futures import Future
+
+import pytest
+
+import sync_subscription_invoices as sync
+from src import factory
+from src.airtable_mirror import AirtableMirror
+from src.sharding import ShardJournal, merge_journals, parse_shard, shard_filter, shard_for
+
+
+def test_parse_shard():
+    assert parse_shard('1/4') == (1, 4)
+    for invalid in ('4/4', '-1/2', '1', 'a/b', '0/0'):
+        with pytest.raises(ValueError):
+            parse_shard(invalid)
+
+
+def test_shard_is_stable_and_covers_every_client():
+    clients = [str(client_id) for client_id in range(1000)]
+    # Valeurs figées : identiques d'un processus et d'une machine à l'autre
+    assert [shard_for(client_id, 4) for client_id in range(700, 706)] == [2, 3, 1, 1, 0, 2]
+    assert shard_for('722', 4) == shard_for(722, 4) == shard_for(' 722 ', 4)
+    assignments = [shard_for(client_id, 4) for client_id in clients]
+    assert set(assignments) == {0, 1, 2, 3}
+
+    filters = [shard_filter(index, 4) for index in range(4)]
+    for client_id in clients:
+        assert sum(accept(client_id) for accept in filters) == 1
+    assert shard_filter(0, 1)('n’importe quel client')
+
+
+def test_merge_journals(tmp_path):
+    for index, created in ((0, 2), (1, 3)):
+        journal = ShardJournal(str(tmp_path), index, 3)
+        journal.write('group', client_id='1', date='2025-07', status='error', error='500')
+        journal.write('summary', services=created, groups=created, created=created, validated=created, errors=1)
+    ShardJournal(str(tmp_path), 2, 3).write('group', client_id='9', status='created')
+
+    merged = merge_journals(str(tmp_path))
+    assert merged['shards'] == 3
+    assert merged['incomplete_shards'] == ['shard-2-of-3.jsonl']
+    assert (merged['created'], merged['validated'], merged['errors']) == (5, 5, 2)
+    assert len(merged['failed_groups']) == 2
+
+
+def test_shard_and_workers_are_exclusive(monkeypatch):
+    monkeypatch.delenv('SYNC_WORKERS', raising=False)
+    assert sync.parse_args([]).shard == (0, 1)
+    assert sync.parse_args(['--shard', '1/2']).shard == (1, 2)
+    assert sync.parse_args(['--workers', '3']).workers == 3
+    with pytest.raises(SystemExit):
+        sync.parse_args(['--shard', '1/2', '--workers', '3'])
+
+
+def test_run_sharded_keeps_shared_airtable_client_open(tmp_path, monkeypatch):
+    monkeypatch.setenv('AIRTABLE_MIRROR_PATH', str(tmp_path / 'mirror.db'))
+    monkeypatch.setenv('AIRTABLE_API_KEY', 'key')
+    monkeypatch.setenv('AIRTABLE_BASE_ID', 'base')
+    factory.get_airtable_client.cache_clear()
+    refreshed = []
+    monkeypatch.setattr(AirtableMirror, 'refresh', lambda self: refreshed.append(self))
+
+    class InlineExecutor:
+        def __init__(self, max_workers, mp_context):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def submit(self, fn, *args):
+            future = Future()
+            future.set_result([])
+            return future
+
+    monkeypatch.setattr(sync, 'ProcessPoolExecutor', InlineExecutor)
+    try:
+        shared = factory.get_airtable_client()
+        merged = sync.run_sharded(True, 2, str(tmp_path / 'journals'))
+        assert merged['budget_failures'] == []
+        assert len(refreshed) == 1 and refreshed[0] is not shared
+        # Le client partagé reste utilisable après le rafraîchissement
+        assert shared._query("SELECT 1")[0][0] == 1
+    finally:
+        factory.get_airtable_client.cache_clear()
@@ -0,0 +1,55 @@
+"""
+Tests du décodage des services Airtable en Subscription
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from src.subscription import decode_subscription, decode_subscriptions
+
+
+def record(record_id='rec1', **overrides):
+    fields = {
+        'Nom du service': 'Hébergement', 'ID_Sellsy_abonné': 42, 'ID Sellsy': '100',
+        'Prix HT': '57,92', 'Date de début': '2025-01-31', 'Mois facturés': 1,
+        'Occurrences restantes': 11, 'Grille de remise': ['recGrid'],
+    }
+    fields.update(overrides)
+    return {'id': record_id, 'fields': fields}
+
+
+def test_decode_valid_record():
+    subscription = decode_subscription(record())
+    assert subscription.is_valid
+    assert subscription.client_id == '42'
+    assert subscription.product_id == 100
+    assert subscription.prix_ht == Decimal('57.92')
+    assert subscription.date_debut == date(2025, 1, 31)
+    assert (subscription.mois_factures, subscription.occurrences_restantes) == (1, 11)
+    assert subscription.billing_month == '2025-03'
+    assert subscription.grid_id == 'recGrid'
+
+
+def test_counters_accept_empty_and_integral_values():
+    subscription = decode_subscription(record(**{'Mois facturés': '', 'Occurrences restantes': '12.0'}))
+    assert subscription.is_valid
+    assert (subscription.mois_factures, subscription.occurrences_restantes) == (0, 12)
+
+
+def test_invalid_counter_is_a_problem_not_an_exception():
+    records = [
+        record('rec1', **{'Mois facturés': 'trois'}),
+        record('rec2', **{'Occurrences restantes': '2.5'}),
+        record('rec3'),
+    ]
+    subscriptions = decode_subscriptions(records)
+    assert [sub.is_valid for sub in subscriptions] == [False, False, True]
+    assert subscriptions[0].problems == ('Mois facturés invalide: trois',)
+    assert subscriptions[1].problems == ('Occurrences restantes invalide: 2.5',)
+
+
+def test_missing_fields_are_reported():
+    subscription = decode_subscription({'id': 'rec1', 'fields': {'Prix HT': 0}})
+    assert not subscription.is_valid
+    assert len(subscription.problems) == 4
+    assert subscription.billing_month is None
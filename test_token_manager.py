@@ -0,0 +1,137 @@
+"""
+Tests du token OAuth2 partagé : rafraîchissement unique, cache disque, 401
+"""
+
+import json
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from src import token_manager as tm
+from src.sellsy_client_v2 import SellsyAPIError, SellsyClientV2
+from src.token_manager import TokenManager
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.payload = payload or {}
+        self.text = json.dumps(self.payload)
+
+    def json(self):
+        return self.payload
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def oauth(monkeypatch):
+    """Serveur OAuth simulé : chaque appel délivre token-1, token-2..."""
+    calls = []
+    lock = threading.Lock()
+
+    def post(url, json=None, headers=None, timeout=None):
+        with lock:
+            calls.append(json)
+            number = len(calls)
+        time.sleep(0.05)  # Laisse les autres threads arriver pendant l'appel
+        return FakeResponse(200, {"access_token": f"token-{number}", "expires_in": 3600})
+
+    monkeypatch.setattr(tm.requests, "post", post)
+    return calls
+
+
+def write_expired_cache(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"client_id": "id", "access_token": "old", "expires_at": time.time() - 10}, f)
+
+
+def run_threads(count, target):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(index):
+        barrier.wait()
+        results[index] = target(index)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_threads_trigger_a_single_oauth_call(tmp_path, oauth):
+    cache_path = str(tmp_path / "token.json")
+    write_expired_cache(cache_path)
+    manager = TokenManager("id", "secret", cache_path=cache_path)
+
+    tokens = run_threads(16, lambda index: manager.get_token())
+
+    assert len(oauth) == 1
+    assert set(tokens) == {"token-1"}
+    with open(cache_path, encoding="utf-8") as f:
+        assert json.load(f)["access_token"] == "token-1"
+    assert stat.S_IMODE(os.stat(cache_path).st_mode) == 0o600
+
+
+def test_managers_sharing_a_cache_file_refresh_once(tmp_path, oauth):
+    # Deux gestionnaires = deux processus : seul le verrou fcntl les coordonne
+    if tm.fcntl is None:
+        pytest.skip("verrou inter-processus indisponible")
+    cache_path = str(tmp_path / "token.json")
+    write_expired_cache(cache_path)
+    managers = [TokenManager("id", "secret", cache_path=cache_path) for _ in range(2)]
+
+    tokens = run_threads(8, lambda index: managers[index % 2].get_token())
+
+    assert len(oauth) == 1
+    assert set(tokens) == {"token-1"}
+
+
+def test_cache_of_another_client_id_is_ignored(tmp_path, oauth):
+    cache_path = str(tmp_path / "token.json")
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump({"client_id": "other", "access_token": "foreign", "expires_at": time.time() + 3600}, f)
+
+    assert TokenManager("id", "secret", cache_path=cache_path).get_token() == "token-1"
+
+
+def make_client(tmp_path, statuses):
+    manager = TokenManager("id", "secret", cache_path=str(tmp_path / "token.json"))
+    client = SellsyClientV2("id", "secret", token_manager=manager)
+    sent = []
+
+    def request(**kwargs):
+        sent.append(kwargs["headers"]["Authorization"])
+        return FakeResponse(statuses.pop(0), {"data": {}})
+
+    client.session.request = request
+    return client, sent
+
+
+def test_401_forces_exactly_one_refresh(tmp_path, oauth):
+    client, sent = make_client(tmp_path, [401, 200])
+
+    response = client._send("GET", "/companies/1")
+
+    assert response.status_code == 200
+    assert len(oauth) == 2
+    # Le token révoqué, encore valide dans le cache disque, n'est pas réutilisé
+    assert sent == ["Bearer token-1", "Bearer token-2"]
+
+
+def test_second_401_is_not_retried(tmp_path, oauth):
+    client, sent = make_client(tmp_path, [401, 401, 200])
+
+    with pytest.raises(SellsyAPIError) as error:
+        client._send("GET", "/companies/1")
+
+    assert error.value.status_code == 401
+    assert len(oauth) == 2
+    assert len(sent) == 2